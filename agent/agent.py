@@ -1,11 +1,29 @@
 
+import asyncio
 import requests
 import json
+import math
+import os
 import time
 import platform
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 import re
 
+from capabilities import detect_capabilities
+from disk_topology import DiskTopology
+from collector_engine import Section, create_executor
+from exporter import METRICS_EXPORTER_ENABLED, MetricsCache
+from anomaly import BURST_DURATION_SECONDS
+from blocking import analyze_blocking
+from high_res import HIGH_RES_INTERVAL_SECONDS, HighResSampler
+from local_api import LocalApiServer
+from os_sampler import OSSampler
+from spool import Spool, SpoolReplayer
+from state_store import StateStore
+from targets import TARGETS_FILE, Target, load_targets
+from transport import Transport
+
 # --- Database Connection Configuration ---
 # TODO: Replace these placeholders with your actual database credentials.
 DB_HOST = "localhost"
@@ -23,60 +41,85 @@ DB_CONNECTION_STRING = f"{DB_USER}/{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_SERVICE
 
 
 # --- Agent & Server Configuration ---
+# To monitor several databases from one agent process, list them in targets.json
+# (see targets.example.json); the DB_* settings above are then ignored.
 SERVER_URL = "https://9000-firebase-proactivedb-1761776452727.cluster-uodogxybdfdkiqhne5y6pr6j4w.cloudworkstations.dev/api/report"
 DB_SERVER_ID = "db6"
 DB_NAME="PROD_CRM" # Added for better alert identification
+# Reports are collected on a wall-clock grid: at every multiple of FREQUENCY_SECONDS
+# since the epoch, so samples from all agents line up regardless of collection time.
 FREQUENCY_SECONDS = 30
 
-# --- State for I/O counters ---
-# psutil.disk_io_counters returns cumulative values, so we need to store the previous state
-# to calculate the rate of change.
-previous_io_counters = None
-previous_io_timestamp = None
-previous_net_io_counters = None
-previous_net_io_timestamp = None
-
-
-def get_db_connection():
+# --- Per-Section Collection Schedules ---
+# Expensive dictionary scans are refreshed less often than the report is sent;
+# between refreshes the last result is reused. Jitter spreads the load across agents.
+TABLESPACE_INTERVAL_SECONDS = 900
+BACKUP_INTERVAL_SECONDS = 600
+SCHEDULE_JITTER_SECONDS = 60
+
+# --- Multi-Target Concurrency ---
+# Collector threads shared by all targets: one per section (SECTION_WORKERS) per target, up to this cap
+MAX_COLLECTOR_WORKERS = 32
+# How many targets collect (liveness check and sections) at the same time
+TARGET_WORKERS = 16
+
+# --- Array Fetch Tuning ---
+# Rows per round-trip for the gv$session detail query (see stream_query); ASH and
+# V$SQLSTATS set their own sizes in ash_reader.py and sql_stats.py
+DETAILED_SESSIONS_ARRAYSIZE = 500
+
+# --- Sending ---
+# Reports run through a queue so a slow POST never delays the next collection tick.
+# When the senders fall this far behind, the oldest queued report goes to the spool.
+SEND_QUEUE_SIZE = 100
+SENDER_CONCURRENCY = 4
+# Set to False on hosts that are only scraped via GET /metrics (exporter.py)
+PUSH_REPORTS = True
+
+# --- State for OS counters ---
+# psutil returns cumulative CPU, disk and network counters; the sampler keeps the
+# previous reading so rates can be computed without sleeping.
+os_sampler = None
+# Mount point -> device -> counter key map, rebuilt only when the mount table changes
+disk_topology = None
+
+# Persistent HTTP session used for every report, see get_transport()
+transport = None
+
+# State that survives restarts (alert log high-water marks, ...), see state_store.py
+agent_state = StateStore()
+
+# On-disk spool for reports the server did not accept, and the thread that replays them.
+# Both are created in main().
+report_spool = None
+spool_replayer = None
+# Last report of every target, rendered for the OpenMetrics endpoint
+metrics_cache = MetricsCache()
+
+
+def get_targets():
     """
-    Establishes and returns a database connection.
-    This function uses the 'oracledb' library.
-    Make sure you have installed it using: pip install oracledb
+    Returns the monitored databases: the entries of targets.json when it exists,
+    otherwise the single database configured above. Each target connects lazily.
+    Connections use the 'oracledb' library: pip install oracledb
     """
-    try:
-        import oracledb
-        # The following line enables Thick mode. It requires Oracle Instant Client to be installed.
-        # This is often necessary for older database versions (e.g., 11g).
-        # On some systems, this might need to be pointed to the specific client library directory.
-        # e.g., oracledb.init_oracle_client(lib_dir="/opt/oracle/instantclient_21_5")
-        #try:
-            # oracledb.init_oracle_client()
-        #except Exception as client_e:
-        #     print(f"Could not initialize Oracle Thick Client, will try Thin mode. Error: {client_e}")
-
-        
-        connection_params = {
-            "user": DB_USER,
-            "password": DB_PASSWORD,
-            "dsn": f"{DB_HOST}:{DB_PORT}/{DB_SERVICE_NAME}"
-        }
-
-        if DB_CONNECT_AS_SYSDBA:
-            connection_params["mode"] = oracledb.SYSDBA
-            print(f"Attempting to connect to: {connection_params['dsn']} as SYSDBA")
-        else:
-            print(f"Attempting to connect to: {DB_CONNECTION_STRING}")
-
-        connection = oracledb.connect(**connection_params)
-
-        print("--- DATABASE CONNECTED ---")
-        return connection
-    except ImportError:
-        print("Error: The 'oracledb' package is not installed. Please install it using 'pip install oracledb'")
-        return None
-    except Exception as e:
-        print(f"Error connecting to database: {e}")
-        return None
+    # The following line enables Thick mode. It requires Oracle Instant Client to be installed.
+    # This is often necessary for older database versions (e.g., 11g).
+    # On some systems, this might need to be pointed to the specific client library directory.
+    # e.g., oracledb.init_oracle_client(lib_dir="/opt/oracle/instantclient_21_5")
+    #try:
+        # oracledb.init_oracle_client()
+    #except Exception as client_e:
+    #     print(f"Could not initialize Oracle Thick Client, will try Thin mode. Error: {client_e}")
+
+    if os.path.exists(TARGETS_FILE):
+        targets = load_targets(TARGETS_FILE, agent_state, pool_sessions=POOL_SESSIONS)
+        print(f"Loaded {len(targets)} target(s) from {TARGETS_FILE}.")
+        return targets
+
+    # The single target keeps the original state key, so its alert log is not re-read after an upgrade
+    return [Target(DB_SERVER_ID, DB_NAME, DB_HOST, DB_PORT, DB_SERVICE_NAME, DB_USER, DB_PASSWORD,
+                   sysdba=DB_CONNECT_AS_SYSDBA, state_store=agent_state, state_key="alert_log", pool_sessions=POOL_SESSIONS)]
 
 def get_psutil():
     """
@@ -91,6 +134,22 @@ def get_psutil():
         return None
 
 
+def get_os_sampler(psutil):
+    """Returns the shared OS sampler, creating it on first use."""
+    global os_sampler
+    if os_sampler is None:
+        os_sampler = OSSampler(psutil)
+    return os_sampler
+
+
+def get_disk_topology(psutil):
+    """Returns the shared disk topology cache, creating it on first use."""
+    global disk_topology
+    if disk_topology is None:
+        disk_topology = DiskTopology(psutil)
+    return disk_topology
+
+
 def format_uptime(seconds):
     """Formats seconds into a human-readable string like '3 days, 5 hours, 2 minutes'."""
     if seconds < 0:
@@ -111,418 +170,512 @@ def format_uptime(seconds):
     return " ".join(parts)
 
 
-def collect_real_data(connection, psutil):
+def execute_query(cursor, query, params=None):
     """
-    Executes SQL queries and uses psutil to collect performance metrics.
+    Executes a query on the given cursor and returns all rows.
+    Raises PermissionError("ORA-00942") when a view is not accessible so sections can adapt.
+    Any other error (e.g. ORA-03156 from the call timeout) is printed and re-raised, so the
+    collector engine counts the section as failed instead of caching an empty result.
     """
-    global previous_io_counters, previous_io_timestamp, previous_net_io_counters, previous_net_io_timestamp
+    if not cursor:
+        return []
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        return cursor.fetchall()
+    except Exception as e:
+        # Check if it's a "table or view does not exist" error
+        if "ORA-00942" in str(e):
+            print(f"Query failed because a view is not accessible (likely a permissions or licensing issue): {e}")
+            # Re-raise with a specific type to be caught by the adaptive logic
+            raise PermissionError("ORA-00942") from e
+        print(f"Error executing query: {e}")
+        raise
 
-    print("Collecting real data from database and OS...")
-    now = datetime.now(timezone.utc)
-    
-    # Check if DB connection is truly alive
-    db_is_up = False
-    db_status = "UNKNOWN"
-    db_uptime_str = "N/A"
-    host_uptime_str = "N/A"
 
-    if connection:
-        try:
-            # A lightweight query to check if the connection is active
-            cursor_check = connection.cursor()
-            cursor_check.execute("SELECT 1 FROM DUAL")
-            cursor_check.fetchone()
-            db_is_up = True
-            
-            # Get DB status (OPEN, MOUNTED, etc.)
-            try:
-                cursor_check.execute("SELECT status, startup_time FROM V$INSTANCE")
-                status_result = cursor_check.fetchone()
-                if status_result:
-                    db_status = status_result[0]
-                    startup_time = status_result[1]
-                    db_uptime_seconds = (datetime.now() - startup_time).total_seconds()
-                    db_uptime_str = format_uptime(db_uptime_seconds)
+def stream_query(cursor, query, params=None, arraysize=100, rowfactory=None):
+    """
+    Executes a query and yields its rows as they arrive, `arraysize` rows per
+    round-trip (the first batch comes back with the execute), instead of
+    materialising the whole result. `rowfactory` builds each row's final object
+    directly, e.g. the report dict. Errors behave as in execute_query: PermissionError
+    for an inaccessible view, anything else is printed and re-raised, also when it happens
+    part-way through the rows, so a caller never mistakes a partial result for a complete one.
+    """
+    if not cursor:
+        return
+    try:
+        cursor.arraysize = arraysize
+        cursor.prefetchrows = arraysize
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        # Set after execute(), which resets it
+        cursor.rowfactory = rowfactory
+        yield from cursor
+    except Exception as e:
+        if "ORA-00942" in str(e):
+            print(f"Query failed because a view is not accessible (likely a permissions or licensing issue): {e}")
+            raise PermissionError("ORA-00942") from e
+        print(f"Error executing query: {e}")
+        raise
 
-            except Exception:
-                db_status = "READ" # If instance view fails, assume at least readable
 
-            cursor_check.close()
-        except Exception as e:
-            print(f"Database connection check failed: {e}")
-            db_is_up = False
-            db_status = "DOWN"
-    else:
-        db_status = "DOWN"
+def parse_lag_to_hours_str(lag_str):
+    """Parses Oracle lag string (+DD HH:MI:SS) into a formatted string."""
+    if not lag_str or lag_str == '0':
+        return "0.00"
+    
+    match = re.match(r'\+?(\d{2,})\s(\d{2}):(\d{2}):(\d{2})', lag_str) # For days, e.g., +00 02:30:00
+    if not match:
+         match = re.match(r'(\d{2}):(\d{2}):(\d{2})', lag_str) # For hours only, e.g., 02:30:00
+         if match:
+             hours, minutes, seconds = [int(x) for x in match.groups()]
+             total_hours = hours + minutes / 60 + seconds / 3600
+             return f"{total_hours:.2f}"
+         else: # If no match, it might be in an unexpected format, return 0
+             return "0.00"
     
-    cursor = connection.cursor() if db_is_up else None
+    days, hours, minutes, seconds = [int(x) for x in match.groups()]
+    total_hours = (days * 24) + hours + minutes / 60 + seconds / 3600
+    return f"{total_hours:.2f}"
 
 
-    # --- OS Info ---
-    os_info = None
-    if psutil:
-        os_info = {
-            "platform": platform.system(),
-            "release": platform.release()
-        }
-        try:
-            boot_time_timestamp = psutil.boot_time()
-            host_uptime_seconds = time.time() - boot_time_timestamp
-            host_uptime_str = format_uptime(host_uptime_seconds)
-        except Exception as e:
-            print(f"Could not get host uptime: {e}")
+# --- Database Collection Sections ---
+# Each section takes its own cursor and the target it collects for, and returns only its
+# part of the report, so the collector engine can run them concurrently and merge the results.
+
+def collect_active_session_count(cursor, target):
+    """Active user session count for the KPIs."""
+    try:
+        kpi_query = """
+        SELECT count(*) FROM v$session WHERE status = 'ACTIVE' AND type = 'USER' AND username IS NOT NULL
+        """
+        kpi_results = execute_query(cursor, kpi_query)
+        if kpi_results:
+           return kpi_results[0][0]
+    except PermissionError: # Catch if v$session is not available (highly unlikely but safe)
+        print("Warning: Could not query v$session for active sessions count.")
+    return 0
+
+
+def collect_tablespaces(cursor, target):
+    tablespaces = []
+    try:
+        ts_query = """
+            SELECT df.tablespace_name,
+                round(df.maxbytes / (1024 * 1024 * 1024), 2) max_ts_size_gb,
+                round((df.bytes - nvl(sum(fs.bytes),0)) / (1024 * 1024 * 1024), 2) used_ts_size_gb,
+                round((df.bytes - nvl(sum(fs.bytes),0)) / (df.maxbytes) * 100, 2) max_ts_pct_used
+            FROM dba_free_space fs,
+                (select tablespace_name,
+                sum(bytes) bytes,
+                sum(decode(maxbytes, 0, bytes, maxbytes)) maxbytes,
+                max(autoextensible) autoextensible
+                from dba_data_files
+                group by tablespace_name) df
+            WHERE fs.tablespace_name (+) = df.tablespace_name
+            GROUP BY df.tablespace_name, df.bytes, df.maxbytes
+            UNION ALL
+            SELECT df.tablespace_name,
+                round(df.maxbytes / (1024 * 1024 * 1024), 2) max_ts_size_gb,
+                round((df.bytes - nvl(sum(fs.bytes),0)) / (1024 * 1024 * 1024), 2) used_ts_size_gb,
+                round((df.bytes - nvl(sum(fs.bytes),0)) / (df.maxbytes) * 100, 2) max_ts_pct_used
+            FROM (select tablespace_name, bytes_used bytes
+                from V$temp_space_header
+                group by tablespace_name, bytes_free, bytes_used) fs,
+                (select tablespace_name,
+                sum(bytes) bytes,
+                sum(decode(maxbytes, 0, bytes, maxbytes)) maxbytes,
+                max(autoextensible) autoextensible
+                from dba_temp_files
+                group by tablespace_name) df
+            WHERE fs.tablespace_name (+) = df.tablespace_name
+            GROUP BY df.tablespace_name, df.bytes, df.maxbytes
+            ORDER BY 4 DESC
+        """
+        ts_results = execute_query(cursor, ts_query)
+        if ts_results:
+            for row in ts_results:
+                tablespaces.append({
+                    "name": row[0],
+                    "total_gb": row[1] or 0,
+                    "used_gb": row[2] or 0,
+                    "used_percent": row[3] or 0
+                })
+    except PermissionError:
+        print("Warning: Could not query DBA views for tablespaces.")
+    return tablespaces
+
+
+def collect_backups(cursor, target):
+    backups = []
+    try:
+        backup_query = """
+            SELECT session_key, TO_CHAR(start_time, 'YYYY-MM-DD HH24:MI:SS'), TO_CHAR(end_time, 'YYYY-MM-DD HH24:MI:SS'), status,
+                   input_bytes, output_bytes, elapsed_seconds
+            FROM V$RMAN_BACKUP_JOB_DETAILS
+            WHERE start_time >= SYSDATE - 7
+            ORDER BY start_time DESC
+        """
+        backup_results = execute_query(cursor, backup_query)
+        if backup_results:
+            for row in backup_results:
+                backups.append({
+                    "id": str(row[0]),
+                    "start_time": row[1],
+                    "end_time": row[2],
+                    "status": row[3],
+                    "input_bytes": row[4] if row[4] is not None else 0,
+                    "output_bytes": row[5] if row[5] is not None else 0,
+                    "elapsed_seconds": row[6] if row[6] is not None else 0,
+                    "db_name": target.db_name
+                })
+    except PermissionError:
+        print("Warning: V$RMAN_BACKUP_JOB_DETAILS not accessible.")
+    return backups
+
+
+def collect_active_sessions(cursor, target):
+    activeSessions = []
+    try:
+        sessions_query = """
+            SELECT sid, username, program
+            FROM v$session
+            WHERE status = 'ACTIVE' AND type != 'BACKGROUND'
+            ORDER BY sid
+        """
+        sessions_results = execute_query(cursor, sessions_query)
+        if sessions_results:
+            for row in sessions_results:
+                activeSessions.append({"sid": row[0], "username": row[1], "program": row[2]})
+    except PermissionError:
+        print("Warning: v$session not accessible for active session list.")
+    return activeSessions
+
+
+def detailed_session_row(inst, sid, username, sql_id, status, event, et, obj, bs, bi, module, machine, terminal):
+    """Row factory for the gv$session query: builds the report entry without an intermediate tuple list."""
+    return {
+        "inst": inst, "sid": sid, "username": username, "sql_id": sql_id,
+        "status": status, "event": event, "et": et, "obj": obj,
+        "bs": bs, "bi": bi, "module": module, "machine": machine,
+        "terminal": terminal
+    }
 
 
-    # --- Helper function to execute queries ---
-    def execute_query(query, params=None):
-        if not cursor:
-            return []
+def collect_detailed_sessions(cursor, target):
+    detailedActiveSessions = []
+    try:
+        detailed_sessions_query = """
+            select inst_id, sid, username, sql_id, status, event, last_call_et, row_wait_obj#,
+                   BLOCKING_SESSION, BLOCKING_INSTANCE, module, machine, terminal
+            from gv$session
+            where wait_class !='Idle'
+            order by inst_id, event
+        """
+        # Thousands of rows during a lock storm: few large round-trips, streamed straight into dicts
+        detailedActiveSessions = list(stream_query(cursor, detailed_sessions_query, arraysize=DETAILED_SESSIONS_ARRAYSIZE,
+                                                   rowfactory=detailed_session_row))
+    except PermissionError:
+         print("Warning: gv$session not accessible for detailed sessions.")
+    return detailedActiveSessions
+
+
+def collect_alert_log(cursor, target):
+    """ORA-/TNS- alert log entries of the last two days, read incrementally by the tailer."""
+    return target.alert_log_tailer.poll(cursor, execute_query, target.capabilities)
+
+
+def collect_wait_events(cursor, target):
+    """Top Wait Events (Adaptive: ASH or v$session)."""
+    topWaitEvents = []
+    use_ash_data = False
+    # Standard Edition, no Diagnostics Pack or no grant: go straight to v$session
+    ash_available = target.capabilities is None or target.capabilities.has_ash
+    if ash_available:
         try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            return cursor.fetchall()
-        except Exception as e:
-            # Check if it's a "table or view does not exist" error
-            if "ORA-00942" in str(e):
-                print(f"Query failed because a view is not accessible (likely a permissions or licensing issue): {e}")
-                # Re-raise with a specific type to be caught by the adaptive logic
-                raise PermissionError("ORA-00942") from e
-            else:
-                print(f"Error executing query: {e}")
-            return [] # Return an empty list on other errors to prevent crashes
+            # Last 15 minutes of ASH data (Enterprise Edition with Diagnostics Pack), read incrementally
+            topWaitEvents = target.ash_reader.poll(cursor, stream_query)
+            use_ash_data = bool(topWaitEvents)
 
+        except PermissionError: # Catches the ORA-00942 from execute_query
+            print("INFO: GV$ACTIVE_SESSION_HISTORY not accessible. Will fall back to v$session snapshot.")
+        except Exception as e:
+            print(f"An unexpected error occurred while querying wait events: {e}")
 
-    # --- KPIs (Key Performance Indicators) from OS and DB ---
-    kpis = {
-        "cpuUsage": 0,
-        "memoryUsage": 0,
-        "activeSessions": 0,
-        "memoryUsedGB": 0,
-        "memoryTotalGB": 0
-    }
-    
-    # Get OS-level CPU and Memory from psutil
-    if psutil:
-        kpis["cpuUsage"] = psutil.cpu_percent(interval=1)
-        mem = psutil.virtual_memory()
-        kpis["memoryUsage"] = mem.percent
-        kpis["memoryUsedGB"] = round(mem.used / (1024**3), 2)
-        kpis["memoryTotalGB"] = round(mem.total / (1024**3), 2)
-
-    # Get Active Sessions from Database
-    if cursor and db_status == "OPEN":
+    # Fallback logic: If ASH data wasn't used (due to error or no rows), use v$session
+    if not use_ash_data:
+        if ash_available:
+            print("INFO: Using v$session for real-time wait event snapshot.")
         try:
-            kpi_query = """
-            SELECT count(*) FROM v$session WHERE status = 'ACTIVE' AND type = 'USER' AND username IS NOT NULL
+            wait_events_snapshot_query = """
+                SELECT event, COUNT(*) as session_count
+                FROM v$session
+                WHERE wait_class <> 'Idle' AND type = 'USER' AND username IS NOT NULL
+                GROUP BY event
+                ORDER BY session_count DESC
             """
-            kpi_results = execute_query(kpi_query)
-            if kpi_results:
-               kpis["activeSessions"] = kpi_results[0][0]
-        except PermissionError: # Catch if v$session is not available (highly unlikely but safe)
-            print("Warning: Could not query v$session for active sessions count.")
+            snapshot_results = execute_query(cursor, wait_events_snapshot_query)
 
+            if snapshot_results:
+                for row in snapshot_results:
+                    topWaitEvents.append({
+                        "event": row[0],
+                        "value": row[1]
+                    })
+        except Exception as e:
+            print(f"An unexpected error occurred while querying v$session for wait events: {e}")
+    return topWaitEvents
 
-    # --- Current Performance Metrics (for history) ---
-    io_details = []
-    total_io_read_rate = 0
-    total_io_write_rate = 0
-    mem_percent = 0
-    cpu_usage = kpis["cpuUsage"]
-    net_up_rate = 0
-    net_down_rate = 0
 
-    if psutil:
-        # OS Memory
-        mem_info = psutil.virtual_memory()
-        mem_percent = mem_info.percent
-        
-        # OS Disk I/O
-        current_io_counters = psutil.disk_io_counters(perdisk=True)
-        current_io_timestamp = time.time()
-        
-        if previous_io_counters is None:
-            previous_io_counters = current_io_counters
-            previous_io_timestamp = current_io_timestamp
-        else:
-            time_delta = current_io_timestamp - previous_io_timestamp
-            if time_delta > 0:
-                current_partitions = psutil.disk_partitions()
-                
-                # --- Cross-platform I/O to Partition mapping ---
-                for part in current_partitions:
-                    if 'loop' in part.opts or not part.fstype:
-                        continue
-                    
-                    io_counter_key = None
-                    if platform.system() == "Windows":
-                        try:
-                            # Use logical disk mapping for Windows
-                             import wmi
-                             c = wmi.WMI()
-                             logical_disk = part.device.replace('\\', '')
-                             # Find the physical drive from the logical disk
-                             for item in c.Win32_LogicalDiskToPartition():
-                                 if item.Dependent.DeviceID == logical_disk:
-                                     # Antecedent provides a link to Win32_DiskPartition
-                                     partition_device_id = item.Antecedent.DeviceID
-                                     for disk_drive in c.Win32_DiskDriveToDiskPartition():
-                                         if disk_drive.Dependent.DeviceID == partition_device_id:
-                                             # This gives us the Win32_DiskDrive
-                                             physical_drive_id = disk_drive.Antecedent.DeviceID.replace('\\','').replace('.','')
-                                             if physical_drive_id in current_io_counters:
-                                                 io_counter_key = physical_drive_id
-                                                 break
-                                     if io_counter_key: break
-                        except Exception:
-                            # Fallback if WMI fails
-                            io_counter_key = list(current_io_counters.keys())[0] if current_io_counters else None
-                    else: # Linux, Solaris, etc.
-                        device_name = part.device.split('/')[-1]
-                        if device_name in current_io_counters:
-                            io_counter_key = device_name
-                        else:
-                            for key in current_io_counters.keys():
-                                if key.endswith(device_name):
-                                    io_counter_key = key
-                                    break
-                    
-                    if io_counter_key and io_counter_key in previous_io_counters:
-                        current_stats = current_io_counters[io_counter_key]
-                        prev_stats = previous_io_counters[io_counter_key]
-                        
-                        read_bytes_diff = current_stats.read_bytes - prev_stats.read_bytes
-                        write_bytes_diff = current_stats.write_bytes - prev_stats.write_bytes
-
-                        if read_bytes_diff < 0: read_bytes_diff = 0
-                        if write_bytes_diff < 0: write_bytes_diff = 0
-                        
-                        read_rate = read_bytes_diff / time_delta / (1024 * 1024) # MB/s
-                        write_rate = write_bytes_diff / time_delta / (1024 * 1024) # MB/s
-
-                        if read_rate > 0.001 or write_rate > 0.001:
-                            io_details.append({
-                                "device": part.device,
-                                "mount_point": part.mountpoint,
-                                "read_mb_s": round(read_rate, 2),
-                                "write_mb_s": round(write_rate, 2)
-                            })
-                            total_io_read_rate += read_rate
-                            total_io_write_rate += write_rate
-                
-            previous_io_counters = current_io_counters
-            previous_io_timestamp = current_io_timestamp
-        
-        # OS Network I/O
-        current_net_io_counters = psutil.net_io_counters()
-        current_net_io_timestamp = time.time()
+def collect_top_sql(cursor, target):
+    """Top statements by elapsed time since the previous cycle, from V$SQLSTATS deltas."""
+    try:
+        return target.sql_stats.poll(cursor, execute_query, stream_query)
+    except PermissionError:
+        print("Warning: V$SQLSTATS not accessible. Top SQL will not be reported.")
+    return []
 
-        if previous_net_io_counters is None:
-            previous_net_io_counters = current_net_io_counters
-            previous_net_io_timestamp = current_net_io_timestamp
-        else:
-            time_delta = current_net_io_timestamp - previous_net_io_timestamp
-            if time_delta > 0:
-                sent_bytes_diff = current_net_io_counters.bytes_sent - previous_net_io_counters.bytes_sent
-                recv_bytes_diff = current_net_io_counters.bytes_recv - previous_net_io_counters.bytes_recv
-                
-                if sent_bytes_diff < 0: sent_bytes_diff = 0
-                if recv_bytes_diff < 0: recv_bytes_diff = 0
 
-                net_up_rate = sent_bytes_diff / time_delta / (1024 * 1024) # MB/s
-                net_down_rate = recv_bytes_diff / time_delta / (1024 * 1024) # MB/s
+def collect_standby_status(cursor, target):
+    standbyStatus = []
+    lag_stats = {}
+    mrp_stats = {}
+    apply_rate_mb_s = 0.0
+
+    caps = target.capabilities
 
-        previous_net_io_counters = current_net_io_counters
-        previous_net_io_timestamp = current_net_io_timestamp
+    # 1. Get Lag stats from V$DATAGUARD_STATS
+    try:
+        if caps and not caps.can_read("V$DATAGUARD_STATS"):
+            raise PermissionError("ORA-00942")
+        standby_query = """
+            SELECT name, value FROM V$DATAGUARD_STATS
+        """
+        standby_results = execute_query(cursor, standby_query)
+        for row in standby_results:
+            lag_stats[row[0]] = row[1]
+    except PermissionError:
+        print("Warning: V$DATAGUARD_STATS not accessible. Lag times will not be reported.")
+    except Exception as e:
+        print(f"An unexpected error occurred while querying standby lag status: {e}")
 
+    # 2. Get MRP status from V$MANAGED_STANDBY
+    try:
+        if caps and not caps.can_read("V$MANAGED_STANDBY"):
+            raise PermissionError("ORA-00942")
+        mrp_query = """
+            SELECT PROCESS, STATUS, SEQUENCE# FROM V$MANAGED_STANDBY WHERE PROCESS = 'MRP0'
+        """
+        mrp_results = execute_query(cursor, mrp_query)
+        if mrp_results:
+            mrp_stats = {
+                "process": mrp_results[0][0],
+                "status": mrp_results[0][1],
+                "sequence": mrp_results[0][2]
+            }
+    except PermissionError:
+        print("Warning: V$MANAGED_STANDBY not accessible. MRP status will not be reported.")
+    except Exception as e:
+        print(f"An unexpected error occurred while querying MRP status: {e}")
 
-    current_performance = {
-        "cpu": cpu_usage,
-        "memory": mem_percent,
-        "io_read": round(total_io_read_rate, 2),
-        "io_write": round(total_io_write_rate, 2),
-        "io_details": io_details,
-        "network_up": round(net_up_rate, 2),
-        "network_down": round(net_down_rate, 2),
-        "active_sessions": kpis["activeSessions"]
-    }
+    # 3. Get Apply Rate from V$RECOVERY_PROGRESS
+    try:
+        if caps and not caps.can_read("V$RECOVERY_PROGRESS"):
+            raise PermissionError("ORA-00942")
+        apply_rate_query = """
+            SELECT sofar FROM v$recovery_progress
+            WHERE item = 'Active Apply Rate'
+            AND start_time = (SELECT MAX(start_time) FROM v$recovery_progress)
+        """
+        apply_rate_results = execute_query(cursor, apply_rate_query)
+        if apply_rate_results:
+            # Value is in Kilobytes/sec, convert to Megabytes/sec
+            apply_rate_mb_s = (apply_rate_results[0][0] or 0) / 1024.0
+    except PermissionError:
+        print("Warning: V$RECOVERY_PROGRESS not accessible. Apply rate will not be reported.")
+    except Exception as e:
+        print(f"An unexpected error occurred while querying apply rate: {e}")
 
 
-    # --- Tablespaces ---
-    tablespaces = []
-    if cursor and db_status == "OPEN":
-        try:
-            ts_query = """
-                SELECT df.tablespace_name,
-                    round(df.maxbytes / (1024 * 1024 * 1024), 2) max_ts_size_gb,
-                    round((df.bytes - nvl(sum(fs.bytes),0)) / (1024 * 1024 * 1024), 2) used_ts_size_gb,
-                    round((df.bytes - nvl(sum(fs.bytes),0)) / (df.maxbytes) * 100, 2) max_ts_pct_used
-                FROM dba_free_space fs,
-                    (select tablespace_name,
-                    sum(bytes) bytes,
-                    sum(decode(maxbytes, 0, bytes, maxbytes)) maxbytes,
-                    max(autoextensible) autoextensible
-                    from dba_data_files
-                    group by tablespace_name) df
-                WHERE fs.tablespace_name (+) = df.tablespace_name
-                GROUP BY df.tablespace_name, df.bytes, df.maxbytes
-                UNION ALL
-                SELECT df.tablespace_name,
-                    round(df.maxbytes / (1024 * 1024 * 1024), 2) max_ts_size_gb,
-                    round((df.bytes - nvl(sum(fs.bytes),0)) / (1024 * 1024 * 1024), 2) used_ts_size_gb,
-                    round((df.bytes - nvl(sum(fs.bytes),0)) / (df.maxbytes) * 100, 2) max_ts_pct_used
-                FROM (select tablespace_name, bytes_used bytes
-                    from V$temp_space_header
-                    group by tablespace_name, bytes_free, bytes_used) fs,
-                    (select tablespace_name,
-                    sum(bytes) bytes,
-                    sum(decode(maxbytes, 0, bytes, maxbytes)) maxbytes,
-                    max(autoextensible) autoextensible
-                    from dba_temp_files
-                    group by tablespace_name) df
-                WHERE fs.tablespace_name (+) = df.tablespace_name
-                GROUP BY df.tablespace_name, df.bytes, df.maxbytes
-                ORDER BY 4 DESC
-            """
-            ts_results = execute_query(ts_query)
-            if ts_results:
-                for row in ts_results:
-                    tablespaces.append({
-                        "name": row[0],
-                        "total_gb": row[1] or 0,
-                        "used_gb": row[2] or 0,
-                        "used_percent": row[3] or 0
-                    })
-        except PermissionError:
-            print("Warning: Could not query DBA views for tablespaces.")
+    # Only build the final object if we have some data
+    if lag_stats or mrp_stats:
+        transport_lag_str = lag_stats.get('transport lag', '0')
+        apply_lag_str = lag_stats.get('apply lag', '0')
+        
+        transport_lag_hours = parse_lag_to_hours_str(transport_lag_str)
+        apply_lag_hours = parse_lag_to_hours_str(apply_lag_str)
 
-    # --- Backups ---
-    backups = []
-    if cursor and db_status == "OPEN":
+        overall_status = "UNKNOWN"
         try:
-            backup_query = """
-                SELECT session_key, TO_CHAR(start_time, 'YYYY-MM-DD HH24:MI:SS'), TO_CHAR(end_time, 'YYYY-MM-DD HH24:MI:SS'), status,
-                       input_bytes, output_bytes, elapsed_seconds
-                FROM V$RMAN_BACKUP_JOB_DETAILS
-                WHERE start_time >= SYSDATE - 7
-                ORDER BY start_time DESC
-            """
-            backup_results = execute_query(backup_query)
-            if backup_results:
-                for row in backup_results:
-                    backups.append({
-                        "id": str(row[0]),
-                        "start_time": row[1],
-                        "end_time": row[2],
-                        "status": row[3],
-                        "input_bytes": row[4] if row[4] is not None else 0,
-                        "output_bytes": row[5] if row[5] is not None else 0,
-                        "elapsed_seconds": row[6] if row[6] is not None else 0,
-                        "db_name": DB_NAME
-                    })
-        except PermissionError:
-            print("Warning: V$RMAN_BACKUP_JOB_DETAILS not accessible.")
+            # Convert hours to float for comparison
+            transport_lag_float = float(transport_lag_hours)
+            apply_lag_float = float(apply_lag_hours)
+            
+            # A small threshold accounts for minor float inaccuracies or very brief lag.
+            zero_threshold = 0.02 # ~1 minute
+            five_min_threshold = 0.083 # 5 minutes in hours
+            
+            if apply_lag_float <= zero_threshold and transport_lag_float <= zero_threshold:
+                overall_status = "SYNCHRONIZED"
+            elif transport_lag_float > five_min_threshold:
+                overall_status = "LAGGING"
+            elif transport_lag_float > zero_threshold and transport_lag_float <= five_min_threshold:
+                 overall_status = "NEAR SYNCHRONIZE"
+            elif mrp_stats.get('status') == 'APPLYING_LOG':
+                overall_status = "APPLYING"
+            else:
+                # Fallback if conditions are ambiguous
+                overall_status = mrp_stats.get('status', 'UNKNOWN').replace('_', ' ')
+
+        except (ValueError, TypeError):
+            overall_status = "UNKNOWN" # Handle if conversion fails
+
+
+        standbyStatus.append({
+            "name": "Standby",
+            "status": overall_status,
+            "transport_lag": transport_lag_hours,
+            "apply_lag": apply_lag_hours,
+            "mrp_status": mrp_stats.get("status", "N/A"),
+            "sequence": mrp_stats.get("sequence", 0),
+            "apply_rate_mb_s": round(apply_rate_mb_s, 2),
+        })
+    return standbyStatus
+
+
+# Sections run concurrently by the collector engine. The status tuple lists the
+# V$INSTANCE states in which each section is attempted (None = whenever connected);
+# sections without an interval run on every cycle.
+DB_SECTIONS = [
+    Section("session_count", collect_active_session_count, 0,
+            requires=lambda caps: caps.can_read("V$SESSION")),
+    Section("tablespaces", collect_tablespaces, [], interval=TABLESPACE_INTERVAL_SECONDS, jitter=SCHEDULE_JITTER_SECONDS,
+            requires=lambda caps: caps.can_read("DBA_DATA_FILES", "DBA_FREE_SPACE")),
+    Section("backups", collect_backups, [], interval=BACKUP_INTERVAL_SECONDS, jitter=SCHEDULE_JITTER_SECONDS,
+            requires=lambda caps: caps.can_read("V$RMAN_BACKUP_JOB_DETAILS")),
+    Section("active_sessions", collect_active_sessions, [],
+            requires=lambda caps: caps.can_read("V$SESSION")),
+    Section("detailed_sessions", collect_detailed_sessions, [],
+            requires=lambda caps: caps.can_read("GV$SESSION")),
+    Section("alert_log", collect_alert_log, [], statuses=None,
+            requires=lambda caps: caps.can_read("V$DIAG_ALERT_EXT") or caps.can_read("SYS.X$DBGALERTEXT")),
+    Section("wait_events", collect_wait_events, []),
+    Section("top_sql", collect_top_sql, [],
+            requires=lambda caps: caps.can_read("V$SQLSTATS")),
+    # Data Guard views only carry standby information on a standby database
+    Section("standby", collect_standby_status, [], statuses=("OPEN", "MOUNTED"),
+            requires=lambda caps: not caps.is_primary and any(
+                caps.can_read(view) for view in ("V$DATAGUARD_STATS", "V$MANAGED_STANDBY", "V$RECOVERY_PROGRESS"))),
+]
+# Every section of a target can run at once: one collector thread and one pooled session
+# each, plus a session for the high-resolution sampler
+SECTION_WORKERS = len(DB_SECTIONS)
+POOL_SESSIONS = SECTION_WORKERS + 1
+
+def refresh_capabilities(target, cursor, startup_time, current_role):
+    """
+    Re-probes the database after a reconnect, an instance restart or a role change;
+    otherwise keeps the cached result so collectors that cannot succeed are not retried every cycle.
+    """
+    caps = target.capabilities
+    if caps is not None:
+        # A role that could not be read at detection time cannot be compared
+        role_changed = current_role is not None and caps.role is not None and current_role != caps.role
+        if caps.generation == target.pool.generation and caps.startup_time == startup_time and not role_changed:
+            return
+        if role_changed:
+            print(f"[{target.server_id}] Database role changed from {caps.role} to {current_role}.")
 
+    try:
+        target.capabilities = detect_capabilities(cursor, startup_time, target.pool.generation)
+    except Exception as e:
+        print(f"[{target.server_id}] Could not detect database capabilities, all collectors will be attempted: {e}")
+        target.capabilities = None
+        return
+    print(f"[{target.server_id}] Database capabilities: {target.capabilities.describe()}")
+    # Cached section results and ASH state may describe the previous role or instance
+    target.engine.scheduler.reset()
+    target.ash_reader.reset()
+    target.sql_stats.reset()
 
-    # --- Active Sessions ---
-    activeSessions = []
-    if cursor and db_status == "OPEN":
-        try:
-            sessions_query = """
-                SELECT sid, username, program
-                FROM v$session
-                WHERE status = 'ACTIVE' AND type != 'BACKGROUND'
-                ORDER BY sid
-            """
-            sessions_results = execute_query(sessions_query)
-            if sessions_results:
-                for row in sessions_results:
-                    activeSessions.append({"sid": row[0], "username": row[1], "program": row[2]})
-        except PermissionError:
-            print("Warning: v$session not accessible for active session list.")
-
-    # --- Detailed Active Sessions ---
-    detailedActiveSessions = []
-    if cursor and db_status == "OPEN":
-        try:
-            detailed_sessions_query = """
-                select inst_id, sid, username, sql_id, status, event, last_call_et, row_wait_obj#,
-                       BLOCKING_SESSION, BLOCKING_INSTANCE, module, machine, terminal
-                from gv$session
-                where wait_class !='Idle'
-                order by inst_id, event
-            """
-            detailed_sessions_results = execute_query(detailed_sessions_query)
-            if detailed_sessions_results:
-                for row in detailed_sessions_results:
-                    detailedActiveSessions.append({
-                        "inst": row[0], "sid": row[1], "username": row[2], "sql_id": row[3],
-                        "status": row[4], "event": row[5], "et": row[6], "obj": row[7],
-                        "bs": row[8], "bi": row[9], "module": row[10], "machine": row[11],
-                        "terminal": row[12]
-                    })
-        except PermissionError:
-             print("Warning: gv$session not accessible for detailed sessions.")
 
+def collect_os_metrics(psutil):
+    """
+    Host-level metrics, sampled once per cycle and shared by every target
+    monitored from this host.
+    """
+    # --- OS Info ---
+    # One sampler reading per cycle, so KPIs and history share the same CPU/memory values
+    os_info = None
+    os_sample = None
+    host_uptime_str = "N/A"
+    if psutil:
+        os_info = {
+            "platform": platform.system(),
+            "release": platform.release()
+        }
+        os_sample = get_os_sampler(psutil).sample()
+        if os_sample.boot_time is not None:
+            host_uptime_seconds = os_sample.timestamp - os_sample.boot_time
+            host_uptime_str = format_uptime(host_uptime_seconds)
 
-    # --- Active Sessions History is now collected from snapshots by the backend ---
-    activeSessionsHistory = []
 
+    # --- OS-level KPIs: CPU and Memory from the sampler ---
+    os_kpis = {
+        "cpuUsage": 0,
+        "memoryUsage": 0,
+        "memoryUsedGB": 0,
+        "memoryTotalGB": 0
+    }
+    if os_sample:
+        os_kpis["cpuUsage"] = os_sample.cpu_percent
+        mem = os_sample.memory
+        os_kpis["memoryUsage"] = mem.percent
+        os_kpis["memoryUsedGB"] = round(mem.used / (1024**3), 2)
+        os_kpis["memoryTotalGB"] = round(mem.total / (1024**3), 2)
+
+    # --- Host I/O and network rates (for history) ---
+    io_details = []
+    total_io_read_rate = 0
+    total_io_write_rate = 0
+    net_up_rate = 0
+    net_down_rate = 0
 
-    # --- Alert Log ---
-    alertLog = []
-    if cursor:
-        two_days_ago_utc = datetime.now(timezone.utc) - timedelta(days=2)
-        alert_results = []
-        try:
-            # First, try the modern V$DIAG_ALERT_EXT view
-            alert_log_query_vdiag = """
-                SELECT TO_CHAR(ORIGINATING_TIMESTAMP, 'YYYY-MM-DD HH24:MI:SS'), MESSAGE_TEXT
-                FROM V$DIAG_ALERT_EXT
-                WHERE (MESSAGE_TEXT LIKE 'ORA-%' OR MESSAGE_TEXT LIKE 'TNS-%')
-                AND ORIGINATING_TIMESTAMP > :1
-                ORDER BY ORIGINATING_TIMESTAMP DESC
-            """
-            alert_results = execute_query(alert_log_query_vdiag, params=[two_days_ago_utc])
-        except PermissionError: # This will catch ORA-00942
-            print("INFO: Query on V$DIAG_ALERT_EXT failed (likely permissions or version). Will attempt fallback.")
-            alert_results = [] # Ensure results are empty before fallback
-        except Exception as e:
-            print(f"WARNING: Query on V$DIAG_ALERT_EXT failed with unexpected error: {e}")
-            alert_results = [] # Ensure results are empty before fallback
+    if os_sample:
+        # OS Disk I/O: mounted partitions and their counter keys come from the cached topology
+        if os_sample.disk_rates:
+            for disk in get_disk_topology(psutil).mounts(os_sample.disk_io):
+                if disk.counter_key in os_sample.disk_rates:
+                    read_rate, write_rate = os_sample.disk_rates[disk.counter_key]
+
+                    if read_rate > 0.001 or write_rate > 0.001:
+                        io_details.append({
+                            "device": disk.device,
+                            "mount_point": disk.mountpoint,
+                            "read_mb_s": round(read_rate, 2),
+                            "write_mb_s": round(write_rate, 2)
+                        })
+                        total_io_read_rate += read_rate
+                        total_io_write_rate += write_rate
 
-        # Fallback for older Oracle versions or if V$DIAG_ALERT_EXT is not available/accessible
-        if not alert_results:
-            print("INFO: V$DIAG_ALERT_EXT failed or returned no results. Falling back to sys.x$dbgalertext.")
-            try:
-                alert_log_query_fallback = """
-                    SELECT TO_CHAR(ORIGINATING_TIMESTAMP, 'YYYY-MM-DD HH24:MI:SS'), message_text
-                    FROM sys.x$dbgalertext
-                    WHERE (message_text LIKE 'ORA-%' OR message_text LIKE 'TNS-%')
-                    AND ORIGINATING_TIMESTAMP > :1
-                    ORDER BY ORIGINATING_TIMESTAMP DESC
-                """
-                alert_results = execute_query(alert_log_query_fallback, params=[two_days_ago_utc])
-            except Exception as e:
-                print(f"ERROR: Could not query alert log fallback (sys.x$dbgalertext may require specific grants): {e}")
-
-        if alert_results:
-            for row in alert_results:
-                alert_id = f"log_{row[0]}_{hash(row[1])}"
-                alertLog.append({"id": alert_id, "timestamp": row[0], "error_code": row[1]})
+        # OS Network I/O
+        net_up_rate = os_sample.net_up_rate
+        net_down_rate = os_sample.net_down_rate
 
 
     # --- Disk Usage (from psutil) ---
     diskUsage = []
     if psutil:
         try:
-            for part in psutil.disk_partitions():
-                 if 'loop' in part.opts or part.fstype == '':
-                    continue
-                 usage = psutil.disk_usage(part.mountpoint)
+            for disk in get_disk_topology(psutil).mounts(os_sample.disk_io if os_sample else {}):
+                 usage = psutil.disk_usage(disk.mountpoint)
                  diskUsage.append({
-                     "mount_point": part.mountpoint,
+                     "mount_point": disk.mountpoint,
                      "total_gb": round(usage.total / (1024**3), 2),
                      "used_gb": round(usage.used / (1024**3), 2),
                      "used_percent": usage.percent
@@ -530,314 +683,379 @@ def collect_real_data(connection, psutil):
         except Exception as e:
             print(f"Could not get disk usage: {e}")
 
+    return {
+        "os_info": os_info,
+        "host_uptime": host_uptime_str,
+        "kpis": os_kpis,
+        "io_details": io_details,
+        "io_read": round(total_io_read_rate, 2),
+        "io_write": round(total_io_write_rate, 2),
+        "network_up": round(net_up_rate, 2),
+        "network_down": round(net_down_rate, 2),
+        "disk_usage": diskUsage,
+    }
 
-    # --- Top Wait Events (Adaptive: ASH or v$session) ---
-    topWaitEvents = []
-    if cursor and db_status == "OPEN":
-        ash_results = []
-        use_ash_data = False
-        try:
-            # Query for the last 15 minutes of ASH data (Enterprise Edition with Diagnostics Pack)
-            wait_events_ash_query = """
-                WITH ash_data AS (
-                    SELECT
-                        event,
-                        TRUNC(sample_time, 'MI') AS sample_minute,
-                        session_id,
-                        time_waited
-                    FROM gv$active_session_history
-                    WHERE sample_time > SYSTIMESTAMP - INTERVAL '15' MINUTE
-                      AND event IS NOT NULL
-                      AND wait_class <> 'Idle'
-                )
-                SELECT
-                    event,
-                    TO_CHAR(sample_minute, 'YYYY-MM-DD"T"HH24:MI:SS"Z"') as sample_time_str,
-                    COUNT(DISTINCT session_id) AS session_count,
-                    SUM(time_waited) / 1000000 AS total_latency_seconds
-                FROM ash_data
-                GROUP BY event, sample_minute
-                ORDER BY sample_minute, session_count DESC
-            """
-            ash_results = execute_query(wait_events_ash_query)
-            
-            if ash_results: # If ASH query returned data, process it
-                use_ash_data = True
-                events_by_name = {}
-                for row in ash_results:
-                    event_name, sample_time, session_count, latency = row
-                    if event_name not in events_by_name:
-                        events_by_name[event_name] = { "event": event_name, "value": 0, "data": [] }
-                    
-                    events_by_name[event_name]["data"].append({
-                        "date": sample_time,
-                        "value": session_count,
-                        "latency": round(latency, 4)
-                    })
-                    events_by_name[event_name]["value"] += session_count
-                
-                topWaitEvents = list(events_by_name.values())
-                topWaitEvents.sort(key=lambda x: x['value'], reverse=True)
 
-        except PermissionError: # Catches the ORA-00942 from execute_query
-            print("INFO: GV$ACTIVE_SESSION_HISTORY not accessible. Will fall back to v$session snapshot.")
-        except Exception as e:
-            print(f"An unexpected error occurred while querying wait events: {e}")
+def collect_real_data(target, psutil, host_metrics, timestamp=None):
+    """
+    Executes SQL queries against one target and combines them with the host metrics.
+    Database sections run in parallel on the collector engine; `host_metrics` is a
+    Future that resolves to collect_os_metrics() output and is only waited for at the end.
+    `timestamp` is the scheduled tick the report belongs to (defaults to now).
+    """
+    print(f"[{target.server_id}] Collecting real data from database and OS...")
+    now = timestamp or datetime.now(timezone.utc)
+    collect_started = time.monotonic()
+    db_pool = target.pool
+    
+    # Check if DB connection is truly alive
+    db_is_up = False
+    db_status = "UNKNOWN"
+    db_uptime_str = "N/A"
 
-        # Fallback logic: If ASH data wasn't used (due to error or no rows), use v$session
-        if not use_ash_data:
-            print("INFO: Using v$session for real-time wait event snapshot.")
+    try:
+        with db_pool.cursor() as cursor_check:
+            # A lightweight query to check if the connection is active (on 12c+ it also returns the database role)
+            cursor_check.execute(target.capabilities.liveness_query() if target.capabilities else "SELECT 1 FROM DUAL")
+            live_row = cursor_check.fetchone()
+            db_is_up = True
+            current_role = live_row[0] if target.capabilities and live_row and isinstance(live_row[0], str) else None
+            startup_time = None
+            
+            # Get DB status (OPEN, MOUNTED, etc.)
             try:
-                wait_events_snapshot_query = """
-                    SELECT event, COUNT(*) as session_count
-                    FROM v$session
-                    WHERE wait_class <> 'Idle' AND type = 'USER' AND username IS NOT NULL
-                    GROUP BY event
-                    ORDER BY session_count DESC
-                """
-                snapshot_results = execute_query(wait_events_snapshot_query)
-
-                if snapshot_results:
-                    for row in snapshot_results:
-                        topWaitEvents.append({
-                            "event": row[0],
-                            "value": row[1]
-                        })
-            except Exception as e:
-                print(f"An unexpected error occurred while querying v$session for wait events: {e}")
+                cursor_check.execute("SELECT status, startup_time FROM V$INSTANCE")
+                status_result = cursor_check.fetchone()
+                if status_result:
+                    db_status = status_result[0]
+                    startup_time = status_result[1]
+                    db_uptime_seconds = (datetime.now() - startup_time).total_seconds()
+                    db_uptime_str = format_uptime(db_uptime_seconds)
 
-    # --- Standby Status ---
-    standbyStatus = []
-    
-    def parse_lag_to_hours_str(lag_str):
-        """Parses Oracle lag string (+DD HH:MI:SS) into a formatted string."""
-        if not lag_str or lag_str == '0':
-            return "0.00"
-        
-        match = re.match(r'\+?(\d{2,})\s(\d{2}):(\d{2}):(\d{2})', lag_str) # For days, e.g., +00 02:30:00
-        if not match:
-             match = re.match(r'(\d{2}):(\d{2}):(\d{2})', lag_str) # For hours only, e.g., 02:30:00
-             if match:
-                 hours, minutes, seconds = [int(x) for x in match.groups()]
-                 total_hours = hours + minutes / 60 + seconds / 3600
-                 return f"{total_hours:.2f}"
-             else: # If no match, it might be in an unexpected format, return 0
-                 return "0.00"
-        
-        days, hours, minutes, seconds = [int(x) for x in match.groups()]
-        total_hours = (days * 24) + hours + minutes / 60 + seconds / 3600
-        return f"{total_hours:.2f}"
+            except Exception:
+                db_status = "READ" # If instance view fails, assume at least readable
 
+            refresh_capabilities(target, cursor_check, startup_time, current_role)
 
-    if cursor and (db_status == "OPEN" or db_status == "MOUNTED"):
-        lag_stats = {}
-        mrp_stats = {}
-        apply_rate_mb_s = 0.0
+    except Exception as e:
+        print(f"[{target.server_id}] Database connection check failed: {e}")
+        db_is_up = False
+        db_status = "DOWN"
+        db_pool.mark_failed(e)
 
-        # 1. Get Lag stats from V$DATAGUARD_STATS
-        try:
-            standby_query = """
-                SELECT name, value FROM V$DATAGUARD_STATS
-            """
-            standby_results = execute_query(standby_query)
-            for row in standby_results:
-                lag_stats[row[0]] = row[1]
-        except PermissionError:
-            print("Warning: V$DATAGUARD_STATS not accessible. Lag times will not be reported.")
-        except Exception as e:
-            print(f"An unexpected error occurred while querying standby lag status: {e}")
+    # --- Start the database sections; they run while the host metrics are collected ---
+    # Each section borrows its own pooled session, so the queries really run in parallel
+    section_handle = target.engine.submit(DB_SECTIONS, db_status, db_pool.cursor if db_is_up else None, target.capabilities)
 
-        # 2. Get MRP status from V$MANAGED_STANDBY
-        try:
-            mrp_query = """
-                SELECT PROCESS, STATUS, SEQUENCE# FROM V$MANAGED_STANDBY WHERE PROCESS = 'MRP0'
-            """
-            mrp_results = execute_query(mrp_query)
-            if mrp_results:
-                mrp_stats = {
-                    "process": mrp_results[0][0],
-                    "status": mrp_results[0][1],
-                    "sequence": mrp_results[0][2]
-                }
-        except PermissionError:
-            print("Warning: V$MANAGED_STANDBY not accessible. MRP status will not be reported.")
-        except Exception as e:
-            print(f"An unexpected error occurred while querying MRP status: {e}")
+    host = host_metrics.result()
 
-        # 3. Get Apply Rate from V$RECOVERY_PROGRESS
-        try:
-            apply_rate_query = """
-                SELECT sofar FROM v$recovery_progress
-                WHERE item = 'Active Apply Rate'
-                AND start_time = (SELECT MAX(start_time) FROM v$recovery_progress)
-            """
-            apply_rate_results = execute_query(apply_rate_query)
-            if apply_rate_results:
-                # Value is in Kilobytes/sec, convert to Megabytes/sec
-                apply_rate_mb_s = (apply_rate_results[0][0] or 0) / 1024.0
-        except PermissionError:
-            print("Warning: V$RECOVERY_PROGRESS not accessible. Apply rate will not be reported.")
-        except Exception as e:
-            print(f"An unexpected error occurred while querying apply rate: {e}")
+    # --- KPIs (Key Performance Indicators) from OS and DB ---
+    kpis = dict(host["kpis"])
 
+    # --- Merge the database sections ---
+    sections = target.engine.gather(section_handle)
+    kpis["activeSessions"] = sections["session_count"]
 
-        # Only build the final object if we have some data
-        if lag_stats or mrp_stats:
-            transport_lag_str = lag_stats.get('transport lag', '0')
-            apply_lag_str = lag_stats.get('apply lag', '0')
-            
-            transport_lag_hours = parse_lag_to_hours_str(transport_lag_str)
-            apply_lag_hours = parse_lag_to_hours_str(apply_lag_str)
 
-            overall_status = "UNKNOWN"
-            try:
-                # Convert hours to float for comparison
-                transport_lag_float = float(transport_lag_hours)
-                apply_lag_float = float(apply_lag_hours)
-                
-                # A small threshold accounts for minor float inaccuracies or very brief lag.
-                zero_threshold = 0.02 # ~1 minute
-                five_min_threshold = 0.083 # 5 minutes in hours
-                
-                if apply_lag_float <= zero_threshold and transport_lag_float <= zero_threshold:
-                    overall_status = "SYNCHRONIZED"
-                elif transport_lag_float > five_min_threshold:
-                    overall_status = "LAGGING"
-                elif transport_lag_float > zero_threshold and transport_lag_float <= five_min_threshold:
-                     overall_status = "NEAR SYNCHRONIZE"
-                elif mrp_stats.get('status') == 'APPLYING_LOG':
-                    overall_status = "APPLYING"
-                else:
-                    # Fallback if conditions are ambiguous
-                    overall_status = mrp_stats.get('status', 'UNKNOWN').replace('_', ' ')
-
-            except (ValueError, TypeError):
-                overall_status = "UNKNOWN" # Handle if conversion fails
-
-
-            standbyStatus.append({
-                "name": "Standby",
-                "status": overall_status,
-                "transport_lag": transport_lag_hours,
-                "apply_lag": apply_lag_hours,
-                "mrp_status": mrp_stats.get("status", "N/A"),
-                "sequence": mrp_stats.get("sequence", 0),
-                "apply_rate_mb_s": round(apply_rate_mb_s, 2),
-            })
-
-
-    if cursor:
-        cursor.close()
+    current_performance = {
+        "cpu": kpis["cpuUsage"],
+        "memory": kpis["memoryUsage"],
+        "io_read": host["io_read"],
+        "io_write": host["io_write"],
+        "io_details": host["io_details"],
+        "network_up": host["network_up"],
+        "network_down": host["network_down"],
+        "active_sessions": kpis["activeSessions"]
+    }
+
+
+    # --- Active Sessions History is now collected from snapshots by the backend ---
+    activeSessionsHistory = []
+
+    target.stats.observe("cycle.collect_ms", (time.monotonic() - collect_started) * 1000)
+
 
     # --- Assemble the final data structure ---
     return {
-        "id": DB_SERVER_ID,
-        "dbName": DB_NAME,
+        "id": target.server_id,
+        "dbName": target.db_name,
         "timestamp": now.isoformat(),
         "dbIsUp": db_is_up,
         "dbStatus": db_status,
         "dbUptime": db_uptime_str,
         "osIsUp": psutil is not None,
-        "osInfo": os_info,
-        "hostUptime": host_uptime_str,
+        "osInfo": host["os_info"],
+        "hostUptime": host["host_uptime"],
         "kpis": kpis,
         "current_performance": current_performance,
-        "tablespaces": tablespaces,
-        "backups": backups,
-        "activeSessions": activeSessions,
-        "detailedActiveSessions": detailedActiveSessions,
+        "tablespaces": sections["tablespaces"],
+        "backups": sections["backups"],
+        "activeSessions": sections["active_sessions"],
+        "detailedActiveSessions": sections["detailed_sessions"],
+        # Lock trees worked out from the bs/bi columns above, so the dashboard does not have to
+        "blockingChains": analyze_blocking(sections["detailed_sessions"]),
         "activeSessionsHistory": activeSessionsHistory, # This is now populated by the backend
-        "alertLog": alertLog,
-        "diskUsage": diskUsage,
-        "topWaitEvents": topWaitEvents,
-        "standbyStatus": standbyStatus
+        "alertLog": sections["alert_log"],
+        "diskUsage": host["disk_usage"],
+        "topWaitEvents": sections["wait_events"],
+        "topSql": sections["top_sql"],
+        "standbyStatus": sections["standby"],
+        "agentStats": target.stats.snapshot()
+    }
+
+
+def build_down_payload(target, psutil, timestamp=None):
+    """
+    Minimal "down" report for a target whose database is unreachable.
+    This ensures the backend knows the agent is running but the DB is down.
+    """
+    now = timestamp or datetime.now(timezone.utc)
+    return {
+        "id": target.server_id,
+        "dbName": target.db_name,
+        "timestamp": now.isoformat(),
+        "dbIsUp": False,
+        "dbStatus": "DOWN",
+        "dbUptime": "N/A",
+        "osIsUp": psutil is not None,
+        "hostUptime": "N/A",
+        "osInfo": { "platform": platform.system(), "release": platform.release() } if psutil else None,
+        "kpis": { "cpuUsage": 0, "memoryUsage": 0, "activeSessions": 0, "memoryUsedGB": 0, "memoryTotalGB": 0 },
+        "current_performance": { "cpu": 0, "memory": 0, "io_read": 0, "io_write": 0, "io_details": [], "network_up": 0, "network_down": 0, "active_sessions": 0 },
+        "tablespaces": [], "backups": [], "activeSessions": [], "detailedActiveSessions": [],
+        "activeSessionsHistory": [], "alertLog": [], "diskUsage": [], "topWaitEvents": [], "standbyStatus": [],
+        "agentStats": target.stats.snapshot()
     }
 
 
-def send_data(data):
-    """Sends data to the central server."""
+def get_transport():
+    """Returns the shared transport, creating it (and its keep-alive session) on first use."""
+    global transport
+    if transport is None:
+        # One connection per concurrently reporting target, so keep-alive connections are reused
+        transport = Transport(SERVER_URL, pool_size=TARGET_WORKERS)
+    return transport
+
+
+def response_body(response):
+    """The server's JSON reply, or {} when there is none."""
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def send_data(target, data):
+    """Sends one target's report to the central server. Undelivered reports are spooled for later replay."""
+    report_transport = get_transport()
+    payload = target.payload_schema.encode(target.delta_encoder.encode(data))
     try:
-        headers = {'Content-Type': 'application/json'}
-        # Use a more compact representation for network transfer
-        response = requests.post(SERVER_URL, data=json.dumps(data, indent=2), headers=headers)
-        response.raise_for_status()
-        print(f"[{datetime.now(timezone.utc).isoformat()}] Successfully sent data. Server responded with: {response.status_code}")
+        send_started = time.monotonic()
+        response = report_transport.send(payload)
+        target.stats.observe("send.http_ms", (time.monotonic() - send_started) * 1000)
+        target.stats.observe("send.raw_bytes", report_transport.last_raw_bytes)
+        target.stats.observe("send.wire_bytes", report_transport.last_wire_bytes)
+        ratio = report_transport.last_wire_bytes / report_transport.last_raw_bytes if report_transport.last_raw_bytes else 1
+        print(f"[{datetime.now(timezone.utc).isoformat()}] [{target.server_id}] Successfully sent data "
+              f"({report_transport.last_raw_bytes} bytes, {report_transport.last_wire_bytes} on the wire, {ratio:.0%}). "
+              f"Server responded with: {response.status_code}")
+        reply = response_body(response)
+        if reply.get("resync"):
+            print(f"[{target.server_id}] Server has no previous snapshot for this target; the next report will be sent in full.")
+            target.delta_encoder.force_keyframe()
+        schema_version = target.payload_schema.version
+        target.payload_schema.negotiate(reply)
+        if target.payload_schema.version != schema_version:
+            print(f"[{target.server_id}] Sending reports with payload schema version {target.payload_schema.version}.")
+        # The server is reachable again, so start draining any backlog right away
+        if spool_replayer and len(report_spool):
+            spool_replayer.notify()
     except requests.exceptions.RequestException as e:
-        print(f"[{datetime.now(timezone.utc).isoformat()}] Error sending data: {e}")
+        target.stats.increment("send.errors")
+        print(f"[{datetime.now(timezone.utc).isoformat()}] [{target.server_id}] Error sending data: {e}")
+        # The server may not have seen the sections this delta left out, so resend everything next time
+        target.delta_encoder.force_keyframe()
+        # The server may have changed too; renegotiate the schema with the next reply
+        target.payload_schema.reset()
+        # Spool the full report: replayed reports must not depend on a snapshot the server may not have
+        spool_report(target, data, "server unreachable")
+
+
+def collect_target(target, psutil, host_metrics, timestamp):
+    """One collection for one target: its full report, or a "down" report. Runs on a worker thread."""
+    # Only collect data if the pool can reach the database.
+    # While a reconnect backoff is running this returns False without a network round-trip.
+    if target.pool.connect():
+        data = collect_real_data(target, psutil, host_metrics, timestamp)
+        apply_burst_mode(target, data)
+        return data
+    print(f"[{target.server_id}] Skipping data collection because database connection is not available.")
+    return build_down_payload(target, psutil, timestamp)
+
+
+def apply_burst_mode(target, data):
+    """
+    Checks the report for spikes (starting or extending a burst) and attaches the
+    burst state and the tagged high-resolution samples taken since the last report.
+    """
+    reasons = target.anomalies.observe(data)
+    if reasons:
+        was_active = target.burst.active()
+        target.burst.trigger(reasons)
+        if not was_active:
+            print(f"[{target.server_id}] Anomaly detected ({'; '.join(reasons)}). "
+                  f"Burst sampling every {HIGH_RES_INTERVAL_SECONDS}s for {BURST_DURATION_SECONDS}s.")
+    status = target.burst.status()
+    samples = target.burst.drain()
+    if status:
+        data["burst"] = status
+    if samples:
+        data["burstSamples"] = samples
+
+
+def next_tick(now, period=FREQUENCY_SECONDS):
+    """The next wall-clock grid point strictly after `now` (epoch seconds)."""
+    return (math.floor(now / period) + 1) * period
+
+
+def spool_report(target, data, reason):
+    if report_spool is not None:
+        report_spool.append(data)
+        print(f"[{target.server_id}] Report spooled ({reason}); {len(report_spool)} waiting.")
+
+
+def enqueue_report(queue, target, data):
+    """
+    Hands a report to the senders without ever blocking collection. When the
+    queue is full the oldest report moves to the spool, which replays it later.
+    """
+    if queue.full():
+        old_target, old_data = queue.get_nowait()
+        queue.task_done()
+        old_target.stats.increment("send.queue_overflows")
+        spool_report(old_target, old_data, "senders are falling behind")
+    queue.put_nowait((target, data))
+
+
+async def sender_loop(queue, send_executor, send_locks):
+    loop = asyncio.get_running_loop()
+    while True:
+        target, data = await queue.get()
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, so each target's reports (and deltas) stay in order
+            async with send_locks[target.server_id]:
+                await loop.run_in_executor(send_executor, send_data, target, data)
+        except Exception as e:
+            print(f"[{target.server_id}] Unexpected error while sending: {e}")
+        finally:
+            queue.task_done()
+
+
+async def collect_and_enqueue(target, psutil, host_metrics, timestamp, queue, target_executor):
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(target_executor, collect_target, target, psutil, host_metrics, timestamp)
+    except Exception as e:
+        print(f"[{target.server_id}] Collection cycle failed: {e}")
+        return
+    if data:
+        metrics_cache.update(data, timestamp.timestamp())
+        if PUSH_REPORTS:
+            enqueue_report(queue, target, data)
+
+
+async def run_agent(targets, psutil, target_executor, host_executor, send_executor):
+    """
+    Fires a collection tick for every target on the FREQUENCY_SECONDS wall-clock grid.
+    A target whose previous collection is still running skips the tick instead of
+    shifting the schedule; sending happens concurrently in the sender tasks.
+    """
+    queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    send_locks = {target.server_id: asyncio.Lock() for target in targets}
+    senders = [asyncio.create_task(sender_loop(queue, send_executor, send_locks)) for _ in range(SENDER_CONCURRENCY)]
+    in_flight = {}
+
+    try:
+        tick = next_tick(time.time())
+        while True:
+            await asyncio.sleep(max(0.0, tick - time.time()))
+            timestamp = datetime.fromtimestamp(tick, timezone.utc)
+
+            # Host metrics are sampled once per tick and shared; targets start their database work meanwhile
+            host_metrics = host_executor.submit(collect_os_metrics, psutil)
+            for target in targets:
+                running = in_flight.get(target.server_id)
+                if running and not running.done():
+                    print(f"[{target.server_id}] Previous collection is still running; skipping the {timestamp.isoformat()} tick.")
+                    target.stats.increment("cycle.skipped_ticks")
+                    continue
+                in_flight[target.server_id] = asyncio.create_task(
+                    collect_and_enqueue(target, psutil, host_metrics, timestamp, queue, target_executor))
+
+            following = next_tick(time.time())
+            if following - tick > FREQUENCY_SECONDS:
+                print(f"Warning: Scheduling fell behind; skipped {int((following - tick) / FREQUENCY_SECONDS) - 1} tick(s).")
+            tick = following
+    finally:
+        for task in senders + list(in_flight.values()):
+            task.cancel()
+
 
 def main():
     """Main loop for the agent."""
-    print(f"Starting agent for server '{DB_SERVER_ID}'...")
+    global report_spool, spool_replayer
+    targets = get_targets()
+    print(f"Starting agent for server(s) {', '.join(repr(t.server_id) for t in targets)}...")
     print(f"Will send data to '{SERVER_URL}' every {FREQUENCY_SECONDS} seconds.")
 
-    connection = None
+    # Worker threads are shared by all targets, so they grow with the targets only up to a cap
+    collector_executor = create_executor(min(MAX_COLLECTOR_WORKERS, SECTION_WORKERS * len(targets)))
+    # Separate pools for target collections (they wait on section futures from the collector
+    # pool and on the host metrics), host sampling and blocking HTTP sends
+    target_executor = ThreadPoolExecutor(max_workers=min(TARGET_WORKERS, len(targets)), thread_name_prefix="target")
+    host_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="host")
+    send_executor = ThreadPoolExecutor(max_workers=SENDER_CONCURRENCY, thread_name_prefix="sender")
+    for target in targets:
+        target.attach(collector_executor)
+
+    report_spool = Spool()
+    spool_replayer = SpoolReplayer(report_spool, SERVER_URL)
+    spool_replayer.start()
+    # Local pull endpoint for the same agentStats that are attached to each report
+    local_api = LocalApiServer()
+    local_api.add_route("/stats", lambda query: {target.server_id: target.stats.snapshot() for target in targets})
     psutil = get_psutil()
     if not psutil:
         print("Could not import psutil. OS metrics will not be collected.")
+    else:
+        # Baseline reading so the first report already has CPU, disk and network rates
+        get_os_sampler(psutil).prime()
+    # Seconds-resolution host and session metrics between reports, pulled via GET /highres
+    high_res_sampler = HighResSampler(targets, psutil)
+    local_api.add_route("/highres", high_res_sampler.snapshot)
+    if METRICS_EXPORTER_ENABLED:
+        local_api.add_route("/metrics", metrics_cache.render)
+    local_api.start()
+    high_res_sampler.start()
 
 
     try:
-        while True:
-            # Check for a valid connection at the start of the loop
-            is_connection_healthy = False
-            if connection:
-                try:
-                    # A quick check to see if the connection is still alive
-                    connection.ping()
-                    is_connection_healthy = True
-                except Exception as ping_e:
-                    print(f"Connection ping failed: {ping_e}. Attempting to reconnect.")
-                    is_connection_healthy = False
-                    try:
-                        connection.close() # Close the broken connection
-                    except Exception:
-                        pass # Ignore errors on closing a broken connection
-                    connection = None
-
-            if not is_connection_healthy:
-                print("Attempting to (re)connect to the database...")
-                connection = get_db_connection() # This will be None if connection fails
-
-            # Only collect and send data if the connection is healthy
-            if connection:
-                data = collect_real_data(connection, psutil)
-                if data:
-                    send_data(data)
-            else:
-                print("Skipping data collection because database connection is not available.")
-                # If connection is None, send a minimal "down" payload
-                # This ensures the backend knows the agent is running but the DB is down.
-                now = datetime.now(timezone.utc)
-                down_payload = {
-                    "id": DB_SERVER_ID,
-                    "dbName": DB_NAME,
-                    "timestamp": now.isoformat(),
-                    "dbIsUp": False,
-                    "dbStatus": "DOWN",
-                    "dbUptime": "N/A",
-                    "osIsUp": psutil is not None,
-                    "hostUptime": "N/A",
-                    "osInfo": { "platform": platform.system(), "release": platform.release() } if psutil else None,
-                    "kpis": { "cpuUsage": 0, "memoryUsage": 0, "activeSessions": 0, "memoryUsedGB": 0, "memoryTotalGB": 0 },
-                    "current_performance": { "cpu": 0, "memory": 0, "io_read": 0, "io_write": 0, "io_details": [], "network_up": 0, "network_down": 0, "active_sessions": 0 },
-                    "tablespaces": [], "backups": [], "activeSessions": [], "detailedActiveSessions": [],
-                    "activeSessionsHistory": [], "alertLog": [], "diskUsage": [], "topWaitEvents": [], "standbyStatus": []
-                }
-                send_data(down_payload)
-
-                
-            time.sleep(FREQUENCY_SECONDS)
-            
+        asyncio.run(run_agent(targets, psutil, target_executor, host_executor, send_executor))
+    except KeyboardInterrupt:
+        print("Agent stopped.")
     finally:
-        if connection:
-            connection.close()
-            print("--- DATABASE DISCONNECTED ---")
+        high_res_sampler.stop()
+        for target in targets:
+            target.close()
+        for executor in (collector_executor, target_executor, host_executor, send_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
+        local_api.stop()
+        spool_replayer.stop()
+        report_spool.close()
+        if transport:
+            transport.close()
 
 
 if __name__ == "__main__":
     main()
-
-    
-
-    
-
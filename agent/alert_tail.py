@@ -0,0 +1,151 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+
+# --- Alert Log Tailing Configuration ---
+# How far back the reported alert log window reaches
+ALERT_LOG_WINDOW = timedelta(days=2)
+# Upper bound on entries kept (and reported) during an error storm
+ALERT_LOG_MAX_ENTRIES = 500
+
+# Both queries return the UTC timestamp (for the high-water mark), the display timestamp and the message.
+# The bind is a naive UTC datetime. ORIGINATING_TIMESTAMP is TIMESTAMP WITH TIME ZONE, and a plain
+# timestamp would be read in the session time zone, so it is tagged as UTC on the database side.
+ALERT_LOG_QUERIES = {
+    "V$DIAG_ALERT_EXT": """
+        SELECT SYS_EXTRACT_UTC(ORIGINATING_TIMESTAMP), TO_CHAR(ORIGINATING_TIMESTAMP, 'YYYY-MM-DD HH24:MI:SS'), MESSAGE_TEXT
+        FROM V$DIAG_ALERT_EXT
+        WHERE (MESSAGE_TEXT LIKE 'ORA-%' OR MESSAGE_TEXT LIKE 'TNS-%')
+        AND ORIGINATING_TIMESTAMP >= FROM_TZ(CAST(:1 AS TIMESTAMP), 'UTC')
+        ORDER BY ORIGINATING_TIMESTAMP
+    """,
+    "sys.x$dbgalertext": """
+        SELECT SYS_EXTRACT_UTC(ORIGINATING_TIMESTAMP), TO_CHAR(ORIGINATING_TIMESTAMP, 'YYYY-MM-DD HH24:MI:SS'), message_text
+        FROM sys.x$dbgalertext
+        WHERE (message_text LIKE 'ORA-%' OR message_text LIKE 'TNS-%')
+        AND ORIGINATING_TIMESTAMP >= FROM_TZ(CAST(:1 AS TIMESTAMP), 'UTC')
+        ORDER BY ORIGINATING_TIMESTAMP
+    """,
+}
+
+
+def alert_entry_id(timestamp, message):
+    """Content-based id, stable across agent restarts (unlike Python's randomised hash())."""
+    digest = hashlib.blake2b(f"{timestamp}|{message}".encode("utf-8"), digest_size=8).hexdigest()
+    return f"log_{timestamp}_{digest}"
+
+
+class AlertLogTailer:
+    """
+    Reads only alert log rows newer than the last one seen, and keeps the
+    rolling two-day window of ORA-/TNS- entries that the dashboard displays.
+    The high-water mark and the window are persisted in the agent state file.
+    """
+
+    def __init__(self, state_store, state_key="alert_log"):
+        self.state_store = state_store
+        self.state_key = state_key
+        state = state_store.get(state_key) or {}
+        self.source = state.get("source")
+        # UTC ISO timestamp of the newest row read so far
+        self.high_water_mark = state.get("hwm")
+        self.entries = state.get("entries", [])
+        self._known_ids = {entry["id"] for entry in self.entries}
+        # A section that overran its timeout may still be polling when the next cycle starts
+        self._lock = threading.Lock()
+
+    def _save(self):
+        self.state_store.set(self.state_key, {
+            "source": self.source,
+            "hwm": self.high_water_mark,
+            "entries": self.entries,
+        })
+
+    def _since(self, now):
+        """Start of the next read as a naive UTC datetime (the bind of ALERT_LOG_QUERIES)."""
+        since = now - ALERT_LOG_WINDOW
+        if self.high_water_mark:
+            # Rows at exactly the high-water mark are re-read and dropped by id, so none are missed
+            hwm = datetime.fromisoformat(self.high_water_mark).replace(tzinfo=timezone.utc)
+            since = max(since, hwm)
+        return since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _fetch(self, cursor, execute_query, since, capabilities):
+        """Runs the query against the known source, or discovers a working one."""
+        if self.source and capabilities and not capabilities.can_read(self.source):
+            self.source = None
+        if self.source:
+            try:
+                return execute_query(cursor, ALERT_LOG_QUERIES[self.source], params=[since])
+            except PermissionError:
+                raise
+            except Exception:
+                # Already printed; nothing was read, so the window and high-water mark stay as they are
+                return []
+
+        first_working = None
+        for source, query in ALERT_LOG_QUERIES.items():
+            if capabilities and not capabilities.can_read(source):
+                continue
+            try:
+                rows = execute_query(cursor, query, params=[since])
+            except PermissionError: # This will catch ORA-00942
+                print(f"INFO: Query on {source} failed (likely permissions or version). Will attempt fallback.")
+                continue
+            except Exception as e:
+                print(f"WARNING: Query on {source} failed with unexpected error: {e}")
+                continue
+            first_working = first_working or source
+            if rows:
+                self.source = source
+                break
+        else:
+            rows = []
+            # Nothing logged in the window: stay on the first view that answered
+            self.source = first_working
+
+        if self.source:
+            print(f"INFO: Tailing the alert log through {self.source}.")
+        else:
+            print("ERROR: Could not query the alert log (V$DIAG_ALERT_EXT and sys.x$dbgalertext may require specific grants).")
+        return rows
+
+    def poll(self, cursor, execute_query, capabilities=None):
+        """Fetches new rows, updates the window and returns it, newest first."""
+        with self._lock:
+            return self._poll(cursor, execute_query, capabilities)
+
+    def _poll(self, cursor, execute_query, capabilities):
+        now = datetime.now(timezone.utc)
+        rows = self._fetch(cursor, execute_query, self._since(now), capabilities)
+
+        changed = False
+        for utc_ts, display_ts, message in rows:
+            entry_id = alert_entry_id(display_ts, message)
+            if utc_ts is not None:
+                utc_iso = utc_ts.isoformat()
+                if not self.high_water_mark or utc_iso > self.high_water_mark:
+                    self.high_water_mark = utc_iso
+                    changed = True
+            if entry_id in self._known_ids:
+                continue
+            self._known_ids.add(entry_id)
+            self.entries.append({"id": entry_id, "timestamp": display_ts, "error_code": message, "utc": utc_ts.isoformat() if utc_ts else None})
+            changed = True
+
+        # Drop entries that have aged out of the window, and cap the window during error storms
+        cutoff = (now - ALERT_LOG_WINDOW).replace(tzinfo=None).isoformat()
+        kept = [entry for entry in self.entries if not entry.get("utc") or entry["utc"] >= cutoff]
+        kept = kept[-ALERT_LOG_MAX_ENTRIES:]
+        if len(kept) != len(self.entries):
+            self.entries = kept
+            self._known_ids = {entry["id"] for entry in kept}
+            changed = True
+
+        if changed:
+            self._save()
+
+        return [
+            {"id": entry["id"], "timestamp": entry["timestamp"], "error_code": entry["error_code"]}
+            for entry in reversed(self.entries)
+        ]
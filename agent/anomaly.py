@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# --- Anomaly Detection Configuration ---
+# Every report updates an exponentially weighted mean and variance per metric. A value
+# more than ANOMALY_THRESHOLD_SIGMA deviations above the mean (and at least the metric's
+# minimum change) starts a burst. Only spikes count; drops never trigger.
+ANOMALY_EWMA_ALPHA = 0.1 # ~10 reports (5 minutes at 30s) of memory
+ANOMALY_THRESHOLD_SIGMA = 4.0
+ANOMALY_WARMUP_SAMPLES = 10
+ANOMALY_MIN_CHANGE = {"cpu": 15.0, "active_sessions": 5.0, "io_read": 20.0, "io_write": 20.0, "wait": 5.0}
+ANOMALY_MAX_WAIT_EVENTS = 50
+
+# --- Burst Mode Configuration ---
+# While a burst runs, the high-resolution sampler (high_res.py) also captures per-event
+# session/wait counts every HIGH_RES_INTERVAL_SECONDS; they are attached to the next
+# report as tagged `burstSamples`.
+BURST_DURATION_SECONDS = 300
+BURST_MAX_SAMPLES = 300 # Kept if reports cannot be built meanwhile (e.g. the DB is down)
+
+
+class EwmaDetector:
+    """Streaming mean/variance of one metric; update() tells whether a value is a spike."""
+
+    def __init__(self, min_change, alpha=ANOMALY_EWMA_ALPHA, threshold=ANOMALY_THRESHOLD_SIGMA,
+                 warmup=ANOMALY_WARMUP_SAMPLES):
+        self.min_change = min_change
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.mean = None
+        self.variance = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.mean is None:
+            self.mean = value
+            self.count = 1
+            return False
+        deviation = value - self.mean
+        # Judge against the baseline before the value is folded into it
+        spike = self.count >= self.warmup and deviation > max(self.threshold * math.sqrt(self.variance), self.min_change)
+        increment = self.alpha * deviation
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + deviation * increment)
+        self.count += 1
+        return spike
+
+
+class AnomalyMonitor:
+    """Per-target detectors for the current_performance KPIs and the top wait event counts."""
+
+    def __init__(self):
+        self.detectors = {metric: EwmaDetector(ANOMALY_MIN_CHANGE[metric])
+                          for metric in ("cpu", "active_sessions", "io_read", "io_write")}
+        self.wait_detectors = {}
+
+    def observe(self, data):
+        """Feeds one report; returns a list of human-readable reasons for any spikes."""
+        reasons = []
+        perf = data.get("current_performance") or {}
+        for metric, detector in self.detectors.items():
+            value = perf.get(metric)
+            if value is not None and detector.update(value):
+                reasons.append(f"{metric}={value:g} (baseline {detector.mean:.1f})")
+
+        for event in data.get("topWaitEvents") or []:
+            name = event.get("event")
+            detector = self.wait_detectors.get(name)
+            if detector is None:
+                if len(self.wait_detectors) >= ANOMALY_MAX_WAIT_EVENTS:
+                    continue
+                detector = self.wait_detectors[name] = EwmaDetector(ANOMALY_MIN_CHANGE["wait"])
+            if detector.update(event.get("value") or 0):
+                reasons.append(f"wait '{name}'={event.get('value')} (baseline {detector.mean:.1f})")
+        return reasons
+
+
+class BurstMode:
+    """
+    Burst state of one target. trigger() starts (or extends) a burst; the sampler
+    records tagged samples while active() and the report cycle drains them.
+    """
+
+    def __init__(self, duration=BURST_DURATION_SECONDS):
+        self.duration = duration
+        self.started = None
+        self.until = 0.0
+        self.reasons = []
+        self._samples = deque(maxlen=BURST_MAX_SAMPLES)
+        self._lock = threading.Lock()
+
+    def trigger(self, reasons, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if now >= self.until:
+                self.started = datetime.fromtimestamp(now, timezone.utc).isoformat()
+                self.reasons = []
+            self.until = now + self.duration
+            self.reasons = (self.reasons + [r for r in reasons if r not in self.reasons])[-10:]
+
+    def active(self, now=None):
+        return (time.time() if now is None else now) < self.until
+
+    def record(self, timestamp, active_sessions, waiting_sessions, waits):
+        with self._lock:
+            self._samples.append({
+                "timestamp": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+                "burst": self.started, # Tags every sample with the burst it belongs to
+                "active_sessions": active_sessions,
+                "waiting_sessions": waiting_sessions,
+                "waits": waits,
+            })
+
+    def drain(self):
+        with self._lock:
+            samples = list(self._samples)
+            self._samples.clear()
+        return samples
+
+    def status(self, now=None):
+        """The report's `burst` field, or None when no burst is running."""
+        now = time.time() if now is None else now
+        if not self.active(now):
+            return None
+        return {"started": self.started, "until": datetime.fromtimestamp(self.until, timezone.utc).isoformat(),
+                "reasons": list(self.reasons)}
@@ -0,0 +1,150 @@
+import threading
+import time
+from datetime import timedelta
+
+# --- ASH Reader Configuration ---
+# Length of the rolling wait-event window reported to the dashboard
+ASH_WINDOW = timedelta(minutes=15)
+# Samples from the last few seconds are re-read to catch late-arriving rows from other RAC
+# instances; already-consumed samples are skipped using the per-instance high-water mark.
+ASH_OVERLAP = timedelta(seconds=10)
+# The first poll reads the whole 15-minute window; fetch it in large batches
+ASH_ARRAYSIZE = 1000
+
+ASH_QUERY = """
+    SELECT inst_id, sample_id, sample_time, event, session_id, time_waited
+    FROM gv$active_session_history
+    WHERE {time_predicate}
+      AND event IS NOT NULL
+      AND wait_class <> 'Idle'
+"""
+ASH_INITIAL_PREDICATE = "sample_time > CAST(SYSTIMESTAMP AS TIMESTAMP) - INTERVAL '15' MINUTE"
+ASH_INCREMENTAL_PREDICATE = "sample_time > :since"
+# Used while no sample has been seen yet (idle database): look back just past the previous poll
+ASH_RELATIVE_PREDICATE = "sample_time > CAST(SYSTIMESTAMP AS TIMESTAMP) - NUMTODSINTERVAL(:seconds, 'SECOND')"
+
+
+class AshReader:
+    """
+    Consumes only new gv$active_session_history samples and keeps a rolling
+    per-minute, per-event aggregate in memory, so each cycle scans seconds of
+    ASH instead of the full 15-minute window.
+    """
+
+    def __init__(self):
+        # inst_id -> (sample_time, sample_id) of the newest sample consumed
+        self._high_water = {}
+        # minute -> event -> [set of (inst_id, session_id), total time_waited in microseconds]
+        self._minutes = {}
+        # Newest sample time seen, and the agent's monotonic clock when it was seen
+        self._latest_sample_time = None
+        self._latest_seen_at = None
+        self._last_poll_at = None
+        # A section that overran its timeout may still be polling when the next cycle starts
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._high_water.clear()
+            self._minutes.clear()
+            self._latest_sample_time = None
+            self._latest_seen_at = None
+            self._last_poll_at = None
+
+    def _query(self):
+        if self._last_poll_at is None:
+            return ASH_QUERY.format(time_predicate=ASH_INITIAL_PREDICATE), None
+        if self._latest_sample_time is None:
+            seconds = time.monotonic() - self._last_poll_at + ASH_OVERLAP.total_seconds()
+            return ASH_QUERY.format(time_predicate=ASH_RELATIVE_PREDICATE), [min(seconds, ASH_WINDOW.total_seconds())]
+        # Resume from the instance that is furthest behind, but never look back past the window
+        # (an instance that went down keeps an old mark)
+        since = min(sample_time for sample_time, _ in self._high_water.values()) - ASH_OVERLAP
+        since = max(since, self._latest_sample_time - ASH_WINDOW)
+        return ASH_QUERY.format(time_predicate=ASH_INCREMENTAL_PREDICATE), [since]
+
+    def _consume(self, rows):
+        """
+        Aggregates new samples. Nothing is applied until `rows` is exhausted: the query has no
+        ORDER BY, so after a failed fetch the marks could pass samples that were never read.
+        """
+        high_water = self._high_water
+        minutes = {}
+        new_marks = {}
+        for inst_id, sample_id, sample_time, event, session_id, time_waited in rows:
+            mark = high_water.get(inst_id)
+            # Sample times only grow per instance; a newer time with a lower id means the instance restarted
+            if mark is not None and (sample_time, sample_id) <= mark:
+                continue
+            if (sample_time, sample_id) > new_marks.get(inst_id, (sample_time, -1)):
+                new_marks[inst_id] = (sample_time, sample_id)
+
+            minute = sample_time.replace(second=0, microsecond=0)
+            events = minutes.get(minute)
+            if events is None:
+                events = minutes[minute] = {}
+            bucket = events.get(event)
+            if bucket is None:
+                bucket = events[event] = [set(), 0]
+            bucket[0].add((inst_id, session_id))
+            bucket[1] += time_waited or 0
+
+        for minute, events in minutes.items():
+            window_events = self._minutes.get(minute)
+            if window_events is None:
+                self._minutes[minute] = events
+                continue
+            for event, (sessions, time_waited) in events.items():
+                bucket = window_events.get(event)
+                if bucket is None:
+                    window_events[event] = [sessions, time_waited]
+                else:
+                    bucket[0] |= sessions
+                    bucket[1] += time_waited
+        for inst_id, mark in new_marks.items():
+            if inst_id not in high_water or mark > high_water[inst_id]:
+                high_water[inst_id] = mark
+            if self._latest_sample_time is None or mark[0] > self._latest_sample_time:
+                self._latest_sample_time = mark[0]
+                self._latest_seen_at = time.monotonic()
+
+    def _evict(self):
+        if self._latest_sample_time is None:
+            return
+        # Estimate the database clock from the newest sample, so an idle period still ages data out
+        db_now = self._latest_sample_time + timedelta(seconds=time.monotonic() - self._latest_seen_at)
+        cutoff = (db_now - ASH_WINDOW).replace(second=0, microsecond=0)
+        for minute in [m for m in self._minutes if m < cutoff]:
+            del self._minutes[minute]
+
+    def poll(self, cursor, stream_query):
+        """
+        Reads new samples and returns the window in the topWaitEvents format.
+        Rows are aggregated as they are fetched, never held as a list.
+        Raises PermissionError when ASH is not accessible.
+        """
+        with self._lock:
+            query, params = self._query()
+            self._consume(stream_query(cursor, query, params=params, arraysize=ASH_ARRAYSIZE))
+            self._last_poll_at = time.monotonic()
+            self._evict()
+            return self.top_wait_events()
+
+    def top_wait_events(self):
+        events_by_name = {}
+        for minute in sorted(self._minutes):
+            sample_time = minute.strftime('%Y-%m-%dT%H:%M:%SZ')
+            for event_name, (sessions, time_waited) in self._minutes[minute].items():
+                if event_name not in events_by_name:
+                    events_by_name[event_name] = { "event": event_name, "value": 0, "data": [] }
+                session_count = len(sessions)
+                events_by_name[event_name]["data"].append({
+                    "date": sample_time,
+                    "value": session_count,
+                    "latency": round(time_waited / 1000000, 4)
+                })
+                events_by_name[event_name]["value"] += session_count
+
+        topWaitEvents = list(events_by_name.values())
+        topWaitEvents.sort(key=lambda x: x['value'], reverse=True)
+        return topWaitEvents
@@ -0,0 +1,190 @@
+"""
+Offline benchmark for the agent's collection cycle. The real collectors run against
+FakeDatabase (scripted oracledb pool) and FakePsutil, and the script reports cycle
+latency, process CPU time, memory allocations and payload sizes.
+
+Run from the agent directory, e.g.:
+    python3 benchmarks/bench_agent.py --scale large
+    python3 benchmarks/bench_agent.py --sessions 10000 --tablespaces 500 --disks 100 --json > baseline.json
+    python3 benchmarks/bench_agent.py --scale large --compare baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import agent
+from collector_engine import create_executor
+from state_store import StateStore
+from targets import Target
+from transport import Transport
+
+from fake_oracledb import FakeDatabase, FakePool
+from fake_psutil import FakePsutil
+
+SCALES = {
+    "small": {"sessions": 200, "tablespaces": 20, "backups": 20, "alert_entries": 20, "disks": 4, "sql_cursors": 2000},
+    "large": {"sessions": 10000, "tablespaces": 500, "backups": 200, "alert_entries": 500, "disks": 100, "sql_cursors": 200000},
+}
+
+# Metrics where a higher value is a regression, checked by --compare
+COMPARED_METRICS = ("cycle_ms_p50", "cycle_ms_p95", "cpu_ms_avg", "alloc_peak_kb", "full_payload_bytes", "delta_payload_bytes")
+
+
+def build_target(database, state_path):
+    target = Target("bench", "BENCH", "fakehost", 1521, "bench", "bench", "bench",
+                    state_store=StateStore(state_path))
+    target.pool._create_pool = lambda: FakePool(database)
+    return target
+
+
+def run_cycle(target, psutil, host_executor):
+    host_metrics = host_executor.submit(agent.collect_os_metrics, psutil)
+    return agent.collect_target(target, psutil, host_metrics, datetime.now(timezone.utc))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+def run_benchmark(args):
+    view_latency = {view: ms * args.latency_scale for view, ms in FakeDatabase().view_latency_ms.items()}
+    database = FakeDatabase(sessions=args.sessions, tablespaces=args.tablespaces, backups=args.backups,
+                            alert_entries=args.alert_entries, sql_cursors=args.sql_cursors, latency_ms=args.latency_ms * args.latency_scale,
+                            view_latency_ms=view_latency)
+    psutil = FakePsutil(disks=args.disks)
+    transport = Transport("http://localhost/unused")
+    collector_executor = create_executor()
+    host_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="host")
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        target = build_target(database, os.path.join(tmp, "state.json"))
+        target.attach(collector_executor)
+        agent.get_os_sampler(psutil).prime()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                # The first cycle detects capabilities and loads the full ASH and alert log windows
+                started = time.perf_counter()
+                data = run_cycle(target, psutil, host_executor)
+                first_cycle_ms = (time.perf_counter() - started) * 1000
+                target.delta_encoder.encode(data)
+
+                cycle_ms, cpu_ms, delta_sizes = [], [], []
+                for _ in range(args.cycles):
+                    started, cpu_started = time.perf_counter(), time.process_time()
+                    data = run_cycle(target, psutil, host_executor)
+                    cycle_ms.append((time.perf_counter() - started) * 1000)
+                    cpu_ms.append((time.process_time() - cpu_started) * 1000)
+                    transport.encode(target.delta_encoder.encode(data))
+                    delta_sizes.append(transport.last_wire_bytes)
+
+                transport.encode(data)
+                full_raw, full_wire = transport.last_raw_bytes, transport.last_wire_bytes
+
+                # Separate pass: tracing allocations slows everything down, so it is not timed
+                tracemalloc.start()
+                peaks, retained = [], []
+                for _ in range(args.alloc_cycles):
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    run_cycle(target, psutil, host_executor)
+                    current, peak = tracemalloc.get_traced_memory()
+                    peaks.append((peak - before) / 1024)
+                    retained.append((current - before) / 1024)
+                tracemalloc.stop()
+        finally:
+            with contextlib.redirect_stdout(devnull):
+                target.close()
+            collector_executor.shutdown(wait=False, cancel_futures=True)
+            host_executor.shutdown(wait=False)
+            transport.close()
+
+    return {
+        "scale": {key: getattr(args, key) for key in ("sessions", "tablespaces", "backups", "alert_entries", "disks", "sql_cursors")},
+        "cycles": args.cycles,
+        "first_cycle_ms": round(first_cycle_ms, 1),
+        "cycle_ms_p50": round(percentile(cycle_ms, 0.5), 1),
+        "cycle_ms_p95": round(percentile(cycle_ms, 0.95), 1),
+        "cpu_ms_avg": round(statistics.mean(cpu_ms), 1),
+        "alloc_peak_kb": round(max(peaks), 1) if peaks else None,
+        "alloc_retained_kb": round(statistics.mean(retained), 1) if retained else None,
+        "full_payload_raw_bytes": full_raw,
+        "full_payload_bytes": full_wire,
+        "delta_payload_bytes": round(statistics.mean(delta_sizes)),
+        "statements_executed": database.executions,
+    }
+
+
+def print_report(result):
+    print(f"Scale: {', '.join(f'{key}={value}' for key, value in result['scale'].items())}")
+    print(f"  first cycle          {result['first_cycle_ms']:>10} ms")
+    print(f"  cycle latency p50    {result['cycle_ms_p50']:>10} ms")
+    print(f"  cycle latency p95    {result['cycle_ms_p95']:>10} ms")
+    print(f"  CPU time per cycle   {result['cpu_ms_avg']:>10} ms")
+    print(f"  allocation peak      {result['alloc_peak_kb']:>10} KB")
+    print(f"  retained per cycle   {result['alloc_retained_kb']:>10} KB")
+    print(f"  full payload         {result['full_payload_bytes']:>10} bytes on the wire ({result['full_payload_raw_bytes']} raw)")
+    print(f"  delta payload        {result['delta_payload_bytes']:>10} bytes on the wire")
+    print(f"  statements executed  {result['statements_executed']:>10}")
+
+
+def compare(result, baseline_path, tolerance):
+    """Prints the change against a baseline; returns False if any metric regressed beyond the tolerance."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    ok = True
+    for metric in COMPARED_METRICS:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"  {metric:<22} {old:>10} -> {new:<10} {change:+.0%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent's collection cycle against a fake database.")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="preset for the row counts below")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--tablespaces", type=int, default=20)
+    parser.add_argument("--backups", type=int, default=30)
+    parser.add_argument("--alert-entries", type=int, default=50)
+    parser.add_argument("--disks", type=int, default=4)
+    parser.add_argument("--sql-cursors", type=int, default=2000, help="cursors in the fake V$SQLSTATS")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--alloc-cycles", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="round-trip latency of views without an override")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for all latencies; 0 measures pure agent cost")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON (e.g. to save a baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON result of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+    if args.scale:
+        for key, value in SCALES[args.scale].items():
+            setattr(args, key, value)
+
+    result = run_benchmark(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    if args.compare and not compare(result, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Scripted stand-in for an oracledb session pool. Every statement the agent runs is
+answered by FakeDatabase with synthetic rows at a configurable scale, after a
+configurable per-view latency, so collection can be benchmarked without Oracle.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+# Default latency of one round-trip, and per-view overrides (milliseconds)
+DEFAULT_LATENCY_MS = 1.0
+VIEW_LATENCY_MS = {
+    "dba_free_space": 40.0,
+    "v$rman_backup_job_details": 15.0,
+    "gv$session": 5.0,
+    "gv$active_session_history": 20.0,
+    "v$diag_alert_ext": 25.0,
+    "v$sqlstats": 10.0,
+}
+
+WAIT_EVENTS = (
+    "db file sequential read", "db file scattered read", "log file sync",
+    "enq: TX - row lock contention", "latch: cache buffers chains", "direct path read",
+    "read by other session", "gc buffer busy acquire", "CPU quantum", "library cache lock",
+)
+
+
+class FakeDatabase:
+    """Synthetic contents of the V$/DBA views the collectors query."""
+
+    def __init__(self, sessions=500, tablespaces=20, backups=30, alert_entries=50, ash_active=None,
+                 sql_cursors=2000, role="PRIMARY", banner="Oracle Database 19c Enterprise Edition",
+                 latency_ms=DEFAULT_LATENCY_MS, view_latency_ms=None):
+        self.sessions = sessions
+        self.tablespaces = tablespaces
+        self.backups = backups
+        self.alert_entries = alert_entries
+        # Active sessions per ASH sample (ASH only records active sessions)
+        self.ash_active = max(1, sessions // 20) if ash_active is None else ash_active
+        # Cursors in the shared pool; each poll sees a hot set plus a rotating share of the rest as active
+        self.sql_cursors = sql_cursors
+        self.sql_hot = max(1, min(500, sql_cursors // 100))
+        self.sql_active = max(1, sql_cursors // 20)
+        self._sql_polls = 0
+        self.role = role
+        self.banner = banner
+        self.latency_ms = latency_ms
+        self.view_latency_ms = dict(VIEW_LATENCY_MS if view_latency_ms is None else view_latency_ms)
+        self.startup_time = datetime.now() - timedelta(days=3)
+        self.executions = 0
+
+        # Query routing: the first matching substring wins, so more specific views come first
+        self._routes = [
+            ("where 1 = 0", lambda params: []),
+            ("sys_context('userenv', 'database_role')", lambda params: [(self.role,)]),
+            ("from dual", lambda params: [(1,)]),
+            ("select version from v$instance", lambda params: [("19.0.0.0.0",)]),
+            ("v$instance", lambda params: [("OPEN", self.startup_time)]),
+            ("v$database", lambda params: [(self.role,)]),
+            ("v$version", lambda params: [(self.banner,)]),
+            ("v$parameter", lambda params: [("DIAGNOSTIC+TUNING",)]),
+            ("dba_free_space", self._tablespace_rows),
+            ("v$rman_backup_job_details", self._backup_rows),
+            ("gv$active_session_history", self._ash_rows),
+            ("v$diag_alert_ext", self._alert_rows),
+            ("x$dbgalertext", self._alert_rows),
+            ("substr(sql_text", self._sql_text_rows),
+            ("v$sqlstats", self._sqlstats_rows),
+            ("gv$session", self._detailed_session_rows),
+            ("count(*) from v$session", lambda params: [(self._active_count(),)]),
+            ("group by event", self._wait_snapshot_rows),
+            ("v$session", self._session_rows),
+            ("v$dataguard_stats", lambda params: [("transport lag", "+00 00:00:05"), ("apply lag", "+00 00:00:09")]),
+            ("v$managed_standby", lambda params: [("MRP0", "APPLYING_LOG", 4711)]),
+            ("v$recovery_progress", lambda params: [(2048,)]),
+        ]
+
+    def _active_count(self):
+        return max(1, self.sessions // 10)
+
+    def route(self, query):
+        lowered = " ".join(query.lower().split())
+        for pattern, handler in self._routes:
+            if pattern in lowered:
+                return pattern, handler
+        return None, lambda params: []
+
+    def latency_for(self, pattern):
+        return self.view_latency_ms.get(pattern, self.latency_ms) / 1000
+
+    def _tablespace_rows(self, params):
+        return [(f"TS_{i:04d}", 100.0 + i, 50.0 + (i % 50), round((50.0 + (i % 50)) / (100.0 + i) * 100, 2))
+                for i in range(self.tablespaces)]
+
+    def _backup_rows(self, params):
+        start = datetime.now() - timedelta(days=7)
+        rows = []
+        for i in range(self.backups):
+            began = start + timedelta(hours=i * 5)
+            rows.append((1000 + i, began.strftime("%Y-%m-%d %H:%M:%S"),
+                         (began + timedelta(minutes=42)).strftime("%Y-%m-%d %H:%M:%S"),
+                         "FAILED" if i % 17 == 0 else "COMPLETED", 50 * 1024**3, 12 * 1024**3, 2520))
+        return rows
+
+    def _session_rows(self, params):
+        return [(sid, f"APP_USER_{sid % 40}", "JDBC Thin Client") for sid in range(1, self._active_count() + 1)]
+
+    def _detailed_session_rows(self, params):
+        rows = []
+        for sid in range(1, self.sessions + 1):
+            rows.append((1 + sid % 2, sid, f"APP_USER_{sid % 40}", f"{sid % 997:013x}", "ACTIVE",
+                         WAIT_EVENTS[sid % len(WAIT_EVENTS)], sid % 300, 70000 + sid % 50,
+                         sid - 1 if sid % 97 == 0 else None, 1 if sid % 97 == 0 else None,
+                         "order_service", f"app{sid % 12:02d}.example.com", "unknown"))
+        return rows
+
+    def _wait_snapshot_rows(self, params):
+        return [(event, self.sessions // len(WAIT_EVENTS)) for event in WAIT_EVENTS]
+
+    def _ash_rows(self, params):
+        """One sample per second since the requested point, `ash_active` sessions per sample."""
+        now = datetime.now()
+        if params and isinstance(params[0], datetime):
+            since = params[0].replace(tzinfo=None)
+        elif params:
+            since = now - timedelta(seconds=float(params[0]))
+        else:
+            since = now - timedelta(minutes=15)
+        first = int(since.timestamp()) + 1
+        rows = []
+        for second in range(first, int(now.timestamp()) + 1):
+            sample_time = datetime.fromtimestamp(second)
+            for session in range(self.ash_active):
+                rows.append((1 + session % 2, second, sample_time, WAIT_EVENTS[(second + session) % len(WAIT_EVENTS)],
+                             session, 1500 + session))
+        return rows
+
+    def _sqlstats_rows(self, params):
+        """Cumulative counters of the cursors active since the requested point."""
+        self._sql_polls += 1
+        poll = self._sql_polls
+        # The first (look-back) poll sees a larger share of the pool
+        count = min(self.sql_cursors, self.sql_active * (30 if params and not isinstance(params[0], datetime) else 1))
+        first = (poll * self.sql_active) % max(1, self.sql_cursors)
+        now = datetime.now().replace(microsecond=0)
+        rotating = ((first + offset) % self.sql_cursors for offset in range(count))
+        rows = []
+        for cursor in dict.fromkeys([*range(self.sql_hot), *rotating]):
+            executions = poll * (1 + cursor % 50)
+            rows.append((f"{cursor:013x}", 1000 + cursor % 7, executions * (500 + cursor % 9000), executions * 400,
+                         executions * (10 + cursor % 300), executions, now))
+        return rows
+
+    def _sql_text_rows(self, params):
+        return [(sql_id, f"SELECT /* {sql_id} */ * FROM orders WHERE id = :1") for sql_id in params or []]
+
+    def _alert_rows(self, params):
+        since = params[0] if params else datetime.now(timezone.utc) - timedelta(days=2)
+        since = since.replace(tzinfo=None) if isinstance(since, datetime) else since
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=2)
+        step = timedelta(days=2) / max(1, self.alert_entries)
+        rows = []
+        for i in range(self.alert_entries):
+            utc = start + step * i
+            if isinstance(since, datetime) and utc < since:
+                continue
+            rows.append((utc, utc.strftime("%Y-%m-%d %H:%M:%S"), f"ORA-{(i * 37) % 9999:05d}: synthetic error {i}"))
+        return rows
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.rowfactory = None
+        self._rows = []
+        self._position = 0
+
+    def execute(self, query, params=None):
+        database = self.connection.database
+        database.executions += 1
+        pattern, handler = database.route(query)
+        time.sleep(database.latency_for(pattern))
+        self._rows = handler(params)
+        self._position = 0
+        self.rowfactory = None # oracledb resets it on every execute
+
+    def _take(self, count):
+        # Every batch after the prefetched rows costs one more network round-trip
+        if self._position >= self.prefetchrows:
+            time.sleep(self.connection.database.latency_ms / 1000)
+        rows = self._rows[self._position:self._position + count]
+        self._position += len(rows)
+        if self.rowfactory is not None:
+            rows = [self.rowfactory(*row) for row in rows]
+        return rows
+
+    def fetchone(self):
+        rows = self._take(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=None):
+        return self._take(size or self.arraysize)
+
+    def fetchall(self):
+        rows = []
+        while True:
+            batch = self._take(self.arraysize)
+            if not batch:
+                return rows
+            rows.extend(batch)
+
+    def __iter__(self):
+        while True:
+            batch = self._take(self.arraysize)
+            if not batch:
+                return
+            yield from batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.call_timeout = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def ping(self):
+        time.sleep(self.database.latency_ms / 1000)
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """Drop-in for the object returned by oracledb.create_pool()."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def acquire(self):
+        return FakeConnection(self.database)
+
+    def release(self, connection):
+        pass
+
+    def close(self, force=False):
+        pass
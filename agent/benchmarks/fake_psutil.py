@@ -0,0 +1,63 @@
+"""
+Synthetic stand-in for the parts of psutil the agent uses. Cumulative counters
+grow with wall-clock time so the OS sampler computes plausible, non-zero rates.
+"""
+import time
+from collections import namedtuple
+
+scputimes = namedtuple("scputimes", "user nice system idle iowait irq softirq steal guest guest_nice")
+svmem = namedtuple("svmem", "total available percent used free")
+sdiskio = namedtuple("sdiskio", "read_count write_count read_bytes write_bytes read_time write_time")
+snetio = namedtuple("snetio", "bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout")
+sdiskpart = namedtuple("sdiskpart", "device mountpoint fstype opts")
+sdiskusage = namedtuple("sdiskusage", "total used free percent")
+
+
+class FakePsutil:
+    """Host with `disks` block devices, each with one mounted partition."""
+
+    def __init__(self, disks=4, cpus=16):
+        self.disks = disks
+        self.cpus = cpus
+        self._started = time.monotonic()
+        self._boot_time = time.time() - 86400 * 12
+
+    def _elapsed(self):
+        return time.monotonic() - self._started
+
+    def cpu_times(self):
+        elapsed = self._elapsed() * self.cpus
+        return scputimes(user=elapsed * 0.25, nice=0.0, system=elapsed * 0.08, idle=elapsed * 0.62,
+                         iowait=elapsed * 0.05, irq=0.0, softirq=0.0, steal=0.0, guest=0.0, guest_nice=0.0)
+
+    def virtual_memory(self):
+        total = 256 * 1024**3
+        used = int(total * 0.71)
+        return svmem(total=total, available=total - used, percent=71.0, used=used, free=total - used)
+
+    def disk_io_counters(self, perdisk=False):
+        elapsed = self._elapsed()
+        counters = {}
+        for i in range(self.disks):
+            rate = (i % 7 + 1) * 1024**2
+            counters[f"sd{i}"] = sdiskio(read_count=int(elapsed * 100), write_count=int(elapsed * 60),
+                                        read_bytes=int(elapsed * rate), write_bytes=int(elapsed * rate / 2),
+                                        read_time=0, write_time=0)
+        return counters
+
+    def net_io_counters(self):
+        elapsed = self._elapsed()
+        return snetio(bytes_sent=int(elapsed * 3 * 1024**2), bytes_recv=int(elapsed * 5 * 1024**2),
+                      packets_sent=0, packets_recv=0, errin=0, errout=0, dropin=0, dropout=0)
+
+    def boot_time(self):
+        return self._boot_time
+
+    def disk_partitions(self, all=False):
+        return [sdiskpart(device=f"/dev/sd{i}", mountpoint=f"/u{i:02d}", fstype="xfs", opts="rw,relatime")
+                for i in range(self.disks)]
+
+    def disk_usage(self, path):
+        total = 2 * 1024**4
+        used = int(total * 0.63)
+        return sdiskusage(total=total, used=used, free=total - used, percent=63.0)
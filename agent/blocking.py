@@ -0,0 +1,98 @@
+# --- Blocking Chain Configuration ---
+# Root blockers reported per cycle, the ones holding up the most sessions first
+BLOCKING_MAX_ROOTS = 20
+
+
+def _node(instance, sid):
+    return (int(instance), int(sid))
+
+
+def analyze_blocking(sessions):
+    """
+    Builds the blocker graph of gv$session rows (detailedActiveSessions entries) in one
+    pass and summarises it: root blockers with the number of sessions they hold up
+    directly and transitively and the depth of their chain, plus any cycles (deadlocks,
+    possibly spanning RAC instances). Every session is visited once, however long the chains.
+    """
+    details = {}
+    blocker_of = {}
+    for session in sessions:
+        if session.get("sid") is None or session.get("inst") is None:
+            continue
+        node = _node(session["inst"], session["sid"])
+        details[node] = session
+        if session.get("bs") is not None:
+            # BLOCKING_INSTANCE is empty for a blocker on the same instance on some versions
+            blocker_of[node] = _node(session.get("bi") or session["inst"], session["bs"])
+    if not blocker_of:
+        return {"blocked_sessions": 0, "max_depth": 0, "roots": [], "deadlocks": []}
+
+    # node -> (root, depth below the root); a root is a session or ("cycle", index)
+    resolved = {}
+    cycles = []
+    for start in blocker_of:
+        path, on_path, node = [], {}, start
+        while True:
+            if node in resolved:
+                root, depth = resolved[node]
+                break
+            if node in on_path:
+                # Walked back onto the current path: everything from there on is a cycle
+                cycle = path[on_path[node]:]
+                root, depth = ("cycle", len(cycles)), 0
+                cycles.append(cycle)
+                for member in cycle:
+                    resolved[member] = (root, 0)
+                path = path[:on_path[node]]
+                break
+            blocker = blocker_of.get(node)
+            if blocker is None:
+                root, depth = node, 0
+                resolved[node] = (root, 0)
+                break
+            on_path[node] = len(path)
+            path.append(node)
+            node = blocker
+        # Unwind: each waiter sits one level below the session it waits for
+        for waiter in reversed(path):
+            depth += 1
+            resolved[waiter] = (root, depth)
+
+    summary = {}
+    for node, (root, depth) in resolved.items():
+        entry = summary.setdefault(root, {"blocked": 0, "direct": 0, "max_depth": 0})
+        if node != root:
+            entry["blocked"] += 1
+            entry["max_depth"] = max(entry["max_depth"], depth)
+            if blocker_of.get(node) == root:
+                entry["direct"] += 1
+
+    roots = []
+    for root, entry in summary.items():
+        if root[0] == "cycle" or not entry["blocked"]:
+            continue
+        session = details.get(root, {})
+        roots.append({
+            "inst": root[0], "sid": root[1],
+            # Idle blockers (e.g. an uncommitted transaction) are not in the non-idle session list
+            "username": session.get("username"), "sql_id": session.get("sql_id"), "event": session.get("event"),
+            "blocked": entry["blocked"], "direct": entry["direct"], "max_depth": entry["max_depth"],
+        })
+    roots.sort(key=lambda r: (r["blocked"], r["max_depth"]), reverse=True)
+
+    deadlocks = []
+    for index, cycle in enumerate(cycles):
+        entry = summary[("cycle", index)]
+        deadlocks.append({
+            "sessions": [{"inst": inst, "sid": sid} for inst, sid in cycle],
+            "cross_instance": len({inst for inst, _ in cycle}) > 1,
+            # Sessions queued behind the cycle, not counting its own members
+            "blocked": entry["blocked"] - len(cycle),
+        })
+
+    return {
+        "blocked_sessions": len(blocker_of),
+        "max_depth": max((depth for _, depth in resolved.values()), default=0),
+        "roots": roots[:BLOCKING_MAX_ROOTS],
+        "deadlocks": deadlocks,
+    }
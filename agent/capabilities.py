@@ -0,0 +1,107 @@
+import re
+
+# Views the collectors depend on. Each one is probed once per connection instead of
+# failing with ORA-00942 on every cycle.
+PROBED_VIEWS = (
+    "V$SESSION",
+    "GV$SESSION",
+    "DBA_DATA_FILES",
+    "DBA_FREE_SPACE",
+    "V$RMAN_BACKUP_JOB_DETAILS",
+    "GV$ACTIVE_SESSION_HISTORY",
+    "V$SQLSTATS",
+    "V$DIAG_ALERT_EXT",
+    "SYS.X$DBGALERTEXT",
+    "V$DATAGUARD_STATS",
+    "V$MANAGED_STANDBY",
+    "V$RECOVERY_PROGRESS",
+)
+
+# Errors that mean "this user can never read the view", as opposed to transient failures
+_NOT_ACCESSIBLE_ERRORS = ("ORA-00942", "ORA-01031")
+
+
+class Capabilities:
+    """What the connected database is and which of the collectors' views this user can read."""
+
+    def __init__(self, role=None, edition=None, version=None, startup_time=None, views=None, diagnostics_pack=True, generation=None):
+        self.role = role # e.g. "PRIMARY", "PHYSICAL STANDBY"; None if it could not be read
+        self.edition = edition # "EE", "SE" or None if unknown
+        self.version = version # e.g. "19.0.0.0.0"
+        self.startup_time = startup_time
+        self.views = views or {}
+        self.diagnostics_pack = diagnostics_pack
+        # DatabasePool.generation at detection time; a reconnect bumps it and triggers a re-probe
+        self.generation = generation
+
+    @property
+    def major_version(self):
+        try:
+            return int(self.version.split(".")[0])
+        except (AttributeError, ValueError):
+            return None
+
+    def can_read(self, *views):
+        # Views that were not probed are assumed readable, matching the old behaviour
+        return all(self.views.get(view.upper(), True) for view in views)
+
+    @property
+    def is_primary(self):
+        return self.role == "PRIMARY"
+
+    @property
+    def has_ash(self):
+        """ASH needs Enterprise Edition, the Diagnostics Pack and a grant on the view."""
+        return self.edition != "SE" and self.diagnostics_pack and self.can_read("GV$ACTIVE_SESSION_HISTORY")
+
+    def liveness_query(self):
+        """Connection check that also reports the database role, without a separate round-trip on 12c+."""
+        if self.major_version and self.major_version >= 12:
+            return "SELECT SYS_CONTEXT('USERENV', 'DATABASE_ROLE') FROM DUAL"
+        return "SELECT NULL FROM DUAL"
+
+    def describe(self):
+        unreadable = sorted(view for view, ok in self.views.items() if not ok)
+        return (f"role={self.role or 'unknown'}, edition={self.edition or 'unknown'}, version={self.version or 'unknown'}, "
+                f"ASH={'yes' if self.has_ash else 'no'}, unreadable views={', '.join(unreadable) or 'none'}")
+
+
+def _scalar(cursor, query):
+    try:
+        cursor.execute(query)
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception:
+        return None
+
+
+def _probe_view(cursor, view):
+    try:
+        # Parses the statement and checks privileges without reading any rows
+        cursor.execute(f"SELECT 1 FROM {view} WHERE 1 = 0")
+        cursor.fetchall()
+        return True
+    except Exception as e:
+        return not any(code in str(e) for code in _NOT_ACCESSIBLE_ERRORS)
+
+
+def detect_capabilities(cursor, startup_time=None, generation=None):
+    """Probes role, edition, version and view grants once. Runs about a dozen cheap statements."""
+    role = _scalar(cursor, "SELECT database_role FROM V$DATABASE")
+    if role is None:
+        # Users without V$DATABASE can still see the role through their session context (11gR2+),
+        # which is also what the liveness query compares it with
+        role = _scalar(cursor, "SELECT SYS_CONTEXT('USERENV', 'DATABASE_ROLE') FROM DUAL")
+    version = _scalar(cursor, "SELECT version FROM V$INSTANCE")
+
+    edition = None
+    banner = _scalar(cursor, "SELECT banner FROM V$VERSION WHERE ROWNUM = 1")
+    if banner:
+        edition = "EE" if re.search(r"Enterprise Edition", banner, re.IGNORECASE) else "SE"
+
+    # 'NONE' disables the Diagnostics Pack; if the parameter is not readable, assume it is licensed
+    pack_access = _scalar(cursor, "SELECT value FROM V$PARAMETER WHERE name = 'control_management_pack_access'")
+    diagnostics_pack = pack_access is None or "DIAGNOSTIC" in pack_access.upper()
+
+    views = {view: _probe_view(cursor, view) for view in PROBED_VIEWS}
+    return Capabilities(role, edition, version, startup_time, views, diagnostics_pack, generation)
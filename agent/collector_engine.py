@@ -0,0 +1,164 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from instrumentation import InstrumentedCursor
+
+# --- Collector Engine Configuration ---
+# Upper bound on how long a single section may take before its result is dropped
+# from the report. Sections that time out fall back to their default value.
+SECTION_TIMEOUT_SECONDS = 10
+# Default for an engine with its own executor; the agent sizes its shared one from DB_SECTIONS
+COLLECTOR_WORKERS = 9
+
+
+def create_executor(max_workers=COLLECTOR_WORKERS):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+
+
+class Section:
+    """
+    A single unit of collection work, e.g. "tablespaces" or "standby".
+    `func` receives a cursor and the engine's context (the monitored target) and
+    returns the section's value; `default` is used when the section is skipped,
+    fails or times out (a section with an interval falls back to its last value first).
+    """
+
+    def __init__(self, name, func, default, statuses=("OPEN",), timeout=SECTION_TIMEOUT_SECONDS, interval=None, jitter=0, requires=None):
+        self.name = name
+        self.func = func
+        self.default = default
+        # Database statuses (from V$INSTANCE) in which this section may run. None means always.
+        self.statuses = statuses
+        self.timeout = timeout
+        # Seconds between runs (None = every cycle) and +/- random spread, see SectionScheduler
+        self.interval = interval
+        self.jitter = jitter
+        # Optional predicate on the detected Capabilities, e.g. "the user can read V$RMAN_BACKUP_JOB_DETAILS"
+        self.requires = requires
+
+    def should_run(self, db_status, capabilities=None):
+        if self.statuses is not None and db_status not in self.statuses:
+            return False
+        return self.requires is None or capabilities is None or self.requires(capabilities)
+
+    def default_value(self):
+        # Return a fresh copy so callers can safely mutate lists/dicts in the payload
+        return type(self.default)() if isinstance(self.default, (list, dict)) else self.default
+
+
+class CollectorEngine:
+    """
+    Runs independent collection sections concurrently on a small thread pool.
+    Each section gets its own cursor from `cursor_factory` (a pooled session
+    when run against a DatabasePool), so one slow view only delays its own
+    section rather than the whole report. Sections that are not due according
+    to the scheduler report their last value instead of querying again.
+
+    Several engines (one per monitored database) can share one `executor`, so the
+    number of worker threads does not grow with the number of targets.
+    With `stats` (an AgentStats), every section's wall and DB time, rows,
+    round-trips and failures are recorded as "section.<name>.*".
+    """
+
+    def __init__(self, max_workers=COLLECTOR_WORKERS, scheduler=None, executor=None, context=None, stats=None):
+        self._owns_executor = executor is None
+        self._executor = executor or create_executor(max_workers)
+        self.scheduler = scheduler
+        self.context = context
+        self.stats = stats
+
+    def _run_section(self, section, cursor_factory):
+        started = time.monotonic()
+        cursor = None
+        try:
+            # cursor_factory returns a context manager (a cursor, or a pooled session's cursor)
+            with cursor_factory() as cursor:
+                if self.stats is not None:
+                    cursor = InstrumentedCursor(cursor)
+                return section.func(cursor, self.context)
+        finally:
+            elapsed = time.monotonic() - started
+            if elapsed > section.timeout:
+                print(f"Section '{section.name}' finished after its timeout ({elapsed:.2f}s); result was discarded.")
+            if isinstance(cursor, InstrumentedCursor):
+                self._record(section, elapsed, cursor)
+
+    def _record(self, section, elapsed, cursor):
+        prefix = f"section.{section.name}"
+        self.stats.observe(f"{prefix}.wall_ms", elapsed * 1000)
+        self.stats.observe(f"{prefix}.db_ms", cursor.db_seconds * 1000)
+        self.stats.observe(f"{prefix}.rows", cursor.rows)
+        self.stats.observe(f"{prefix}.round_trips", cursor.round_trips)
+        if cursor.errors:
+            # Failed statements, including ones the section handled itself (e.g. an ORA-00942 fallback)
+            self.stats.increment(f"{prefix}.query_errors", cursor.errors)
+
+    def _fallback(self, section):
+        # A failed or timed-out section with an interval keeps its last good value, so tablespaces
+        # and backups do not drop out of the report (and clear server-side alerts) for one cycle
+        cached = self.scheduler.cached(section) if self.scheduler and section.interval else None
+        return cached if cached is not None else section.default_value()
+
+    def submit(self, sections, db_status, cursor_factory, capabilities=None):
+        """
+        Starts every runnable section and returns a handle for `gather`.
+        Splitting submit/gather lets the caller do OS collection while the DB queries run.
+        """
+        submitted_at = time.monotonic()
+        futures = {}
+        cached = {}
+        for section in sections:
+            if cursor_factory is None or not section.should_run(db_status, capabilities):
+                continue
+            if self.scheduler and not self.scheduler.is_due(section, submitted_at):
+                cached[section.name] = self.scheduler.cached(section)
+                continue
+            futures[section.name] = (section, self._executor.submit(self._run_section, section, cursor_factory))
+        return submitted_at, sections, futures, cached
+
+    def gather(self, handle):
+        """Waits for submitted sections, honouring each section's timeout, and returns {name: value}."""
+        submitted_at, sections, futures, cached = handle
+        results = {}
+        for section in sections:
+            if section.name in cached:
+                results[section.name] = cached[section.name]
+                continue
+            if section.name not in futures:
+                results[section.name] = section.default_value()
+                continue
+
+            _, future = futures[section.name]
+            remaining = max(0.0, submitted_at + section.timeout - time.monotonic())
+            try:
+                value = future.result(timeout=remaining)
+                results[section.name] = value if value is not None else section.default_value()
+                # Only a section that returned is cached; a failed one is retried on the next cycle
+                if self.scheduler:
+                    self.scheduler.record(section, results[section.name])
+            except FutureTimeoutError:
+                # The timeout counts from submission, so a section may still be queued for a worker;
+                # cancelling it keeps it from running late and holding a thread and a pooled session
+                if future.cancel():
+                    print(f"Warning: Section '{section.name}' did not get a worker within {section.timeout}s and was skipped for this cycle.")
+                    counter = "skipped"
+                else:
+                    print(f"Warning: Section '{section.name}' timed out after {section.timeout}s and was skipped for this cycle.")
+                    counter = "timeouts"
+                results[section.name] = self._fallback(section)
+                if self.stats is not None:
+                    self.stats.increment(f"section.{section.name}.{counter}")
+            except Exception as e:
+                print(f"Error collecting section '{section.name}': {e}")
+                results[section.name] = self._fallback(section)
+                if self.stats is not None:
+                    self.stats.increment(f"section.{section.name}.exceptions")
+        return results
+
+    def run(self, sections, db_status, cursor_factory, capabilities=None):
+        return self.gather(self.submit(sections, db_status, cursor_factory, capabilities))
+
+    def shutdown(self):
+        # A shared executor is shut down by whoever created it
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+# --- Columnar Payload Configuration ---
+# Highest payload schema version this agent sends (1 disables the columnar encoding).
+# Version 2 sends the time series and large tables below column-wise: one shared list of
+# timestamps, parallel value arrays per wait event, and dictionary-encoded strings.
+# It is only used once the server has advertised it (maxSchemaVersion in its reply).
+PAYLOAD_SCHEMA_VERSION = 2
+# Report tables sent column-wise, with the columns whose strings are dictionary-encoded
+COLUMNAR_TABLES = {
+    "detailedActiveSessions": ("username", "status", "event", "module", "machine", "terminal"),
+}
+
+
+def encode_wait_events(events):
+    """
+    topWaitEvents as {"dates", "events", "value", "sessions", "latency"}: per event, the
+    session and latency arrays are aligned with the shared dates (None where the event
+    has no point). Snapshot events without a series get None instead of arrays.
+    """
+    dates = sorted({point["date"] for event in events for point in event.get("data") or []})
+    position = {date: i for i, date in enumerate(dates)}
+    sessions, latency = [], []
+    for event in events:
+        points = event.get("data")
+        if not points:
+            sessions.append(None)
+            latency.append(None)
+            continue
+        event_sessions = [None] * len(dates)
+        event_latency = [None] * len(dates)
+        for point in points:
+            i = position[point["date"]]
+            event_sessions[i] = point.get("value")
+            event_latency[i] = point.get("latency")
+        sessions.append(event_sessions)
+        latency.append(event_latency)
+    return {
+        "dates": dates,
+        "events": [event.get("event") for event in events],
+        "value": [event.get("value") for event in events],
+        "sessions": sessions,
+        "latency": latency,
+    }
+
+
+def encode_table(rows, dictionary_columns=()):
+    """
+    A list of row dicts as {"columns", "count", "values", "dictionaries"}: one value list
+    per column, where dictionary columns hold indexes into dictionaries[column].
+    """
+    columns = list(rows[0]) if rows else []
+    values = {column: [row.get(column) for row in rows] for column in columns}
+    dictionaries = {}
+    for column in dictionary_columns:
+        if column not in values:
+            continue
+        codes = {}
+        values[column] = [None if value is None else codes.setdefault(value, len(codes)) for value in values[column]]
+        dictionaries[column] = list(codes)
+    return {"columns": columns, "count": len(rows), "values": [values[column] for column in columns],
+            "dictionaries": dictionaries}
+
+
+class PayloadSchema:
+    """
+    Schema version negotiated with the server. Reports go out as version 1 until a
+    reply advertises a higher one, and drop back to it whenever a send fails.
+    """
+
+    def __init__(self, max_version=PAYLOAD_SCHEMA_VERSION):
+        self.max_version = max_version
+        self.version = 1
+
+    def negotiate(self, reply):
+        """Takes the server's maxSchemaVersion from a successful reply (absent on older servers)."""
+        try:
+            offered = int(reply.get("maxSchemaVersion") or 1)
+        except (TypeError, ValueError, AttributeError):
+            offered = 1
+        self.version = max(1, min(self.max_version, offered))
+
+    def reset(self):
+        self.version = 1
+
+    def encode(self, payload):
+        """Returns the payload in the negotiated schema (a shallow copy for version 2)."""
+        if self.version < 2:
+            return payload
+        encoded = {**payload, "schemaVersion": 2}
+        if payload.get("topWaitEvents"):
+            encoded["topWaitEvents"] = encode_wait_events(payload["topWaitEvents"])
+        for section, dictionary_columns in COLUMNAR_TABLES.items():
+            if payload.get(section):
+                encoded[section] = encode_table(payload[section], dictionary_columns)
+        return encoded
@@ -0,0 +1,135 @@
+import random
+import time
+from contextlib import contextmanager
+
+from collector_engine import SECTION_TIMEOUT_SECONDS
+
+# --- Connection Pool Configuration ---
+POOL_MIN_SESSIONS = 1
+# Default size; the agent passes one session per collector section plus one for the
+# high-resolution sampler (see POOL_SESSIONS in agent.py)
+POOL_MAX_SESSIONS = 10
+POOL_INCREMENT = 1
+# How long acquire() waits for a free session; kept well below the section timeout, so a
+# section that cannot get a session fails on its own instead of eating its whole timeout
+POOL_WAIT_TIMEOUT_MS = SECTION_TIMEOUT_SECONDS * 1000 // 2
+# The agent runs a fixed set of ~15 statements; keep all of them parsed in every session
+STATEMENT_CACHE_SIZE = 24
+# Seconds a pooled session may sit idle before the pool pings it on acquire
+POOL_PING_INTERVAL = 30
+# Per round-trip limit in milliseconds, so a hung query cannot hold a pooled session forever
+CALL_TIMEOUT_MS = 10000
+
+# Reconnect backoff: 5s, 10s, 20s ... capped, with jitter so a fleet of agents
+# does not hit the listener at the same moment after a database bounce.
+RECONNECT_BACKOFF_INITIAL = 5
+RECONNECT_BACKOFF_MAX = 300
+RECONNECT_JITTER = 0.2
+
+
+class DatabasePool:
+    """
+    Wraps an oracledb session pool. Sessions keep their statement cache across
+    cycles, and (re)connection attempts are spaced out with exponential backoff.
+    """
+
+    def __init__(self, connection_params, describe=None, max_sessions=POOL_MAX_SESSIONS):
+        self.connection_params = connection_params
+        self.max_sessions = max_sessions
+        # Human-readable target shown in logs; printed once, not on every reconnect
+        self.describe = describe or connection_params.get("dsn")
+        self.pool = None
+        self._connected = False
+        self._ever_connected = False
+        self._failures = 0
+        self._next_attempt = 0.0
+        # Incremented on every (re)connect so cached per-connection facts can be refreshed
+        self.generation = 0
+
+    def _backoff_delay(self):
+        delay = min(RECONNECT_BACKOFF_MAX, RECONNECT_BACKOFF_INITIAL * (2 ** (self._failures - 1)))
+        return delay * random.uniform(1 - RECONNECT_JITTER, 1 + RECONNECT_JITTER)
+
+    def _record_failure(self, error):
+        self._connected = False
+        self._failures += 1
+        delay = self._backoff_delay()
+        self._next_attempt = time.monotonic() + delay
+        print(f"Database unavailable ({error}). Next connection attempt in {delay:.0f}s.")
+
+    def _create_pool(self):
+        import oracledb
+        print(f"Creating connection pool for: {self.describe}")
+        return oracledb.create_pool(
+            **self.connection_params,
+            min=POOL_MIN_SESSIONS,
+            max=self.max_sessions,
+            increment=POOL_INCREMENT,
+            stmtcachesize=STATEMENT_CACHE_SIZE,
+            ping_interval=POOL_PING_INTERVAL,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=POOL_WAIT_TIMEOUT_MS,
+        )
+
+    def connect(self):
+        """
+        Makes sure the pool exists and the database answers. Returns False without
+        touching the network while a backoff period is still running.
+        """
+        if self._failures and time.monotonic() < self._next_attempt:
+            return False
+        try:
+            if self.pool is None:
+                self.pool = self._create_pool()
+            connection = self.pool.acquire()
+            try:
+                connection.ping()
+            finally:
+                self.pool.release(connection)
+        except ImportError:
+            print("Error: The 'oracledb' package is not installed. Please install it using 'pip install oracledb'")
+            self._record_failure("oracledb not installed")
+            return False
+        except Exception as e:
+            self._record_failure(e)
+            return False
+
+        if not self._connected:
+            print("--- DATABASE RECONNECTED ---" if self._ever_connected else "--- DATABASE CONNECTED ---")
+            self.generation += 1
+        self._connected = True
+        self._ever_connected = True
+        self._failures = 0
+        return True
+
+    @property
+    def connected(self):
+        """True while the last connection attempt or collection succeeded."""
+        return self._connected
+
+    def mark_failed(self, error):
+        """Called when a collection finds the database unreachable mid-cycle."""
+        self._record_failure(error)
+
+    @contextmanager
+    def cursor(self):
+        """Yields a cursor on a pooled session and returns the session afterwards."""
+        connection = self.pool.acquire()
+        try:
+            connection.call_timeout = CALL_TIMEOUT_MS
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+        finally:
+            self.pool.release(connection)
+
+    def close(self):
+        if self.pool is not None:
+            try:
+                self.pool.close(force=True)
+            except Exception:
+                pass
+            self.pool = None
+            print("--- DATABASE DISCONNECTED ---")
@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+# --- Delta Payload Configuration ---
+# Slow-changing sections that are left out of a report when identical to the last one sent.
+# The server fills them in from the previous snapshot it holds for this agent.
+DELTA_SECTIONS = ("tablespaces", "backups", "diskUsage", "alertLog", "standbyStatus", "osInfo")
+# Every Nth report is a full keyframe, so the server can recover from a lost snapshot
+KEYFRAME_INTERVAL = 20
+
+
+def section_hash(value):
+    """Stable content hash of a section, independent of dict key order."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class DeltaEncoder:
+    """
+    Tracks a content hash per slow-changing section and strips sections that
+    have not changed since the previous report from the outgoing payload.
+    """
+
+    def __init__(self, sections=DELTA_SECTIONS, keyframe_interval=KEYFRAME_INTERVAL):
+        self.sections = sections
+        self.keyframe_interval = keyframe_interval
+        self._hashes = {}
+        self._reports_since_keyframe = None # None forces a keyframe first
+
+    def force_keyframe(self):
+        """The next report will be sent in full (after a failed send or a server resync request)."""
+        self._hashes = {}
+        self._reports_since_keyframe = None
+
+    def encode(self, data):
+        """Returns the payload to send: either `data` marked as full, or a shallow copy without unchanged sections."""
+        hashes = {name: section_hash(data[name]) for name in self.sections if name in data}
+
+        is_keyframe = self._reports_since_keyframe is None or self._reports_since_keyframe + 1 >= self.keyframe_interval
+        if is_keyframe:
+            self._hashes = hashes
+            self._reports_since_keyframe = 0
+            return {**data, "payloadType": "full"}
+
+        unchanged = [name for name, digest in hashes.items() if self._hashes.get(name) == digest]
+        self._hashes = hashes
+        self._reports_since_keyframe += 1
+
+        payload = {key: value for key, value in data.items() if key not in unchanged}
+        payload["payloadType"] = "delta"
+        payload["unchangedSections"] = unchanged
+        return payload
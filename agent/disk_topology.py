@@ -0,0 +1,180 @@
+import os
+import platform
+import re
+import select
+import time
+
+# --- Disk Topology Configuration ---
+# The mounted partitions and the disk_io_counters() key of the block device behind each
+# one are discovered once and reused until the mount table changes: the kernel flags an
+# open /proc/self/mountinfo through poll() when anything is mounted or unmounted.
+# Hosts without it (e.g. Windows) rediscover every TOPOLOGY_REFRESH_SECONDS instead.
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+SYS_BLOCK_PATH = "/sys/block"
+TOPOLOGY_REFRESH_SECONDS = 300
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _unescape(field):
+    # mountinfo escapes spaces, tabs, newlines and backslashes as octal, e.g. "\040"
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def read_mount_numbers(path=MOUNTINFO_PATH):
+    """{mount point: "major:minor"} of the device mounted there (the last mount on a path wins)."""
+    numbers = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 4:
+                    numbers[_unescape(fields[4])] = fields[2]
+    except OSError:
+        pass
+    return numbers
+
+
+def read_sys_block(path=SYS_BLOCK_PATH):
+    """
+    Kernel names of every block device and partition in /sys/block by "major:minor",
+    and of device-mapper devices (LVM volumes, multipath maps) by their /dev/mapper name.
+    Kernel names are what disk_io_counters() is keyed by (from /proc/diskstats).
+    """
+    by_number, by_dm_name = {}, {}
+    try:
+        disks = os.listdir(path)
+    except OSError:
+        return by_number, by_dm_name
+    for disk in disks:
+        disk_path = os.path.join(path, disk)
+        # sysfs writes "/" in names as "!", e.g. cciss!c0d0 for cciss/c0d0
+        name = disk.replace("!", "/")
+        number = _read_text(os.path.join(disk_path, "dev"))
+        if number:
+            by_number[number] = name
+        dm_name = _read_text(os.path.join(disk_path, "dm", "name"))
+        if dm_name:
+            by_dm_name[dm_name] = name
+        try:
+            entries = os.listdir(disk_path)
+        except OSError:
+            continue
+        # Partitions are subdirectories named after their disk, e.g. sda/sda1 or nvme0n1/nvme0n1p1
+        for entry in entries:
+            if entry.startswith(disk) and entry != disk:
+                number = _read_text(os.path.join(disk_path, entry, "dev"))
+                if number:
+                    by_number[number] = entry.replace("!", "/")
+    return by_number, by_dm_name
+
+
+class MountedDisk:
+    """One mounted partition; counter_key is its disk_io_counters() key, or None if unknown."""
+
+    def __init__(self, device, mountpoint, counter_key):
+        self.device = device
+        self.mountpoint = mountpoint
+        self.counter_key = counter_key
+
+
+class DiskTopology:
+    """
+    Cached mount point -> device -> I/O counter key map of the host. mounts() rebuilds
+    it only when the mount table has changed since the last call.
+    """
+
+    def __init__(self, psutil, mountinfo_path=MOUNTINFO_PATH, sys_block_path=SYS_BLOCK_PATH):
+        self.psutil = psutil
+        self.mountinfo_path = mountinfo_path
+        self.sys_block_path = sys_block_path
+        self.rebuilds = 0
+        self._mounts = None
+        self._built_at = 0.0
+        self._mountinfo = None
+        self._poller = None
+        try:
+            self._mountinfo = open(mountinfo_path, "rb")
+            self._poller = select.poll()
+            self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError):
+            # No mountinfo (not Linux) or no poll() (Windows): fall back to periodic rediscovery
+            self.close()
+
+    def close(self):
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+        self._mountinfo = None
+        self._poller = None
+
+    def _stale(self):
+        if self._mounts is None:
+            return True
+        if self._poller is not None:
+            # Never blocks; an event means a mount or unmount since the previous poll
+            return bool(self._poller.poll(0))
+        return time.monotonic() - self._built_at >= TOPOLOGY_REFRESH_SECONDS
+
+    def mounts(self, counters):
+        """Mounted partitions (loop devices and pseudo file systems left out) with their counter keys."""
+        if self._stale():
+            self._mounts = self._build(counters)
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+        return self._mounts
+
+    def _build(self, counters):
+        partitions = [part for part in self.psutil.disk_partitions() if 'loop' not in part.opts and part.fstype]
+        if platform.system() == "Windows":
+            return [MountedDisk(part.device, part.mountpoint, self._windows_counter_key(part, counters)) for part in partitions]
+        numbers = read_mount_numbers(self.mountinfo_path)
+        by_number, by_dm_name = read_sys_block(self.sys_block_path)
+        return [MountedDisk(part.device, part.mountpoint, self._counter_key(part, counters, numbers, by_number, by_dm_name))
+                for part in partitions]
+
+    def _counter_key(self, part, counters, numbers, by_number, by_dm_name):
+        # The device number of the mount identifies the kernel device even for /dev/root,
+        # udev aliases (/dev/disk/by-*) and device-mapper nodes that are not symlinks
+        kernel_name = by_number.get(numbers.get(part.mountpoint))
+        if kernel_name and (kernel_name in counters or not counters):
+            return kernel_name
+        candidates = [os.path.basename(os.path.realpath(part.device))]
+        if part.device.startswith("/dev/mapper/"):
+            candidates.append(by_dm_name.get(part.device[len("/dev/mapper/"):]))
+        device_name = part.device.split('/')[-1]
+        candidates.append(device_name)
+        for candidate in candidates:
+            if candidate and candidate in counters:
+                return candidate
+        for key in counters.keys():
+            if key.endswith(device_name):
+                return key
+        return None
+
+    def _windows_counter_key(self, part, counters):
+        try:
+            # Use logical disk mapping for Windows
+            import wmi
+            c = wmi.WMI()
+            logical_disk = part.device.replace('\\', '')
+            # Find the physical drive from the logical disk
+            for item in c.Win32_LogicalDiskToPartition():
+                if item.Dependent.DeviceID == logical_disk:
+                    # Antecedent provides a link to Win32_DiskPartition
+                    partition_device_id = item.Antecedent.DeviceID
+                    for disk_drive in c.Win32_DiskDriveToDiskPartition():
+                        if disk_drive.Dependent.DeviceID == partition_device_id:
+                            # This gives us the Win32_DiskDrive
+                            physical_drive_id = disk_drive.Antecedent.DeviceID.replace('\\', '').replace('.', '')
+                            if physical_drive_id in counters:
+                                return physical_drive_id
+        except Exception:
+            # Fallback if WMI fails
+            return list(counters.keys())[0] if counters else None
+        return None
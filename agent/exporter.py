@@ -0,0 +1,149 @@
+import threading
+
+# --- Metrics Exporter Configuration ---
+# GET /metrics on the local API serves the last report of every target in the
+# OpenMetrics text format. Samples are rendered when a report is built, so a scrape
+# never queries the database. Set LOCAL_API_HOST to "0.0.0.0" to scrape from another host.
+METRICS_EXPORTER_ENABLED = True
+METRICS_PREFIX = "proactivedb"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+MB = 1024 * 1024
+GB = 1024 ** 3
+
+# (name, help) of every metric family in output order; all are gauges
+FAMILIES = (
+    ("up", "Whether the database answered the last collection (1) or not (0)."),
+    ("os_up", "Whether host metrics were collected (1) or not (0)."),
+    ("last_collection_timestamp_seconds", "Time of the last collection."),
+    ("burst_active", "Whether burst sampling is running after a detected spike."),
+    ("cpu_usage_percent", "Host CPU utilisation."),
+    ("memory_usage_percent", "Host memory utilisation."),
+    ("memory_used_bytes", "Host memory in use."),
+    ("memory_total_bytes", "Host memory installed."),
+    ("active_sessions", "Active user sessions."),
+    ("io_read_bytes_per_second", "Read throughput of the database disks."),
+    ("io_write_bytes_per_second", "Write throughput of the database disks."),
+    ("network_transmit_bytes_per_second", "Host network transmit rate."),
+    ("network_receive_bytes_per_second", "Host network receive rate."),
+    ("device_read_bytes_per_second", "Read throughput per block device."),
+    ("device_write_bytes_per_second", "Write throughput per block device."),
+    ("disk_used_percent", "Used space per mount point."),
+    ("disk_size_bytes", "Size per mount point."),
+    ("tablespace_used_percent", "Used space per tablespace, relative to its maximum size."),
+    ("tablespace_used_bytes", "Used space per tablespace."),
+    ("tablespace_max_bytes", "Maximum size per tablespace (with autoextend)."),
+    ("standby_transport_lag_seconds", "Data Guard transport lag."),
+    ("standby_apply_lag_seconds", "Data Guard apply lag."),
+    ("standby_apply_rate_bytes_per_second", "Redo apply rate of the managed recovery process."),
+    ("wait_event_sessions", "Sessions per top wait event, in the newest ASH minute or the v$session snapshot."),
+    ("blocked_sessions", "Sessions waiting on another session's lock."),
+    ("blocking_chain_max_depth", "Length of the longest chain of blocked sessions."),
+    ("deadlocks", "Cycles in the blocker graph."),
+)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def number(value, scale=1):
+    """Sample value as text, or None for anything that is not a number."""
+    try:
+        return repr(float(value) * scale)
+    except (TypeError, ValueError):
+        return None
+
+
+def report_samples(data, collected_at):
+    """Turns one report into {family: [sample lines]} for its target."""
+    base = f'server_id="{escape_label(data.get("id"))}",db_name="{escape_label(data.get("dbName"))}"'
+    samples = {name: [] for name, _ in FAMILIES}
+
+    def add(family, value, scale=1, **labels):
+        text = number(value, scale)
+        if text is not None:
+            extra = "".join(f',{key}="{escape_label(label)}"' for key, label in labels.items())
+            samples[family].append(f"{METRICS_PREFIX}_{family}{{{base}{extra}}} {text}\n")
+
+    add("up", 1 if data.get("dbIsUp") else 0)
+    add("os_up", 1 if data.get("osIsUp") else 0)
+    add("last_collection_timestamp_seconds", collected_at)
+    add("burst_active", 1 if data.get("burst") else 0)
+    kpis = data.get("kpis") or {}
+    add("cpu_usage_percent", kpis.get("cpuUsage"))
+    add("memory_usage_percent", kpis.get("memoryUsage"))
+    add("memory_used_bytes", kpis.get("memoryUsedGB"), GB)
+    add("memory_total_bytes", kpis.get("memoryTotalGB"), GB)
+
+    perf = data.get("current_performance") or {}
+    add("active_sessions", perf.get("active_sessions"))
+    add("io_read_bytes_per_second", perf.get("io_read"), MB)
+    add("io_write_bytes_per_second", perf.get("io_write"), MB)
+    add("network_transmit_bytes_per_second", perf.get("network_up"), MB)
+    add("network_receive_bytes_per_second", perf.get("network_down"), MB)
+    for device in perf.get("io_details") or []:
+        add("device_read_bytes_per_second", device.get("read_mb_s"), MB, device=device.get("device"), mount_point=device.get("mount_point"))
+        add("device_write_bytes_per_second", device.get("write_mb_s"), MB, device=device.get("device"), mount_point=device.get("mount_point"))
+
+    for disk in data.get("diskUsage") or []:
+        add("disk_used_percent", disk.get("used_percent"), mount_point=disk.get("mount_point"))
+        add("disk_size_bytes", disk.get("total_gb"), GB, mount_point=disk.get("mount_point"))
+    for tablespace in data.get("tablespaces") or []:
+        add("tablespace_used_percent", tablespace.get("used_percent"), tablespace=tablespace.get("name"))
+        add("tablespace_used_bytes", tablespace.get("used_gb"), GB, tablespace=tablespace.get("name"))
+        add("tablespace_max_bytes", tablespace.get("total_gb"), GB, tablespace=tablespace.get("name"))
+    for standby in data.get("standbyStatus") or []:
+        # Lags are reported in hours
+        add("standby_transport_lag_seconds", standby.get("transport_lag"), 3600, standby=standby.get("name"))
+        add("standby_apply_lag_seconds", standby.get("apply_lag"), 3600, standby=standby.get("name"))
+        add("standby_apply_rate_bytes_per_second", standby.get("apply_rate_mb_s"), MB, standby=standby.get("name"))
+    events = data.get("topWaitEvents") or []
+    # An ASH event's value is summed over the whole window; export its newest minute instead
+    # (0 when the event has no sessions in it)
+    latest = max((point.get("date") or "" for event in events for point in event.get("data") or []), default=None)
+    for event in events:
+        points = event.get("data")
+        if points:
+            value = next((point.get("value") for point in points if point.get("date") == latest), 0)
+        else:
+            value = event.get("value")
+        add("wait_event_sessions", value, event=event.get("event"))
+    blocking = data.get("blockingChains")
+    if blocking:
+        add("blocked_sessions", blocking.get("blocked_sessions"))
+        add("blocking_chain_max_depth", blocking.get("max_depth"))
+        add("deadlocks", len(blocking.get("deadlocks") or []))
+    return samples
+
+
+class MetricsCache:
+    """
+    Last rendered samples per target. update() is called with every report; the
+    scrape handler only concatenates, and reuses its output until the next update.
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    def update(self, data, collected_at):
+        samples = report_samples(data, collected_at)
+        with self._lock:
+            self._samples[data.get("id")] = samples
+            self._rendered = None
+
+    def render(self, query=""):
+        """Handler for GET /metrics on the local API."""
+        with self._lock:
+            if self._rendered is None:
+                parts = []
+                for name, help_text in FAMILIES:
+                    lines = [line for samples in self._samples.values() for line in samples[name]]
+                    if lines:
+                        parts.append(f"# TYPE {METRICS_PREFIX}_{name} gauge\n# HELP {METRICS_PREFIX}_{name} {help_text}\n")
+                        parts.extend(lines)
+                parts.append("# EOF\n")
+                self._rendered = "".join(parts).encode("utf-8")
+            return OPENMETRICS_CONTENT_TYPE, self._rendered
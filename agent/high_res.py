@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from os_sampler import OSSampler
+
+# --- High-Resolution Sampling Configuration ---
+# Host and session metrics are sampled this often (1-5s) into fixed-size ring buffers
+# that can be pulled from the local API (GET /highres?minutes=5) during an incident.
+HIGH_RES_INTERVAL_SECONDS = 2
+HIGH_RES_WINDOW_MINUTES = 60
+# Concurrent session-count queries; a slow target never delays the others
+HIGH_RES_WORKERS = 4
+
+HOST_FIELDS = ("cpu", "memory", "io_read", "io_write", "network_up", "network_down")
+SESSION_FIELDS = ("active_sessions", "waiting_sessions")
+
+SESSION_QUERY = """
+    SELECT count(*),
+           sum(CASE WHEN state = 'WAITING' AND wait_class <> 'Idle' THEN 1 ELSE 0 END)
+    FROM v$session
+    WHERE status = 'ACTIVE' AND type = 'USER' AND username IS NOT NULL
+"""
+# Used instead while the target is in burst mode (anomaly.py): the same counts, split by wait event
+BURST_QUERY = """
+    SELECT CASE WHEN state = 'WAITING' AND wait_class <> 'Idle' THEN event ELSE 'ON CPU' END, count(*)
+    FROM v$session
+    WHERE status = 'ACTIVE' AND type = 'USER' AND username IS NOT NULL
+    GROUP BY CASE WHEN state = 'WAITING' AND wait_class <> 'Idle' THEN event ELSE 'ON CPU' END
+"""
+
+
+class RingBuffer:
+    """
+    Fixed-capacity time series backed by preallocated float arrays, one per field.
+    Appending overwrites the oldest slot in place, so memory stays at
+    capacity * (fields + 1) * 8 bytes however long the agent runs.
+    """
+
+    def __init__(self, fields, capacity):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns = [array("d", bytes(8 * capacity)) for _ in self.fields]
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, values):
+        """Stores one sample; `values` follows `fields`, None is kept as a gap (NaN)."""
+        with self._lock:
+            slot = self._next
+            self._timestamps[slot] = timestamp
+            for column, value in zip(self._columns, values):
+                column[slot] = math.nan if value is None else value
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def read(self, since=0.0):
+        """Samples newer than `since` (epoch seconds), oldest first, as {"timestamps": [...], field: [...]}."""
+        with self._lock:
+            start = (self._next - self._count) % self.capacity
+            slots = [(start + i) % self.capacity for i in range(self._count)]
+            slots = [slot for slot in slots if self._timestamps[slot] > since]
+            result = {"timestamps": [self._timestamps[slot] for slot in slots]}
+            for field, column in zip(self.fields, self._columns):
+                # NaN is not valid JSON; gaps are returned as null
+                result[field] = [None if math.isnan(column[slot]) else column[slot] for slot in slots]
+        return result
+
+    def __len__(self):
+        return self._count
+
+
+class HighResSampler:
+    """
+    Background thread that fills one host ring buffer and one session ring buffer
+    per target at HIGH_RES_INTERVAL_SECONDS, independently of the report cycle.
+    Databases are only queried while the main cycle has them connected.
+    """
+
+    def __init__(self, targets, psutil, interval=HIGH_RES_INTERVAL_SECONDS, window_minutes=HIGH_RES_WINDOW_MINUTES):
+        self.targets = targets
+        self.interval = interval
+        capacity = max(1, int(window_minutes * 60 / interval))
+        # Own sampler: sharing the report cycle's would reset its counters every few seconds
+        self.os_sampler = OSSampler(psutil) if psutil else None
+        self.host = RingBuffer(HOST_FIELDS, capacity)
+        self.sessions = {target.server_id: RingBuffer(SESSION_FIELDS, capacity) for target in targets}
+        self._in_flight = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(HIGH_RES_WORKERS, len(targets))),
+                                            thread_name_prefix="highres")
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="high-res-sampler", daemon=True)
+
+    def start(self):
+        if self.os_sampler:
+            self.os_sampler.prime()
+        self._thread.start()
+        print(f"High-resolution sampling every {self.interval}s ({self.host.capacity} samples kept).")
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.sample_once()
+            # Stay on the interval grid even when a pass runs long
+            self._stopped.wait(self.interval - time.time() % self.interval)
+
+    def sample_once(self):
+        now = time.time()
+        if self.os_sampler:
+            try:
+                sample = self.os_sampler.sample()
+                reads = sum(rates[0] for rates in sample.disk_rates.values())
+                writes = sum(rates[1] for rates in sample.disk_rates.values())
+                self.host.append(now, (sample.cpu_percent, sample.memory.percent, reads, writes,
+                                       sample.net_up_rate, sample.net_down_rate))
+            except Exception as e:
+                print(f"High-resolution host sample failed: {e}")
+        for target in self.targets:
+            previous = self._in_flight.get(target.server_id)
+            if previous is not None and not previous.done():
+                continue # Previous query still running; leave a gap rather than queue up
+            if target.pool.connected:
+                self._in_flight[target.server_id] = self._executor.submit(self._sample_sessions, target, now)
+
+    def _sample_sessions(self, target, timestamp):
+        burst = target.burst.active(timestamp)
+        try:
+            with target.pool.cursor() as cursor:
+                cursor.execute(BURST_QUERY if burst else SESSION_QUERY)
+                rows = cursor.fetchall()
+        except Exception:
+            # The report cycle notices and reports an unreachable database; just leave a gap
+            return
+        if burst:
+            waits = {event: count for event, count in rows}
+            active = sum(waits.values())
+            waiting = active - waits.get("ON CPU", 0)
+            target.burst.record(timestamp, active, waiting, waits)
+            row = (active, waiting)
+        else:
+            row = rows[0] if rows else None
+        if row is not None:
+            self.sessions[target.server_id].append(timestamp, row)
+
+    def snapshot(self, query):
+        """Handler for the local API: ?minutes=N (default 5) and optional ?target=<server id>."""
+        params = dict(part.partition("=")[::2] for part in query.split("&") if part)
+        minutes = float(params.get("minutes") or 5)
+        since = time.time() - minutes * 60
+        sessions = {server_id: buffer.read(since) for server_id, buffer in self.sessions.items()
+                    if params.get("target") in (None, "", server_id)}
+        return {"interval": self.interval, "host": self.host.read(since), "sessions": sessions}
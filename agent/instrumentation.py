@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from collections import deque
+
+# --- Self-Instrumentation Configuration ---
+# Number of most recent observations each rolling histogram summarises
+# (120 cycles = one hour at the default 30s frequency).
+STATS_WINDOW = 120
+
+
+class RollingHistogram:
+    """Keeps the last `window` observations of one metric and summarises them on demand."""
+
+    def __init__(self, window=STATS_WINDOW):
+        self._values = deque(maxlen=window)
+
+    def observe(self, value):
+        self._values.append(value)
+
+    def summary(self):
+        values = sorted(self._values)
+        if not values:
+            return None
+        count = len(values)
+        return {
+            "count": count,
+            "min": round(values[0], 2),
+            "avg": round(sum(values) / count, 2),
+            "p50": round(values[(count - 1) // 2], 2),
+            "p95": round(values[round(0.95 * (count - 1))], 2),
+            "max": round(values[-1], 2),
+        }
+
+
+class AgentStats:
+    """
+    Rolling histograms and monotonically increasing counters for one target,
+    e.g. "section.tablespaces.db_ms" or "send.errors". Safe to update from any thread.
+    """
+
+    def __init__(self, window=STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram(self.window)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """The `agentStats` report section: histogram summaries, counters and process figures."""
+        with self._lock:
+            histograms = {name: h.summary() for name, h in sorted(self._histograms.items())}
+            counters = dict(sorted(self._counters.items()))
+        return {"histograms": histograms, "counters": counters, "process": process_stats()}
+
+
+class InstrumentedCursor:
+    """
+    Wraps a DB-API cursor and measures the time spent in execute/fetch calls,
+    the rows fetched and an estimate of the round-trips (one per execute, plus
+    one per additional `arraysize` batch fetched).
+    """
+
+    # Fetch tuning set on the wrapper has to reach the real cursor
+    FORWARDED_ATTRIBUTES = ("arraysize", "prefetchrows", "rowfactory")
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.round_trips = 0
+        self.errors = 0
+
+    def _timed(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.db_seconds += time.perf_counter() - started
+
+    def _count_rows(self, count):
+        self.rows += count
+        arraysize = getattr(self._cursor, "arraysize", 0) or 100
+        self.round_trips += count // arraysize
+
+    def execute(self, *args, **kwargs):
+        self.round_trips += 1
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self.rows += 1
+        return row
+
+    def __iter__(self):
+        iterator = iter(self._cursor)
+        count = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    row = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.db_seconds += time.perf_counter() - started
+                count += 1
+                yield row
+        finally:
+            # Counted once at the end, so the round-trips reflect whole arraysize batches
+            self._count_rows(count)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name in self.FORWARDED_ATTRIBUTES:
+            setattr(self._cursor, name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+
+_process = None
+
+
+def process_stats():
+    """Resident memory and thread count of the agent process (RSS needs psutil)."""
+    global _process
+    stats = {"threads": threading.active_count(), "rss_mb": None}
+    try:
+        if _process is None:
+            import psutil
+            _process = psutil.Process(os.getpid())
+        stats["rss_mb"] = round(_process.memory_info().rss / (1024 * 1024), 1)
+    except Exception:
+        pass
+    return stats
@@ -0,0 +1,79 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Local API Configuration ---
+# Read-only HTTP endpoint on the agent host (e.g. GET /stats). Bound to loopback by
+# default; set LOCAL_API_PORT to None to disable it.
+LOCAL_API_HOST = "127.0.0.1"
+LOCAL_API_PORT = 9465
+
+
+class LocalApiServer:
+    """
+    Tiny threaded HTTP server for local pull endpoints. Each route is a callable
+    returning a JSON-serialisable object, or a (content_type, bytes) tuple.
+    """
+
+    def __init__(self, host=LOCAL_API_HOST, port=LOCAL_API_PORT):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self._server = None
+        self._thread = None
+
+    def add_route(self, path, handler):
+        self.routes[path] = handler
+
+    def _handler_class(self):
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                handler = routes.get(path)
+                if handler is None:
+                    self._respond(404, "application/json", b'{"error":"not found"}')
+                    return
+                try:
+                    result = handler(query)
+                except Exception as e:
+                    self._respond(500, "application/json", json.dumps({"error": str(e)}).encode("utf-8"))
+                    return
+                if isinstance(result, tuple):
+                    content_type, body = result
+                else:
+                    content_type, body = "application/json", json.dumps(result, default=str).encode("utf-8")
+                self._respond(200, content_type, body)
+
+            def _respond(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Polled frequently; keep the agent's output readable
+
+        return Handler
+
+    def start(self):
+        if self.port is None:
+            return False
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        except OSError as e:
+            print(f"Warning: Could not start the local API on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-api", daemon=True)
+        self._thread.start()
+        print(f"Local API listening on http://{self.host}:{self.port} ({', '.join(sorted(self.routes))}).")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,113 @@
+import time
+
+
+def _cpu_busy_and_total(cpu_times):
+    """Returns (busy, total) seconds from a psutil cpu_times() reading."""
+    total = sum(cpu_times)
+    # Guest time is already accounted for in user/nice on Linux, so don't count it twice
+    total -= getattr(cpu_times, "guest", 0) + getattr(cpu_times, "guest_nice", 0)
+    idle = cpu_times.idle + getattr(cpu_times, "iowait", 0)
+    return total - idle, total
+
+
+class OSSample:
+    """One consistent reading of host metrics, taken at a single point in time."""
+
+    def __init__(self, timestamp, interval, cpu_percent, memory, disk_io, disk_rates, net_up_rate, net_down_rate, boot_time):
+        self.timestamp = timestamp
+        # Seconds since the previous sample; 0 for the very first one
+        self.interval = interval
+        self.cpu_percent = cpu_percent
+        self.memory = memory
+        # Raw cumulative per-disk counters and {disk: (read_mb_s, write_mb_s)} since the previous sample
+        self.disk_io = disk_io
+        self.disk_rates = disk_rates
+        self.net_up_rate = net_up_rate
+        self.net_down_rate = net_down_rate
+        self.boot_time = boot_time
+
+
+class OSSampler:
+    """
+    Keeps the previous cumulative CPU, disk and network counters and turns them
+    into rates on each call to `sample()`. Nothing here sleeps: the rates cover the
+    time since the last sample, i.e. the whole collection period.
+    """
+
+    def __init__(self, psutil):
+        self.psutil = psutil
+        self._prev_timestamp = None
+        self._prev_cpu = None
+        self._prev_disk_io = None
+        self._prev_net_io = None
+
+    def prime(self):
+        """Takes a baseline reading so the first real sample already has deltas."""
+        self.sample()
+
+    def _read_disk_io(self):
+        try:
+            return self.psutil.disk_io_counters(perdisk=True) or {}
+        except Exception as e:
+            print(f"Could not read disk I/O counters: {e}")
+            return {}
+
+    def _read_net_io(self):
+        try:
+            return self.psutil.net_io_counters()
+        except Exception as e:
+            print(f"Could not read network I/O counters: {e}")
+            return None
+
+    def sample(self):
+        psutil = self.psutil
+        now = time.time()
+        cpu = _cpu_busy_and_total(psutil.cpu_times())
+        memory = psutil.virtual_memory()
+        disk_io = self._read_disk_io()
+        net_io = self._read_net_io()
+        try:
+            boot_time = psutil.boot_time()
+        except Exception as e:
+            print(f"Could not get host uptime: {e}")
+            boot_time = None
+
+        interval = 0.0
+        cpu_percent = 0.0
+        disk_rates = {}
+        net_up_rate = 0.0
+        net_down_rate = 0.0
+
+        if self._prev_timestamp is not None:
+            interval = now - self._prev_timestamp
+
+            busy_delta = cpu[0] - self._prev_cpu[0]
+            total_delta = cpu[1] - self._prev_cpu[1]
+            if total_delta > 0:
+                cpu_percent = round(min(100.0, max(0.0, busy_delta / total_delta * 100)), 1)
+
+            if interval > 0:
+                for key, current_stats in disk_io.items():
+                    prev_stats = self._prev_disk_io.get(key)
+                    if prev_stats is None:
+                        continue
+                    # Counters can wrap or reset (e.g. device re-attached); treat that as no activity
+                    read_bytes_diff = max(0, current_stats.read_bytes - prev_stats.read_bytes)
+                    write_bytes_diff = max(0, current_stats.write_bytes - prev_stats.write_bytes)
+                    disk_rates[key] = (
+                        read_bytes_diff / interval / (1024 * 1024), # MB/s
+                        write_bytes_diff / interval / (1024 * 1024), # MB/s
+                    )
+
+                if net_io is not None and self._prev_net_io is not None:
+                    sent_bytes_diff = max(0, net_io.bytes_sent - self._prev_net_io.bytes_sent)
+                    recv_bytes_diff = max(0, net_io.bytes_recv - self._prev_net_io.bytes_recv)
+                    net_up_rate = sent_bytes_diff / interval / (1024 * 1024) # MB/s
+                    net_down_rate = recv_bytes_diff / interval / (1024 * 1024) # MB/s
+
+        self._prev_timestamp = now
+        self._prev_cpu = cpu
+        self._prev_disk_io = disk_io
+        self._prev_net_io = net_io
+
+        return OSSample(now, interval, cpu_percent, memory, disk_io, disk_rates, net_up_rate, net_down_rate, boot_time)
@@ -0,0 +1,40 @@
+import random
+import time
+
+
+class SectionScheduler:
+    """
+    Decides which sections are due on a given cycle. A section with an `interval`
+    runs at most once per interval (plus or minus its jitter); in between, the
+    value from its last successful run is reused in the report.
+    """
+
+    def __init__(self):
+        self._next_due = {}
+        self._last_value = {}
+
+    def is_due(self, section, now=None):
+        if not section.interval:
+            return True
+        if section.name not in self._last_value:
+            return True
+        now = time.monotonic() if now is None else now
+        return now >= self._next_due.get(section.name, 0)
+
+    def cached(self, section):
+        return self._last_value.get(section.name)
+
+    def record(self, section, value, now=None):
+        """Remembers a successful result and schedules the section's next run."""
+        if not section.interval:
+            return
+        now = time.monotonic() if now is None else now
+        # Jitter spreads the expensive dictionary scans of many agents over time
+        jitter = random.uniform(-section.jitter, section.jitter) if section.jitter else 0
+        self._last_value[section.name] = value
+        self._next_due[section.name] = now + max(0, section.interval + jitter)
+
+    def reset(self):
+        """Forget cached results, e.g. after a reconnect or a database role change."""
+        self._next_due.clear()
+        self._last_value.clear()
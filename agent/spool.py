@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from transport import Transport, encode_json
+
+# --- Spool Configuration ---
+# Reports that could not be delivered are kept here and replayed once the server is back.
+SPOOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_spool.sqlite")
+# Oldest reports are evicted once the spool grows past this size
+SPOOL_MAX_BYTES = 200 * 1024 * 1024
+# Replay pacing: at most REPLAY_BATCH_SIZE reports per POST, one POST every REPLAY_INTERVAL_SECONDS
+REPLAY_BATCH_SIZE = 20
+REPLAY_INTERVAL_SECONDS = 2
+# How long the replayer waits before probing the server again after a failed batch
+REPLAY_RETRY_SECONDS = 30
+# 4xx answers that are worth retrying; any other 4xx means the server will refuse the same body again
+RETRYABLE_STATUS_CODES = (408, 429)
+# A report that gets a 5xx this many times while the server accepts other reports is dropped
+REPLAY_MAX_ATTEMPTS = 5
+
+
+class Spool:
+    """
+    Append-only SQLite queue of undelivered reports, stored as compact JSON.
+    Safe to use from the main loop and the replay thread at the same time.
+    """
+
+    def __init__(self, path=SPOOL_FILE, max_bytes=SPOOL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL,
+                size INTEGER,
+                body BLOB,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Spool files written before attempts were counted
+        if "attempts" not in {row[1] for row in self._conn.execute("PRAGMA table_info(spool)")}:
+            self._conn.execute("ALTER TABLE spool ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spool").fetchone()
+        self._count, self._total_bytes = row
+        if self._count:
+            print(f"Spool contains {self._count} undelivered report(s) ({self._total_bytes} bytes) from a previous run.")
+
+    def __len__(self):
+        return self._count
+
+    def append(self, data):
+        body = encode_json(data)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO spool (created_at, size, body) VALUES (?, ?, ?)",
+                    (time.time(), len(body), body),
+                )
+            except sqlite3.Error as e:
+                print(f"Error writing report to spool, it will be lost: {e}")
+                return
+            self._count += 1
+            self._total_bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        """Drops the oldest reports until the spool fits in max_bytes. Caller holds the lock."""
+        evicted = 0
+        while self._total_bytes > self.max_bytes and self._count > 1:
+            rows = self._conn.execute("SELECT id, size FROM spool ORDER BY id LIMIT 100").fetchall()
+            ids = []
+            for row_id, size in rows:
+                if self._total_bytes <= self.max_bytes or self._count <= 1:
+                    break
+                ids.append(row_id)
+                self._total_bytes -= size
+                self._count -= 1
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+            evicted += len(ids)
+        if evicted:
+            print(f"Warning: Spool exceeded {self.max_bytes} bytes; dropped the {evicted} oldest report(s).")
+
+    def peek(self, limit):
+        """Returns up to `limit` of the oldest reports as [(id, body_bytes)]."""
+        with self._lock:
+            return self._conn.execute("SELECT id, body FROM spool ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+    def record_failure(self, row_id):
+        """Counts one more failed delivery of a report; returns its total."""
+        with self._lock:
+            self._conn.execute("UPDATE spool SET attempts = attempts + 1 WHERE id = ?", (row_id,))
+            row = self._conn.execute("SELECT attempts FROM spool WHERE id = ?", (row_id,)).fetchone()
+        return row[0] if row else 0
+
+    def remove(self, ids):
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            count, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spool WHERE id IN ({placeholders})", ids
+            ).fetchone()
+            self._conn.execute(f"DELETE FROM spool WHERE id IN ({placeholders})", ids)
+            self._count -= count
+            self._total_bytes -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def is_rejection(error):
+    """True for a 4xx answer that resending the same body cannot fix (e.g. 400, 413, 415)."""
+    response = getattr(error, "response", None)
+    return (isinstance(error, requests.exceptions.HTTPError) and response is not None
+            and 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUS_CODES)
+
+
+def is_server_error(error):
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None and response.status_code >= 500
+
+
+class SpoolReplayer:
+    """
+    Background thread that drains the spool in batched POSTs (a JSON array of
+    reports) at a bounded rate, pausing while the server is unreachable or failing (5xx).
+    A batch the server rejects (4xx) or fails on (5xx) is resent report by report, so one
+    bad report cannot block the spool: reports rejected on their own are dropped, and
+    reports that keep failing while the server accepts others are skipped and dropped
+    after REPLAY_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, spool, url):
+        self.spool = spool
+        # Separate HTTP session: requests.Session is not meant to be shared across threads
+        self.transport = Transport(url)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        # Set when a live report got through, i.e. the server is accepting reports
+        self._live_delivered = False
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def notify(self):
+        """Wake the replayer after a live report got through again."""
+        self._live_delivered = True
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.transport.close()
+
+    def _post(self, rows):
+        self.transport.send_json_bytes(b"[" + b",".join(row[1] for row in rows) + b"]")
+
+    def _replay_batch(self):
+        rows = self.spool.peek(REPLAY_BATCH_SIZE)
+        if not rows:
+            return 0
+        try:
+            self._post(rows)
+        except requests.exceptions.RequestException as e:
+            if not (is_rejection(e) or is_server_error(e)):
+                raise
+            return self._replay_one_by_one(rows, e)
+        self.spool.remove([row[0] for row in rows])
+        return len(rows)
+
+    def _replay_one_by_one(self, rows, error):
+        """
+        Isolates the reports of a failed batch; returns how many were delivered. Raises the
+        last error when none got through and no live report did either (the server is down).
+        """
+        live_delivered, self._live_delivered = self._live_delivered, False
+        delivered = 0
+        failed = [] # (id, size, error) of reports answered with a 5xx
+        for row_id, body in rows:
+            # A batch of one was already answered as it is
+            if len(rows) > 1:
+                try:
+                    self._post([(row_id, body)])
+                except requests.exceptions.RequestException as e:
+                    if not (is_rejection(e) or is_server_error(e)):
+                        raise
+                    error = e
+                else:
+                    self.spool.remove([row_id])
+                    delivered += 1
+                    continue
+            response = error.response
+            if is_server_error(error):
+                failed.append((row_id, len(body), error))
+                continue
+            print(f"Warning: Server rejected spooled report {row_id} ({len(body)} bytes) with "
+                  f"{response.status_code}: {response.text[:200]!r}. Dropping it.")
+            self.spool.remove([row_id])
+
+        if failed and not delivered and not live_delivered:
+            raise failed[-1][2]
+        # The server is taking other reports, so these fail because of their content
+        for row_id, size, error in failed:
+            attempts = self.spool.record_failure(row_id)
+            response = error.response
+            if attempts >= REPLAY_MAX_ATTEMPTS:
+                print(f"Warning: Spooled report {row_id} ({size} bytes) failed {attempts} times with "
+                      f"{response.status_code}: {response.text[:200]!r}. Dropping it.")
+                self.spool.remove([row_id])
+            else:
+                print(f"Skipping spooled report {row_id} for now: server answered {response.status_code} "
+                      f"({attempts}/{REPLAY_MAX_ATTEMPTS} attempts).")
+        return delivered
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if not len(self.spool):
+                self._wakeup.wait(REPLAY_RETRY_SECONDS)
+                self._wakeup.clear()
+                continue
+            try:
+                sent = self._replay_batch()
+                print(f"Replayed {sent} spooled report(s), {len(self.spool)} remaining.")
+                self._stopped.wait(REPLAY_INTERVAL_SECONDS)
+            except requests.exceptions.RequestException as e:
+                print(f"Spool replay paused, server unreachable or failing: {e}")
+                self._wakeup.wait(REPLAY_RETRY_SECONDS)
+                self._wakeup.clear()
@@ -0,0 +1,144 @@
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+# --- Top SQL Configuration ---
+# Statements reported per cycle, ranked by elapsed time spent since the previous cycle
+TOP_SQL_COUNT = 10
+# Cursors not active for this long are dropped from the previous-state table ...
+SQLSTATS_RETENTION = timedelta(minutes=30)
+# ... which never holds more than this many cursors (least recently active go first)
+SQLSTATS_MAX_TRACKED = 20000
+# First poll: cursors active this recently form the baseline (nothing is reported yet)
+SQLSTATS_INITIAL_LOOKBACK = timedelta(minutes=15)
+# LAST_ACTIVE_TIME has one-second resolution; re-read the boundary second
+SQLSTATS_OVERLAP = timedelta(seconds=2)
+SQL_TEXT_CACHE_SIZE = 1000
+# Rows per round-trip; the first poll can return most of a large shared pool
+SQLSTATS_ARRAYSIZE = 2000
+
+SQLSTATS_QUERY = """
+    SELECT sql_id, plan_hash_value, elapsed_time, cpu_time, buffer_gets, executions, last_active_time
+    FROM v$sqlstats
+    WHERE {time_predicate}
+"""
+SQLSTATS_INITIAL_PREDICATE = "last_active_time > SYSDATE - NUMTODSINTERVAL(:seconds, 'SECOND')"
+SQLSTATS_INCREMENTAL_PREDICATE = "last_active_time >= :since"
+SQL_TEXT_QUERY = "SELECT sql_id, substr(sql_text, 1, 200) FROM v$sqlstats WHERE sql_id IN ({binds})"
+
+
+class SqlStatsTracker:
+    """
+    Turns the cumulative counters of V$SQLSTATS into per-cycle deltas. Only cursors
+    active since the previous poll are read, their counters are differenced against
+    a bounded table of previous values, and only the top statements are reported.
+    """
+
+    def __init__(self, top_n=TOP_SQL_COUNT, max_tracked=SQLSTATS_MAX_TRACKED):
+        self.top_n = top_n
+        self.max_tracked = max_tracked
+        # (sql_id, plan_hash_value) -> (last_active_time, elapsed_us, cpu_us, buffer_gets, executions),
+        # in order of the poll that last saw each cursor (least recently active first)
+        self._previous = OrderedDict()
+        self._sql_text = {}
+        self._high_water = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Counters restart with the instance; forget everything."""
+        with self._lock:
+            self._previous.clear()
+            self._sql_text.clear()
+            self._high_water = None
+
+    def _query(self):
+        if self._high_water is None:
+            return SQLSTATS_QUERY.format(time_predicate=SQLSTATS_INITIAL_PREDICATE), [SQLSTATS_INITIAL_LOOKBACK.total_seconds()]
+        return SQLSTATS_QUERY.format(time_predicate=SQLSTATS_INCREMENTAL_PREDICATE), [self._high_water - SQLSTATS_OVERLAP]
+
+    def _consume(self, rows):
+        """
+        Updates the previous-state table; returns [(elapsed_delta, key, deltas)] for cursors seen before.
+        Nothing is applied until `rows` is exhausted, so a fetch that fails part-way leaves the
+        table and the high-water mark as they were and the next poll reads the same cursors again.
+        """
+        previous = self._previous
+        seen = []
+        deltas = []
+        high_water = self._high_water
+        for sql_id, plan_hash_value, elapsed, cpu, gets, executions, last_active in rows:
+            key = (sql_id, plan_hash_value)
+            current = (last_active, elapsed or 0, cpu or 0, gets or 0, executions or 0)
+            seen.append((key, current))
+            if high_water is None or last_active > high_water:
+                high_water = last_active
+            before = previous.get(key)
+            # A cursor seen for the first time only sets its baseline: its counters may cover days
+            if before is None:
+                continue
+            # A counter that went backwards means the cursor was reloaded; count from zero
+            change = tuple(now - then if now >= then else now for now, then in zip(current[1:], before[1:]))
+            if change[0] > 0:
+                deltas.append((change[0], key, change))
+
+        for key, current in seen:
+            previous[key] = current
+            previous.move_to_end(key) # Keeps the table in recency order
+        self._high_water = high_water
+        return deltas
+
+    def _evict(self):
+        # The oldest entries are at the front, so eviction stops at the first one that stays
+        previous = self._previous
+        cutoff = self._high_water - SQLSTATS_RETENTION if self._high_water is not None else None
+        while previous:
+            key, (last_active, *_) = next(iter(previous.items()))
+            if len(previous) <= self.max_tracked and (cutoff is None or last_active >= cutoff):
+                break
+            previous.popitem(last=False)
+
+    def _fetch_text(self, cursor, execute_query, sql_ids):
+        missing = [sql_id for sql_id in dict.fromkeys(sql_ids) if sql_id not in self._sql_text]
+        if missing:
+            binds = ", ".join(f":{i + 1}" for i in range(len(missing)))
+            for sql_id, text in execute_query(cursor, SQL_TEXT_QUERY.format(binds=binds), params=missing):
+                self._sql_text[sql_id] = text
+            if len(self._sql_text) > SQL_TEXT_CACHE_SIZE:
+                for sql_id in list(self._sql_text)[:len(self._sql_text) - SQL_TEXT_CACHE_SIZE]:
+                    del self._sql_text[sql_id]
+
+    def poll(self, cursor, execute_query, stream_query):
+        """
+        Reads the cursors active since the last poll and returns the top statements
+        by elapsed time in that interval. Rows are differenced as they are fetched.
+        Raises PermissionError when V$SQLSTATS is not accessible.
+        """
+        with self._lock:
+            query, params = self._query()
+            deltas = self._consume(stream_query(cursor, query, params=params, arraysize=SQLSTATS_ARRAYSIZE))
+            self._evict()
+            top = heapq.nlargest(self.top_n, deltas, key=lambda item: item[0])
+            if not top:
+                return []
+            try:
+                self._fetch_text(cursor, execute_query, [key[0] for _, key, _ in top])
+            except Exception as e:
+                print(f"Could not read SQL text for top SQL: {e}")
+
+            top_sql = []
+            for _, (sql_id, plan_hash_value), (elapsed, cpu, gets, executions) in top:
+                top_sql.append({
+                    "sql_id": sql_id,
+                    "plan_hash_value": plan_hash_value,
+                    "sql_text": self._sql_text.get(sql_id),
+                    "elapsed_s": round(elapsed / 1000000, 3),
+                    "cpu_s": round(cpu / 1000000, 3),
+                    "buffer_gets": gets,
+                    "executions": executions,
+                    "elapsed_per_exec_ms": round(elapsed / executions / 1000, 3) if executions else None,
+                })
+            return top_sql
+
+    def __len__(self):
+        return len(self._previous)
@@ -0,0 +1,38 @@
+import json
+import os
+import threading
+
+# --- Persistent Agent State ---
+# Small JSON document for state that must survive agent restarts (e.g. the alert log high-water mark).
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_state.json")
+
+
+class StateStore:
+    """Key/value state kept in a JSON file. Writes go to a temp file and are renamed into place."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read agent state from {path}, starting fresh: {e}")
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._data, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Warning: Could not save agent state to {self.path}: {e}")
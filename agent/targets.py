@@ -0,0 +1,121 @@
+import json
+import os
+
+from alert_tail import AlertLogTailer
+from anomaly import AnomalyMonitor, BurstMode
+from ash_reader import AshReader
+from columnar import PayloadSchema
+from collector_engine import CollectorEngine
+from db_pool import POOL_MAX_SESSIONS, DatabasePool
+from delta import DeltaEncoder
+from instrumentation import AgentStats
+from scheduler import SectionScheduler
+from sql_stats import SqlStatsTracker
+
+# --- Multi-Target Configuration ---
+# When this file exists the agent monitors every database listed in it from one process;
+# otherwise it monitors the single database configured at the top of agent.py.
+# See targets.example.json for the format.
+TARGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "targets.json")
+
+
+class Target:
+    """
+    One monitored database and everything the agent keeps about it between cycles:
+    its connection pool, detected capabilities, section schedule, alert log and ASH
+    readers, delta encoder and negotiated payload schema. Host-level OS sampling is shared by all targets.
+    """
+
+    def __init__(self, server_id, db_name, host, port, service_name, user, password,
+                 sysdba=False, state_store=None, state_key=None, pool_sessions=POOL_MAX_SESSIONS):
+        self.server_id = server_id
+        self.db_name = db_name
+        self.host = host
+        self.port = port
+        self.service_name = service_name
+        self.user = user
+        self.password = password
+        self.sysdba = sysdba
+        self.pool_sessions = pool_sessions
+
+        self.pool = self._build_pool()
+        # Role, edition, version and view grants, probed once per connection (see capabilities.py)
+        self.capabilities = None
+        self.alert_log_tailer = AlertLogTailer(state_store, state_key or f"alert_log:{server_id}")
+        self.ash_reader = AshReader()
+        self.sql_stats = SqlStatsTracker()
+        self.delta_encoder = DeltaEncoder()
+        self.payload_schema = PayloadSchema()
+        # Collector timings, payload sizes and HTTP latency, reported as `agentStats`
+        self.stats = AgentStats()
+        # Spike detection on each report, and the burst sampling it switches on
+        self.anomalies = AnomalyMonitor()
+        self.burst = BurstMode()
+        self.engine = None
+
+    def attach(self, executor):
+        """Creates this target's collector engine on the shared worker pool."""
+        self.engine = CollectorEngine(scheduler=SectionScheduler(), executor=executor, context=self, stats=self.stats)
+
+    def _build_pool(self):
+        connection_params = {
+            "user": self.user,
+            "password": self.password,
+            "dsn": f"{self.host}:{self.port}/{self.service_name}"
+        }
+        describe = f"{self.user}@{connection_params['dsn']}"
+
+        if self.sysdba:
+            try:
+                import oracledb
+                connection_params["mode"] = oracledb.SYSDBA
+                describe += " as SYSDBA"
+            except ImportError:
+                pass # Reported by the pool when it tries to connect
+
+        return DatabasePool(connection_params, describe=describe, max_sessions=self.pool_sessions)
+
+    def close(self):
+        if self.engine:
+            self.engine.shutdown()
+        self.pool.close()
+
+
+def load_targets(path, state_store, pool_sessions=POOL_MAX_SESSIONS):
+    """
+    Reads the targets file. Each entry needs id, name, host, service_name and user;
+    port defaults to 1521, and the password may be given directly or through
+    `password_env` (the name of an environment variable).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    targets = []
+    seen_ids = set()
+    for entry in config.get("targets", []):
+        server_id = entry["id"]
+        if server_id in seen_ids:
+            raise ValueError(f"Duplicate target id '{server_id}' in {path}")
+        seen_ids.add(server_id)
+
+        password = entry.get("password")
+        if password is None and entry.get("password_env"):
+            password = os.environ.get(entry["password_env"])
+            if password is None:
+                print(f"Warning: Environment variable {entry['password_env']} for target '{server_id}' is not set.")
+
+        targets.append(Target(
+            server_id=server_id,
+            db_name=entry.get("name", server_id),
+            host=entry["host"],
+            port=entry.get("port", 1521),
+            service_name=entry["service_name"],
+            user=entry["user"],
+            password=password,
+            sysdba=entry.get("sysdba", False),
+            state_store=state_store,
+            pool_sessions=pool_sessions,
+        ))
+    if not targets:
+        raise ValueError(f"No targets defined in {path}")
+    return targets
@@ -0,0 +1,9 @@
+class FailingRows:
+    """Yields the given rows, then raises like a fetch that fails mid-stream."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        yield from self.rows
+        raise RuntimeError("ORA-03113: end-of-file on communication channel")
@@ -0,0 +1,88 @@
+"""
+Unit tests for ash_reader.AshReader. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+
+import ash_reader
+from ash_reader import ASH_OVERLAP, AshReader
+from fake_rows import FailingRows
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def sample(inst_id, sample_id, seconds, event="db file sequential read", session_id=1, time_waited=1000):
+    return (inst_id, sample_id, T0 + timedelta(seconds=seconds), event, session_id, time_waited)
+
+
+def stream(rows):
+    """A stream_query stand-in that records the query and params it was called with."""
+    calls = []
+
+    def stream_query(cursor, query, params=None, arraysize=100, rowfactory=None):
+        calls.append((query, params))
+        return rows.pop(0)
+    return stream_query, calls
+
+
+class AshReaderTest(unittest.TestCase):
+
+    def test_overlap_reread_is_not_counted_twice(self):
+        reader = AshReader()
+        first = [sample(1, 100, 5, session_id=1), sample(1, 101, 6, session_id=2), sample(2, 500, 7, session_id=3)]
+        # The second poll re-reads the overlap (100, 101, 500) and brings a late row from instance 2
+        second = first + [sample(2, 501, 8, session_id=4), sample(1, 102, 9, session_id=1, time_waited=500)]
+        stream_query, calls = stream([first, second])
+
+        reader.poll(None, stream_query)
+        [event] = reader.poll(None, stream_query)
+
+        self.assertEqual(calls[0][1], None)
+        self.assertIn(ash_reader.ASH_INITIAL_PREDICATE, calls[0][0])
+        # Resumes from the instance furthest behind, minus the overlap
+        self.assertEqual(calls[1][1], [T0 + timedelta(seconds=6) - ASH_OVERLAP])
+        self.assertEqual(event["value"], 4)
+        [point] = event["data"]
+        self.assertEqual(point["date"], "2024-01-01T12:00:00Z")
+        self.assertEqual(point["latency"], 0.0045)
+
+    def test_failed_fetch_applies_nothing(self):
+        reader = AshReader()
+        stream_query, calls = stream([FailingRows([sample(1, 100, 5)]), [sample(1, 100, 5), sample(1, 101, 6)]])
+
+        with self.assertRaises(RuntimeError):
+            reader.poll(None, stream_query)
+        self.assertEqual(reader.top_wait_events(), [])
+        self.assertEqual(reader._high_water, {})
+
+        # The next poll reads the same window again and counts each sample once
+        [event] = reader.poll(None, stream_query)
+        self.assertEqual(calls[1][1], None)
+        self.assertEqual(event["data"][0]["latency"], 0.002)
+
+    def test_window_eviction(self):
+        reader = AshReader()
+        stream_query, _ = stream([[sample(1, 100, 0), sample(1, 200, 20 * 60, event="log file sync")]])
+        events = reader.poll(None, stream_query)
+        # The first minute is more than ASH_WINDOW older than the newest sample
+        self.assertEqual([e["event"] for e in events], ["log file sync"])
+
+    def test_reset(self):
+        reader = AshReader()
+        stream_query, calls = stream([[sample(1, 100, 5)], [sample(1, 100, 5)]])
+        reader.poll(None, stream_query)
+        reader.reset()
+        [event] = reader.poll(None, stream_query)
+        self.assertEqual(calls[1][1], None)
+        self.assertEqual(event["value"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
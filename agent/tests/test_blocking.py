@@ -0,0 +1,74 @@
+"""
+Unit tests for blocking.analyze_blocking. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blocking import analyze_blocking
+
+
+def session(inst, sid, bs=None, bi=None, **fields):
+    return {"inst": inst, "sid": sid, "bs": bs, "bi": bi, **fields}
+
+
+class AnalyzeBlockingTest(unittest.TestCase):
+
+    def test_no_blocking(self):
+        result = analyze_blocking([session(1, 10), session(2, 20)])
+        self.assertEqual(result, {"blocked_sessions": 0, "max_depth": 0, "roots": [], "deadlocks": []})
+
+    def test_chain_depth_and_counts(self):
+        # 1:10 <- 1:11 <- 1:12, and 1:13 also waits on 1:10 (blocking instance left empty)
+        result = analyze_blocking([
+            session(1, 10, username="APP", sql_id="abc"),
+            session(1, 11, bs=10, bi=1),
+            session(1, 12, bs=11, bi=1),
+            session(1, 13, bs=10),
+        ])
+        self.assertEqual(result["blocked_sessions"], 3)
+        self.assertEqual(result["max_depth"], 2)
+        self.assertEqual(result["deadlocks"], [])
+        [root] = result["roots"]
+        self.assertEqual((root["inst"], root["sid"], root["username"], root["sql_id"]), (1, 10, "APP", "abc"))
+        self.assertEqual((root["blocked"], root["direct"], root["max_depth"]), (3, 2, 2))
+
+    def test_idle_root_blocker(self):
+        # The blocker is not in the list (idle session holding a lock)
+        result = analyze_blocking([session(1, 11, bs=10, bi=1)])
+        [root] = result["roots"]
+        self.assertEqual((root["inst"], root["sid"], root["username"], root["blocked"]), (1, 10, None, 1))
+
+    def test_cross_instance_deadlock_with_waiter(self):
+        # 1:10 and 2:20 wait on each other across RAC instances; 1:30 queues behind 2:20
+        result = analyze_blocking([
+            session(1, 10, bs=20, bi=2),
+            session(2, 20, bs=10, bi=1),
+            session(1, 30, bs=20, bi=2),
+        ])
+        self.assertEqual(result["blocked_sessions"], 3)
+        self.assertEqual(result["roots"], [])
+        [deadlock] = result["deadlocks"]
+        self.assertTrue(deadlock["cross_instance"])
+        self.assertEqual(sorted((s["inst"], s["sid"]) for s in deadlock["sessions"]), [(1, 10), (2, 20)])
+        self.assertEqual(deadlock["blocked"], 1)
+        self.assertEqual(result["max_depth"], 1)
+
+    def test_same_instance_deadlock_found_from_waiter(self):
+        # The walk starts at the waiter, so the cycle is entered part-way along the path
+        result = analyze_blocking([
+            session(1, 30, bs=10, bi=1),
+            session(1, 10, bs=20, bi=1),
+            session(1, 20, bs=10, bi=1),
+        ])
+        [deadlock] = result["deadlocks"]
+        self.assertFalse(deadlock["cross_instance"])
+        self.assertEqual(sorted(s["sid"] for s in deadlock["sessions"]), [10, 20])
+        self.assertEqual(deadlock["blocked"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Unit tests for capabilities and the agent's re-probe decision. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent
+from capabilities import Capabilities, detect_capabilities
+
+
+class ScriptedCursor:
+    """Answers queries by substring; queries matching `denied` fail with ORA-00942."""
+
+    def __init__(self, answers, denied=()):
+        self.answers = answers
+        self.denied = denied
+        self.executed = []
+        self._row = None
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if any(view in query for view in self.denied):
+            raise Exception("ORA-00942: table or view does not exist")
+        self._row = next((answer for text, answer in self.answers.items() if text in query), None)
+
+    def fetchone(self):
+        return None if self._row is None else (self._row,)
+
+    def fetchall(self):
+        return []
+
+
+def target(caps, generation=1):
+    reset = []
+    component = SimpleNamespace(reset=lambda: reset.append(True))
+    return SimpleNamespace(server_id="db1", capabilities=caps, pool=SimpleNamespace(generation=generation),
+                           engine=SimpleNamespace(scheduler=component), ash_reader=component, sql_stats=component), reset
+
+
+class DetectCapabilitiesTest(unittest.TestCase):
+
+    def test_role_from_v_database(self):
+        cursor = ScriptedCursor({"V$DATABASE": "PHYSICAL STANDBY", "V$INSTANCE": "19.0.0.0.0",
+                                 "V$VERSION": "Oracle Database 19c Enterprise Edition"})
+        caps = detect_capabilities(cursor)
+        self.assertEqual((caps.role, caps.edition, caps.major_version), ("PHYSICAL STANDBY", "EE", 19))
+        self.assertFalse(any("SYS_CONTEXT" in query for query in cursor.executed))
+
+    def test_role_falls_back_to_session_context(self):
+        cursor = ScriptedCursor({"SYS_CONTEXT": "PRIMARY", "V$INSTANCE": "19.0.0.0.0"}, denied=("V$DATABASE", "V$SQLSTATS"))
+        caps = detect_capabilities(cursor)
+        self.assertEqual(caps.role, "PRIMARY")
+        self.assertTrue(caps.is_primary)
+        self.assertFalse(caps.can_read("V$SQLSTATS"))
+        self.assertTrue(caps.can_read("V$SESSION"))
+
+
+class RefreshCapabilitiesTest(unittest.TestCase):
+
+    def test_unknown_role_is_not_a_role_change(self):
+        # V$DATABASE and the session context were both unreadable at detection time
+        caps = Capabilities(role=None, version="19.0.0.0.0", startup_time="t0", generation=1)
+        t, reset = target(caps)
+        for _ in range(3):
+            agent.refresh_capabilities(t, ScriptedCursor({}), "t0", "PRIMARY")
+        self.assertIs(t.capabilities, caps)
+        self.assertEqual(reset, [])
+
+    def test_role_change_reprobes(self):
+        caps = Capabilities(role="PHYSICAL STANDBY", version="19.0.0.0.0", startup_time="t0", generation=1)
+        t, reset = target(caps)
+        agent.refresh_capabilities(t, ScriptedCursor({"V$DATABASE": "PRIMARY"}), "t0", "PRIMARY")
+        self.assertEqual(t.capabilities.role, "PRIMARY")
+        self.assertEqual(len(reset), 3)
+        # Stable from then on
+        agent.refresh_capabilities(t, ScriptedCursor({}), "t0", "PRIMARY")
+        self.assertEqual(len(reset), 3)
+
+    def test_reconnect_reprobes(self):
+        caps = Capabilities(role="PRIMARY", startup_time="t0", generation=1)
+        t, reset = target(caps, generation=2)
+        agent.refresh_capabilities(t, ScriptedCursor({"V$DATABASE": "PRIMARY"}), "t0", "PRIMARY")
+        self.assertIsNot(t.capabilities, caps)
+        self.assertEqual(len(reset), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
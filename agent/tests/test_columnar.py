@@ -0,0 +1,79 @@
+"""
+Unit tests for columnar, checked against the server's decoder. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import json
+import os
+import sys
+import unittest
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(AGENT_DIR), "server"))
+
+import server
+from columnar import PayloadSchema, encode_table, encode_wait_events
+
+PAYLOAD = {
+    "dbName": "ORCL",
+    "topWaitEvents": [
+        {"event": "db file sequential read", "value": 5, "data": [
+            {"date": "2024-01-01T12:00:00Z", "value": 2, "latency": 0.01},
+            {"date": "2024-01-01T12:02:00Z", "value": 3, "latency": 0.02},
+        ]},
+        {"event": "log file sync", "value": 1, "data": [
+            {"date": "2024-01-01T12:01:00Z", "value": 1, "latency": 0.5},
+        ]},
+        {"event": "CPU", "value": 0},
+    ],
+    "detailedActiveSessions": [
+        {"inst": 1, "sid": 10, "username": "APP", "status": "ACTIVE", "event": "log file sync", "module": None},
+        {"inst": 2, "sid": 20, "username": "APP", "status": "ACTIVE", "event": "CPU", "module": "batch"},
+        {"inst": 1, "sid": 30, "username": "SYS", "status": "INACTIVE", "event": "log file sync", "module": None},
+    ],
+}
+
+
+class ColumnarTest(unittest.TestCase):
+
+    def test_wait_events_share_dates(self):
+        encoded = encode_wait_events(PAYLOAD["topWaitEvents"])
+        self.assertEqual(encoded["dates"], ["2024-01-01T12:00:00Z", "2024-01-01T12:01:00Z", "2024-01-01T12:02:00Z"])
+        self.assertEqual(encoded["sessions"], [[2, None, 3], [None, 1, None], None])
+
+    def test_table_dictionary_columns(self):
+        encoded = encode_table(PAYLOAD["detailedActiveSessions"], ("username", "module"))
+        self.assertEqual(encoded["count"], 3)
+        values = dict(zip(encoded["columns"], encoded["values"]))
+        self.assertEqual(values["username"], [0, 0, 1])
+        self.assertEqual(values["module"], [None, 0, None])
+        self.assertEqual(encoded["dictionaries"], {"username": ["APP", "SYS"], "module": ["batch"]})
+        self.assertEqual(encode_table([]), {"columns": [], "count": 0, "values": [], "dictionaries": {}})
+
+    def test_v2_round_trip_through_server(self):
+        schema = PayloadSchema()
+        schema.negotiate({"status": "success", "maxSchemaVersion": server.MAX_SCHEMA_VERSION})
+        self.assertEqual(schema.version, 2)
+        # Through JSON, as on the wire
+        encoded = json.loads(json.dumps(schema.encode(PAYLOAD)))
+        self.assertEqual(encoded["schemaVersion"], 2)
+        self.assertEqual(server.decode_report(encoded), PAYLOAD)
+
+    def test_negotiation(self):
+        schema = PayloadSchema()
+        self.assertIs(schema.encode(PAYLOAD), PAYLOAD)
+        schema.negotiate({"status": "success"}) # older server
+        self.assertEqual(schema.version, 1)
+        schema.negotiate({"maxSchemaVersion": 99})
+        self.assertEqual(schema.version, 2)
+        schema.reset()
+        self.assertEqual(schema.version, 1)
+        self.assertIs(server.decode_report(PAYLOAD), PAYLOAD)
+
+    def test_server_rejects_newer_schema(self):
+        with self.assertRaises(server.UnsupportedPayloadError):
+            server.decode_report({"schemaVersion": server.MAX_SCHEMA_VERSION + 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
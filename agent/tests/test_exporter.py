@@ -0,0 +1,48 @@
+"""
+Unit tests for exporter.report_samples. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporter import METRICS_PREFIX, report_samples
+
+
+def wait_event_values(data):
+    samples = report_samples({"id": "db1", "dbName": "ORCL", **data}, 0)["wait_event_sessions"]
+    values = {}
+    for line in samples:
+        labels, value = line.rsplit(" ", 1)
+        values[labels.split('event="')[1].rstrip('"}')] = float(value)
+    return values
+
+
+class WaitEventSessionsTest(unittest.TestCase):
+
+    def test_ash_events_export_the_newest_minute(self):
+        values = wait_event_values({"topWaitEvents": [
+            {"event": "db file sequential read", "value": 12, "data": [
+                {"date": "2024-01-01T12:00:00Z", "value": 5, "latency": 0.1},
+                {"date": "2024-01-01T12:01:00Z", "value": 7, "latency": 0.1},
+            ]},
+            # Only seen in an older minute
+            {"event": "log file sync", "value": 4, "data": [
+                {"date": "2024-01-01T12:00:00Z", "value": 4, "latency": 0.2},
+            ]},
+        ]})
+        self.assertEqual(values, {"db file sequential read": 7.0, "log file sync": 0.0})
+
+    def test_snapshot_events_export_their_value(self):
+        values = wait_event_values({"topWaitEvents": [{"event": "CPU", "value": 3}]})
+        self.assertEqual(values, {"CPU": 3.0})
+
+    def test_sample_format(self):
+        [line] = report_samples({"id": "db1", "dbName": "ORCL", "topWaitEvents": [{"event": "CPU", "value": 3}]}, 0)["wait_event_sessions"]
+        self.assertEqual(line, f'{METRICS_PREFIX}_wait_event_sessions{{server_id="db1",db_name="ORCL",event="CPU"}} 3.0\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for spool replay. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spool import REPLAY_MAX_ATTEMPTS, Spool, SpoolReplayer
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b"error"
+    return requests.exceptions.HTTPError(f"{status} Error", response=response)
+
+
+class ScriptedServer:
+    """Stands in for SpoolReplayer._post: a status per report (None: unreachable), records deliveries."""
+
+    def __init__(self, status_for=lambda report: 201):
+        self.status_for = status_for
+        self.delivered = []
+        self.posts = 0
+
+    def post(self, rows):
+        self.posts += 1
+        reports = [json.loads(body) for _, body in rows]
+        statuses = [self.status_for(report) for report in reports]
+        if None in statuses:
+            raise requests.exceptions.ConnectionError("refused")
+        if max(statuses) >= 400:
+            # A batch gets the worst answer of its reports
+            raise http_error(max(statuses))
+        self.delivered.extend(report["n"] for report in reports)
+
+
+class SpoolReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.spool = Spool(os.path.join(self.dir.name, "spool.sqlite"))
+        self.replayer = SpoolReplayer(self.spool, "http://127.0.0.1:9/")
+
+    def tearDown(self):
+        self.replayer.transport.close()
+        self.spool.close()
+        self.dir.cleanup()
+
+    def serve(self, server, reports):
+        for n in reports:
+            self.spool.append({"n": n})
+        self.replayer._post = server.post
+
+    def test_batch_delivered(self):
+        server = ScriptedServer()
+        self.serve(server, range(3))
+        self.assertEqual(self.replayer._replay_batch(), 3)
+        self.assertEqual(server.delivered, [0, 1, 2])
+        self.assertEqual(len(self.spool), 0)
+
+    def test_rejected_report_is_dropped(self):
+        server = ScriptedServer(lambda report: 400 if report["n"] == 1 else 201)
+        self.serve(server, range(3))
+        self.assertEqual(self.replayer._replay_batch(), 2)
+        self.assertEqual(server.delivered, [0, 2])
+        self.assertEqual(len(self.spool), 0)
+
+    def test_outage_keeps_everything(self):
+        server = ScriptedServer(lambda report: 503)
+        self.serve(server, range(3))
+        for _ in range(REPLAY_MAX_ATTEMPTS + 1):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                self.replayer._replay_batch()
+        self.assertEqual(len(self.spool), 3)
+
+    def test_unreachable_server_keeps_everything(self):
+        server = ScriptedServer(lambda report: None)
+        self.serve(server, range(3))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.replayer._replay_batch()
+        self.assertEqual(server.posts, 1)
+        self.assertEqual(len(self.spool), 3)
+
+    def test_failing_report_is_skipped_then_dropped(self):
+        # Report 0 crashes the ingest handler; everything behind it is fine
+        server = ScriptedServer(lambda report: 500 if report["n"] == 0 else 201)
+        self.serve(server, range(3))
+        self.assertEqual(self.replayer._replay_batch(), 2)
+        self.assertEqual(server.delivered, [1, 2])
+        self.assertEqual(len(self.spool), 1)
+
+        # Alone in the spool, it only counts against itself while live reports get through
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.replayer._replay_batch()
+        for _ in range(REPLAY_MAX_ATTEMPTS - 1):
+            self.assertEqual(len(self.spool), 1)
+            self.replayer.notify()
+            self.replayer._replay_batch()
+        self.assertEqual(len(self.spool), 0)
+
+    def test_spool_from_before_attempts_were_counted(self):
+        path = os.path.join(self.dir.name, "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE spool (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, size INTEGER, body BLOB)")
+        conn.execute("INSERT INTO spool (created_at, size, body) VALUES (0, 8, '{\"n\":0}')")
+        conn.commit()
+        conn.close()
+        spool = Spool(path)
+        try:
+            [(row_id, _)] = spool.peek(10)
+            self.assertEqual(spool.record_failure(row_id), 1)
+        finally:
+            spool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
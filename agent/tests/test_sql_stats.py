@@ -0,0 +1,108 @@
+"""
+Unit tests for sql_stats.SqlStatsTracker. Run from the agent directory:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+
+from fake_rows import FailingRows
+from sql_stats import SQLSTATS_OVERLAP, SQLSTATS_RETENTION, SqlStatsTracker
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def cursor_row(sql_id, elapsed, seconds, cpu=0, gets=0, executions=1, plan_hash_value=1):
+    return (sql_id, plan_hash_value, elapsed, cpu, gets, executions, T0 + timedelta(seconds=seconds))
+
+
+class FakeQueries:
+    """stream_query / execute_query stand-ins: scripted V$SQLSTATS polls and SQL text lookups."""
+
+    def __init__(self, polls):
+        self.polls = list(polls)
+        self.params = []
+
+    def stream_query(self, cursor, query, params=None, arraysize=100, rowfactory=None):
+        self.params.append(params)
+        return self.polls.pop(0)
+
+    def execute_query(self, cursor, query, params=None):
+        return [(sql_id, f"SELECT /* {sql_id} */ 1 FROM dual") for sql_id in params]
+
+    def poll(self, tracker):
+        return tracker.poll(None, self.execute_query, self.stream_query)
+
+
+class SqlStatsTrackerTest(unittest.TestCase):
+
+    def test_first_poll_is_baseline_only(self):
+        queries = FakeQueries([[cursor_row("a", 5000000, 0)]])
+        tracker = SqlStatsTracker()
+        self.assertEqual(queries.poll(tracker), [])
+        self.assertEqual(len(tracker), 1)
+
+    def test_deltas_ranked_by_elapsed(self):
+        queries = FakeQueries([
+            [cursor_row("a", 1000000, 0, executions=10), cursor_row("b", 1000000, 0)],
+            [cursor_row("a", 1500000, 30, cpu=200000, executions=20), cursor_row("b", 4000000, 30, gets=7, executions=3)],
+        ])
+        tracker = SqlStatsTracker()
+        queries.poll(tracker)
+        top = queries.poll(tracker)
+        self.assertEqual(queries.params[1], [T0 - SQLSTATS_OVERLAP])
+        self.assertEqual([s["sql_id"] for s in top], ["b", "a"])
+        self.assertEqual((top[0]["elapsed_s"], top[0]["buffer_gets"], top[0]["executions"]), (3.0, 7, 2))
+        self.assertEqual((top[1]["elapsed_s"], top[1]["cpu_s"], top[1]["elapsed_per_exec_ms"]), (0.5, 0.2, 50.0))
+        self.assertEqual(top[0]["sql_text"], "SELECT /* b */ 1 FROM dual")
+
+    def test_counter_reset_counts_from_zero(self):
+        # The cursor was reloaded between polls: its counters restarted below the previous values
+        queries = FakeQueries([[cursor_row("a", 9000000, 0, executions=100)],
+                               [cursor_row("a", 2000000, 30, executions=4)]])
+        tracker = SqlStatsTracker()
+        queries.poll(tracker)
+        [top] = queries.poll(tracker)
+        self.assertEqual((top["elapsed_s"], top["executions"]), (2.0, 4))
+
+    def test_unchanged_cursor_is_not_reported(self):
+        queries = FakeQueries([[cursor_row("a", 1000000, 0)], [cursor_row("a", 1000000, 0)]])
+        tracker = SqlStatsTracker()
+        queries.poll(tracker)
+        self.assertEqual(queries.poll(tracker), [])
+
+    def test_failed_fetch_applies_nothing(self):
+        queries = FakeQueries([
+            [cursor_row("a", 1000000, 0)],
+            FailingRows([cursor_row("a", 3000000, 30)]),
+            [cursor_row("a", 3000000, 30)],
+        ])
+        tracker = SqlStatsTracker()
+        queries.poll(tracker)
+        with self.assertRaises(RuntimeError):
+            queries.poll(tracker)
+        # Same high-water mark and baseline, so the retry reports the full delta
+        [top] = queries.poll(tracker)
+        self.assertEqual(queries.params[2], queries.params[1])
+        self.assertEqual(top["elapsed_s"], 2.0)
+
+    def test_eviction_by_age_and_size(self):
+        queries = FakeQueries([
+            [cursor_row("old", 1, 0), cursor_row("b", 1, 10), cursor_row("c", 1, 20)],
+            [cursor_row("new", 1, SQLSTATS_RETENTION.total_seconds() + 5)],
+        ])
+        tracker = SqlStatsTracker(max_tracked=2)
+        queries.poll(tracker)
+        self.assertEqual([key[0] for key in tracker._previous], ["b", "c"])
+        queries.poll(tracker)
+        # b is past the retention; c is still within it
+        self.assertEqual([key[0] for key in tracker._previous], ["c", "new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import gzip
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Transport Configuration ---
+# "json" is understood by every ingest endpoint; "msgpack" needs the 'msgpack' package
+# on the agent and an ingest server that accepts application/msgpack.
+PAYLOAD_FORMAT = "json"
+# "gzip", "zstd" (needs the 'zstandard' package) or None to send uncompressed
+PAYLOAD_COMPRESSION = "gzip"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+HTTP_TIMEOUT_SECONDS = 15
+
+
+def encode_json(data):
+    """Compact JSON bytes: no indentation and no spaces after ',' and ':'."""
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _encode(data, payload_format):
+    """Serialises the payload; returns (body_bytes, content_type)."""
+    if payload_format == "msgpack":
+        try:
+            import msgpack
+            return msgpack.packb(data, use_bin_type=True), "application/msgpack"
+        except ImportError:
+            print("Warning: The 'msgpack' package is not installed. Falling back to JSON.")
+    return encode_json(data), "application/json"
+
+
+def _compress(body, compression):
+    """Compresses the body; returns (body_bytes, content_encoding or None)."""
+    if compression == "zstd":
+        try:
+            import zstandard
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+        except ImportError:
+            print("Warning: The 'zstandard' package is not installed. Falling back to gzip.")
+            compression = "gzip"
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+class Transport:
+    """
+    Sends reports over one persistent HTTP session (keep-alive), encoding and
+    compressing each payload and remembering how many bytes went over the wire.
+    Several threads may send at once (one per target in multi-target mode).
+    """
+
+    def __init__(self, url, payload_format=PAYLOAD_FORMAT, compression=PAYLOAD_COMPRESSION, pool_size=2):
+        self.url = url
+        self.payload_format = payload_format
+        self.compression = compression
+        self.session = requests.Session()
+        # A single host is contacted, so one connection pool sized for the concurrent senders is enough
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Sizes are tracked per sending thread so concurrent reports do not mix up their numbers
+        self._sizes = threading.local()
+
+    @property
+    def last_raw_bytes(self):
+        """Size of the calling thread's last report before compression, in bytes."""
+        return getattr(self._sizes, "raw", 0)
+
+    @property
+    def last_wire_bytes(self):
+        """Size of the calling thread's last report after compression, in bytes."""
+        return getattr(self._sizes, "wire", 0)
+
+    def encode(self, data):
+        """Returns (body, headers) for a payload, and records its sizes."""
+        body, content_type = _encode(data, self.payload_format)
+        return self._compress_body(body, content_type)
+
+    def _compress_body(self, body, content_type):
+        self._sizes.raw = len(body)
+        body, content_encoding = _compress(body, self.compression)
+        self._sizes.wire = len(body)
+
+        headers = {"Content-Type": content_type}
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+        return body, headers
+
+    def post(self, body, headers):
+        """POSTs an already-encoded body. Raises requests.exceptions.RequestException on failure."""
+        response = self.session.post(self.url, data=body, headers=headers, timeout=HTTP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response
+
+    def send(self, data):
+        body, headers = self.encode(data)
+        return self.post(body, headers)
+
+    def send_json_bytes(self, body):
+        """Sends an already-serialised JSON document (e.g. a batch replayed from the spool)."""
+        body, headers = self._compress_body(body, "application/json")
+        return self.post(body, headers)
+
+    def close(self):
+        self.session.close()
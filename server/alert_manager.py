@@ -1,2 +1,352 @@
+"""
+Alert engine for the Python ingest server. Mirrors the checks of the Next.js
+AlertManager (src/lib/server/alert-manager.ts): database/OS status, CPU, memory,
+disk and tablespace thresholds, ORA- errors and failed backups, with the same
+debounce rules.
 
-    
\ No newline at end of file
+Settings are compiled once (and again only when settings.json changes) into
+exclusion sets, an ORA-prefix matcher and a recipient map. Reports are not
+evaluated one by one: the newest snapshot of every database is collected and
+the whole fleet is evaluated in column-wise passes every EVALUATION_INTERVAL_SECONDS:
+each threshold column is compared at once (with numpy when installed), and only the
+rows that are alerting, or have alerted before, go on to the per-key debounce logic.
+Debounce state lives in a small SQLite table and survives restarts.
+"""
+import json
+import os
+import re
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+
+try:
+    import numpy as np
+except ImportError: # Optional: the same passes run on plain lists
+    np = None
+
+# --- Alert Engine Configuration ---
+SETTINGS_FILE = "settings.json"
+ALERT_STATE_FILE = "alert_state.sqlite"
+# Pending snapshots are evaluated together at this interval
+EVALUATION_INTERVAL_SECONDS = 5
+
+# --- Debounce Configuration in Seconds ---
+STATUS_DEBOUNCE_SECONDS = 3 * 60 * 60 # 3 hours
+DAILY_DEBOUNCE_SECONDS = 24 * 60 * 60 # 24 hours
+
+DEFAULT_THRESHOLD = 90
+
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT") or 587)
+SMTP_USER = os.environ.get("SMTP_USER")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_SENDER = os.environ.get("SMTP_SENDER") or "noreply@proactivedb.com"
+
+
+class CompiledSettings:
+    """settings.json, preprocessed for repeated evaluation."""
+
+    def __init__(self, settings):
+        thresholds = settings.get("thresholds") or {"cpu": DEFAULT_THRESHOLD, "memory": DEFAULT_THRESHOLD}
+        self.cpu_threshold = thresholds.get("cpu")
+        self.memory_threshold = thresholds.get("memory")
+        self.disk_threshold = settings.get("diskThreshold") or DEFAULT_THRESHOLD
+        self.tablespace_threshold = settings.get("tablespaceThreshold") or DEFAULT_THRESHOLD
+
+        exclusions = settings.get("alertExclusions") or {}
+        self.excluded_disks = frozenset(exclusions.get("excludedDisks") or [])
+        # One anchored alternation instead of a startswith() loop per prefix and log entry
+        prefixes = sorted({p for p in exclusions.get("excludedOraErrors") or [] if p}, key=len, reverse=True)
+        self._excluded_ora = re.compile("|".join(re.escape(p) for p in prefixes)) if prefixes else None
+
+        email_settings = settings.get("emailSettings") or {}
+        self.admin_emails = [e for e in email_settings.get("adminEmails") or [] if e]
+        # server_id -> emails of the first customer that owns the database
+        self._customer_emails = {}
+        for customer in email_settings.get("customers") or []:
+            for database in customer.get("databases") or []:
+                self._customer_emails.setdefault(database.get("id"), customer.get("emails") or [])
+        self._recipients = {}
+
+    def is_excluded_error(self, message):
+        return self._excluded_ora is not None and self._excluded_ora.match(message or "") is not None
+
+    def recipients_for(self, server_id):
+        recipients = self._recipients.get(server_id)
+        if recipients is None:
+            merged = dict.fromkeys(self.admin_emails)
+            merged.update(dict.fromkeys(e for e in self._customer_emails.get(server_id, []) if e))
+            recipients = self._recipients[server_id] = list(merged)
+        return recipients
+
+
+class SettingsCache:
+    """Recompiles settings.json only when its modification time changes."""
+
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self._mtime = None
+        self._compiled = CompiledSettings({})
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return self._compiled
+        if mtime != self._mtime:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._compiled = CompiledSettings(json.load(f))
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                print(f"--- ALERTS: Could not load {self.path}, keeping previous settings: {e} ---")
+        return self._compiled
+
+
+class DebounceStore:
+    """
+    Last alert time and status per "server|type|item" key, kept in memory and
+    persisted to SQLite. Only keys that changed are written, in one transaction per pass.
+    """
+
+    def __init__(self, path=ALERT_STATE_FILE):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS alert_debounce (
+                key TEXT PRIMARY KEY,
+                timestamp REAL,
+                is_alert INTEGER
+            )
+        """)
+        # key -> [timestamp, is_alert]
+        self._state = {key: [ts, bool(is_alert)] for key, ts, is_alert
+                       in self._conn.execute("SELECT key, timestamp, is_alert FROM alert_debounce")}
+        self._dirty = set()
+        # alert type -> server ids with state for it, so passes can skip every other healthy row
+        self._tracked = {}
+        for key in self._state:
+            self._track(key)
+
+    def __contains__(self, key):
+        return key in self._state
+
+    def _track(self, key):
+        server_id, alert_type, _ = key.split("|", 2)
+        self._tracked.setdefault(alert_type, set()).add(server_id)
+
+    def tracked(self, alert_type):
+        """Server ids that have debounce state for `alert_type`."""
+        return self._tracked.get(alert_type, set())
+
+    def can_send(self, key, is_alert, debounce_seconds, now):
+        """Same decision table as _can_send_alert in alert-manager.ts."""
+        last = self._state.get(key)
+        if last is None:
+            if is_alert:
+                self._set(key, now, True)
+                return True
+            return False
+
+        last_time, last_alert = last
+        if is_alert and not last_alert:
+            print(f"Alert condition for {key} has re-appeared. Sending alert.")
+            self._set(key, now, True)
+            return True
+        if is_alert:
+            if now - last_time < debounce_seconds:
+                return False
+            print(f"Debounce period for {key} has passed. Sending follow-up alert.")
+            self._set(key, now, True)
+            return True
+        if last_alert:
+            print(f"Alert condition for {key} has cleared.")
+            self._set(key, last_time, False)
+        return False
+
+    def _set(self, key, timestamp, is_alert):
+        if key not in self._state:
+            self._track(key)
+        self._state[key] = [timestamp, is_alert]
+        self._dirty.add(key)
+
+    def flush(self):
+        if not self._dirty:
+            return
+        rows = [(key, self._state[key][0], int(self._state[key][1])) for key in self._dirty]
+        try:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO alert_debounce (key, timestamp, is_alert) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            self._dirty.clear()
+        except sqlite3.Error as e:
+            print(f"--- ALERTS: Could not persist debounce state: {e} ---")
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def _rows_to_check(values, threshold, row_servers, tracked):
+    """
+    [(row, is_alert)] for the rows of a threshold column that need the debounce table:
+    those above `threshold`, and those whose server (index in `row_servers`) is in
+    `tracked`. Any other row is fine and has never alerted, so it is skipped without
+    building its key. `values` holds no None.
+    """
+    if np is not None and len(values) > 64:
+        above = np.asarray(values, dtype=float) > threshold
+        candidates = above | np.isin(np.asarray(row_servers), list(tracked)) if tracked else above
+        return [(row, bool(above[row])) for row in np.flatnonzero(candidates).tolist()]
+    return [(row, value > threshold) for row, value in enumerate(values)
+            if value > threshold or row_servers[row] in tracked]
+
+
+def send_email(subject, body, recipients):
+    if not SMTP_HOST or not recipients:
+        print("SMTP not configured or no recipients, skipping email.")
+        print(f"Subject: {subject}\nBody: {body}")
+        return
+    message = EmailMessage()
+    message["From"] = SMTP_SENDER
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body)
+    try:
+        smtp_class = smtplib.SMTP_SSL if SMTP_PORT == 465 else smtplib.SMTP
+        with smtp_class(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+            if SMTP_PORT != 465:
+                smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD or "")
+            smtp.send_message(message)
+        print(f"Successfully sent alert email to: {', '.join(recipients)}")
+    except (OSError, smtplib.SMTPException) as e:
+        print(f"Failed to send email: {e}")
+
+
+class AlertEngine(threading.Thread):
+    """
+    Collects the newest snapshot per database (submit() is cheap and called from
+    request threads) and evaluates all pending snapshots together in the background.
+    """
+
+    def __init__(self, settings_path=SETTINGS_FILE, state_path=ALERT_STATE_FILE,
+                 interval=EVALUATION_INTERVAL_SECONDS, notify=send_email):
+        super().__init__(name="alert-engine", daemon=True)
+        self.settings = SettingsCache(settings_path)
+        self.debounce = DebounceStore(state_path)
+        self.interval = interval
+        self.notify = notify
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stop_event = threading.Event()
+
+    def submit(self, server_id, data):
+        # A newer snapshot of the same database replaces the pending one
+        with self._lock:
+            self._pending[server_id] = data
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.evaluate_pending()
+        self.evaluate_pending()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.debounce.close()
+
+    def evaluate_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                self.evaluate(pending)
+            except Exception as e:
+                print(f"--- ALERTS: Evaluation of {len(pending)} snapshot(s) failed: {e} ---")
+
+    def evaluate(self, snapshots, now=None):
+        """Evaluates {server_id: data} in one pass per check and sends the resulting alerts."""
+        now = time.time() if now is None else now
+        settings = self.settings.get()
+        server_ids = list(snapshots)
+        datas = [snapshots[server_id] for server_id in server_ids]
+        names = [data.get("dbName") or "N/A" for data in datas]
+        alerts = [] # (server_index, subject, body)
+
+        def check(index, alert_type, item, is_alert, debounce_seconds):
+            key = f"{server_ids[index]}|{alert_type}|{item}"
+            # Conditions that are fine and have never alerted need no state at all
+            if not is_alert and key not in self.debounce:
+                return False
+            return self.debounce.can_send(key, is_alert, debounce_seconds, now)
+
+        # --- Status ---
+        for i, data in enumerate(datas):
+            if check(i, "status", "db_down", not data.get("dbIsUp"), STATUS_DEBOUNCE_SECONDS):
+                alerts.append((i, f"ALERT: Database Down for {names[i]} ({server_ids[i]})",
+                               f"The database {names[i]} ({server_ids[i]}) is currently unreachable."))
+            if check(i, "status", "os_down", not data.get("osIsUp"), STATUS_DEBOUNCE_SECONDS):
+                alerts.append((i, f"ALERT: OS Unreachable for {names[i]} ({server_ids[i]})",
+                               f"The operating system for server hosting {names[i]} ({server_ids[i]}) is not reporting data."))
+
+        # Indexes of the servers with threshold debounce state; their healthy rows still
+        # have to be seen, so a cleared condition is recorded
+        tracked_ids = self.debounce.tracked("threshold")
+        tracked = {i for i, server_id in enumerate(server_ids) if server_id in tracked_ids}
+
+        # --- CPU and memory: one column each for the whole fleet ---
+        kpis = [data.get("kpis") or {} for data in datas]
+        servers = range(len(datas))
+        for item, field, threshold, label in (("cpu", "cpuUsage", settings.cpu_threshold, "CPU"),
+                                              ("memory", "memoryUsage", settings.memory_threshold, "Memory")):
+            if not threshold:
+                continue
+            values = [k.get(field) or 0 for k in kpis]
+            for i, is_alert in _rows_to_check(values, threshold, servers, tracked):
+                if check(i, "threshold", item, is_alert, DAILY_DEBOUNCE_SECONDS):
+                    alerts.append((i, f"ALERT: High {label} Usage on {names[i]} ({server_ids[i]})",
+                                   f"{label} usage is currently at {values[i]:.2f}%, exceeding the threshold of {threshold}%."))
+
+        # --- Disks and tablespaces: flattened across all databases ---
+        disk_rows = [(i, disk.get("mount_point"), disk.get("used_percent") or 0)
+                     for i, data in enumerate(datas) for disk in data.get("diskUsage") or []
+                     if disk.get("mount_point") not in settings.excluded_disks]
+        for row, is_alert in _rows_to_check([r[2] for r in disk_rows], settings.disk_threshold, [r[0] for r in disk_rows], tracked):
+            i, mount_point, used = disk_rows[row]
+            if check(i, "threshold", f"disk_{mount_point}", is_alert, DAILY_DEBOUNCE_SECONDS):
+                alerts.append((i, f"ALERT: High Disk Usage on {names[i]} ({server_ids[i]})",
+                               f"Disk usage for mount point '{mount_point}' is at {used:.2f}%, exceeding the threshold of {settings.disk_threshold}%."))
+
+        ts_rows = [(i, ts.get("name"), ts.get("used_percent") or 0)
+                   for i, data in enumerate(datas) for ts in data.get("tablespaces") or []]
+        for row, is_alert in _rows_to_check([r[2] for r in ts_rows], settings.tablespace_threshold, [r[0] for r in ts_rows], tracked):
+            i, name, used = ts_rows[row]
+            if check(i, "threshold", f"ts_{name}", is_alert, DAILY_DEBOUNCE_SECONDS):
+                alerts.append((i, f"ALERT: High Tablespace Usage in {names[i]} ({server_ids[i]})",
+                               f"Tablespace '{name}' usage is at {used:.2f}%, exceeding the threshold of {settings.tablespace_threshold}%."))
+
+        # --- ORA- errors ---
+        for i, data in enumerate(datas):
+            errors = [entry for entry in data.get("alertLog") or [] if not settings.is_excluded_error(entry.get("error_code"))]
+            if check(i, "ora_error", "consolidated", bool(errors), DAILY_DEBOUNCE_SECONDS):
+                body = f"New ORA- errors were found in the alert log for {names[i]} ({server_ids[i]}).\n\nRecent errors:\n"
+                body += "".join(f"- {entry.get('timestamp')}: {entry.get('error_code')}\n" for entry in errors[:10])
+                if len(errors) > 10:
+                    body += f"\n...and {len(errors) - 10} more."
+                alerts.append((i, f"ALERT: New ORA- Error(s) Detected in {names[i]} ({server_ids[i]})", body))
+
+        # --- Failed backups ---
+        for i, data in enumerate(datas):
+            for backup in data.get("backups") or []:
+                if backup.get("status") == "FAILED" and check(i, "backup_failed", backup.get("id"), True, DAILY_DEBOUNCE_SECONDS):
+                    alerts.append((i, f"ALERT: RMAN Backup Failed for {names[i]} ({server_ids[i]})",
+                                   f"An RMAN backup job for {names[i]} started at {backup.get('start_time')} has FAILED."))
+
+        self.debounce.flush()
+        for i, subject, body in alerts:
+            self.notify(subject, body, settings.recipients_for(server_ids[i]))
+        return alerts
@@ -0,0 +1,223 @@
+"""
+Downsampled performance history. Raw performance_summary rows (one per agent
+report, ~30s apart, kept RETENTION_HOURS) are rolled up into 1-minute, 5-minute
+and 1-hour buckets holding min, max, avg and p95 of every metric, and each tier
+is kept for its own retention period (up to 30 days).
+
+Rollups are maintained incrementally: the batch writer marks the buckets touched
+by each committed batch, and every ROLLUP_INTERVAL_SECONDS only those buckets are
+recomputed from the raw rows. History reads use the finest tier that covers the
+requested window in at most HISTORY_MAX_POINTS points, so a 30-day chart reads
+~720 hourly rows instead of ~86,000 raw ones.
+"""
+import math
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# --- Rollup Configuration ---
+# (name, bucket size in seconds, retention in hours), finest first
+ROLLUP_TIERS = (
+    ("1m", 60, 3 * 24),
+    ("5m", 300, 10 * 24),
+    ("1h", 3600, 30 * 24),
+)
+# Touched buckets are recomputed at most this often
+ROLLUP_INTERVAL_SECONDS = 60
+# Reads pick the finest tier that returns no more points than this
+HISTORY_MAX_POINTS = 1500
+# Spacing of raw rows (the agent's reporting interval)
+RAW_STEP_SECONDS = 30
+
+# performance_summary columns that are rolled up
+METRICS = ("cpu_usage", "memory_usage", "io_read_total", "io_write_total", "network_up", "network_down", "active_sessions")
+AGGREGATES = ("min", "max", "avg", "p95")
+# Series names used by the dashboard's history payload
+SERIES = {
+    "cpu_usage": "cpu", "memory_usage": "memory", "io_read_total": "io_read", "io_write_total": "io_write",
+    "network_up": "network_up", "network_down": "network_down", "active_sessions": "activeSessionsHistory",
+}
+
+ROLLUP_COLUMNS = [f"{metric}_{agg}" for metric in METRICS for agg in AGGREGATES]
+
+
+def rollup_table(tier_name):
+    return f"performance_rollup_{tier_name}"
+
+
+def init_rollup_db(conn):
+    columns = ",\n".join(f"    {column} REAL" for column in ROLLUP_COLUMNS)
+    for name, _, _ in ROLLUP_TIERS:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(name)} (
+                server_id TEXT,
+                bucket TEXT,
+                samples INTEGER,
+            {columns},
+                PRIMARY KEY (server_id, bucket)
+            )
+        """)
+
+
+def parse_timestamp(value):
+    """Epoch seconds of an ISO-8601 report timestamp (naive values are UTC), or None."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_timestamp(epoch):
+    # Same shape as the agent's datetime.now(timezone.utc).isoformat(), so string comparisons hold
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def aggregate(rows):
+    """Summarises raw rows (tuples of METRICS values) into one rollup row's metric columns."""
+    values = []
+    for index in range(len(METRICS)):
+        column = sorted(row[index] for row in rows if row[index] is not None)
+        if column:
+            values.extend((column[0], column[-1], sum(column) / len(column), percentile(column, 0.95)))
+        else:
+            values.extend((None, None, None, None))
+    return values
+
+
+class RollupMaintainer:
+    """
+    Recomputes the rollup buckets touched since the last pass. Used only from the
+    batch writer thread, which owns the connection.
+    """
+
+    def __init__(self, conn, raw_retention_hours):
+        self.conn = conn
+        self.raw_retention_hours = raw_retention_hours
+        # server_id -> starts of the minutes that received raw rows; coarser buckets are derived from them
+        self._dirty_minutes = {}
+        self.buckets_written = 0
+        init_rollup_db(conn)
+        if conn.execute(f"SELECT 1 FROM {rollup_table(ROLLUP_TIERS[0][0])} LIMIT 1").fetchone() is None:
+            # First run on an existing history database: roll up the raw rows already there
+            self.mark(conn.execute("SELECT server_id, timestamp FROM performance_summary").fetchall())
+
+    def mark(self, rows):
+        """Records the buckets touched by committed (server_id, timestamp, ...) summary rows."""
+        for row in rows:
+            epoch = parse_timestamp(row[1])
+            if epoch is not None:
+                self._dirty_minutes.setdefault(row[0], set()).add(int(epoch // 60) * 60)
+
+    def pending(self):
+        return sum(len(minutes) for minutes in self._dirty_minutes.values())
+
+    def run(self):
+        """Recomputes every touched bucket of every tier; returns the number of buckets written."""
+        dirty, self._dirty_minutes = self._dirty_minutes, {}
+        if not dirty:
+            return 0
+        # Buckets reaching back past the raw retention can no longer be recomputed completely
+        oldest = (datetime.now(timezone.utc) - timedelta(hours=self.raw_retention_hours)).timestamp()
+        coarsest = ROLLUP_TIERS[-1][1]
+        writes = {name: [] for name, _, _ in ROLLUP_TIERS}
+        select = f"SELECT timestamp, {', '.join(METRICS)} FROM performance_summary WHERE server_id = ? AND timestamp >= ? AND timestamp < ?"
+
+        for server_id, minutes in dirty.items():
+            start = min(minutes) // coarsest * coarsest
+            end = (max(minutes) // coarsest + 1) * coarsest
+            # One indexed range read per server covers the touched buckets of all tiers
+            raw = [(parse_timestamp(row[0]), row[1:]) for row in
+                   self.conn.execute(select, (server_id, format_timestamp(start), format_timestamp(end)))]
+            for name, size, _ in ROLLUP_TIERS:
+                touched = {minute // size * size for minute in minutes}
+                buckets = {}
+                for epoch, values in raw:
+                    if epoch is not None:
+                        bucket = int(epoch // size) * size
+                        if bucket in touched:
+                            buckets.setdefault(bucket, []).append(values)
+                for bucket, rows in buckets.items():
+                    if bucket >= oldest:
+                        writes[name].append((server_id, format_timestamp(bucket), len(rows), *aggregate(rows)))
+
+        placeholders = ", ".join("?" for _ in range(len(ROLLUP_COLUMNS) + 3))
+        written = 0
+        try:
+            self.conn.execute("BEGIN")
+            for name, rows in writes.items():
+                self.conn.executemany(f"INSERT OR REPLACE INTO {rollup_table(name)} (server_id, bucket, samples, "
+                                      f"{', '.join(ROLLUP_COLUMNS)}) VALUES ({placeholders})", rows)
+                written += len(rows)
+            self.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            try:
+                self.conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            print(f"--- SERVER: Rollup of {len(dirty)} server(s) failed, will retry: {e} ---")
+            for server_id, minutes in dirty.items():
+                self._dirty_minutes.setdefault(server_id, set()).update(minutes)
+            return 0
+        self.buckets_written += written
+        return written
+
+    def prune(self):
+        """Deletes rollup buckets past their tier's retention; returns the number deleted."""
+        deleted = 0
+        now = datetime.now(timezone.utc)
+        for name, _, retention_hours in ROLLUP_TIERS:
+            cutoff = (now - timedelta(hours=retention_hours)).isoformat()
+            deleted += self.conn.execute(f"DELETE FROM {rollup_table(name)} WHERE bucket < ?", (cutoff,)).rowcount
+        return deleted
+
+
+def choose_tier(start, end, raw_retention_hours, max_points=HISTORY_MAX_POINTS):
+    """
+    Returns (tier name or None for raw rows, step seconds) for a [start, end)
+    window in epoch seconds: the finest resolution still holding data for
+    `start` that needs no more than max_points points.
+    """
+    now = datetime.now(timezone.utc).timestamp()
+    span = max(end - start, 1)
+    tiers = [(None, RAW_STEP_SECONDS, raw_retention_hours)] + list(ROLLUP_TIERS)
+    for name, size, retention_hours in tiers:
+        # One step of slack, so "the last N hours" still matches a tier kept for exactly N hours
+        if start >= now - retention_hours * 3600 - size and span / size <= max_points:
+            return name, size
+    return ROLLUP_TIERS[-1][0], ROLLUP_TIERS[-1][1]
+
+
+def read_history(conn, server_id, start, end, raw_retention_hours, max_points=HISTORY_MAX_POINTS):
+    """
+    Performance history of one server between two epoch timestamps, in the
+    dashboard's series layout ({"cpu": [{"date", "value"}, ...], ...}). Points
+    from a rollup tier carry the bucket average as "value" plus "min", "max" and "p95".
+    """
+    tier, step = choose_tier(start, end, raw_retention_hours, max_points)
+    history = {series: [] for series in SERIES.values()}
+    history["resolution"] = tier or "raw"
+    history["step_seconds"] = step
+    bounds = (server_id, format_timestamp(start), format_timestamp(end))
+
+    if tier is None:
+        rows = conn.execute(f"SELECT timestamp, {', '.join(METRICS)} FROM performance_summary "
+                            "WHERE server_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC", bounds)
+        for row in rows:
+            for metric, value in zip(METRICS, row[1:]):
+                history[SERIES[metric]].append({"date": row[0], "value": value})
+        return history
+
+    rows = conn.execute(f"SELECT bucket, {', '.join(ROLLUP_COLUMNS)} FROM {rollup_table(tier)} "
+                        "WHERE server_id = ? AND bucket >= ? AND bucket < ? ORDER BY bucket ASC", bounds)
+    for row in rows:
+        for index, metric in enumerate(METRICS):
+            low, high, avg, p95 = row[1 + index * 4:5 + index * 4]
+            history[SERIES[metric]].append({"date": row[0], "value": avg, "min": low, "max": high, "p95": p95})
+    return history
@@ -1,2 +1,575 @@
+"""
+Standalone ingest server for agent reports (POST /api/report), writing the same
+SQLite history schema as the Next.js API (src/lib/server/db.ts).
 
-    
\ No newline at end of file
+Reports from all agents are parsed on the request threads and their rows are
+handed to a single writer thread, which commits them in periodic executemany()
+transactions (group commit). Each request is acknowledged once its rows are
+committed, so a 201 still means the report is on disk.
+
+The same thread keeps the downsampled rollups (rollups.py) up to date, and
+GET /api/history/<server_id> serves charts from the tier that fits the window.
+
+Run from the repository root:
+    python3 server/server.py --port 8000
+"""
+import argparse
+import gzip
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from alert_manager import ALERT_STATE_FILE, SETTINGS_FILE, AlertEngine
+from rollups import ROLLUP_INTERVAL_SECONDS, RollupMaintainer, parse_timestamp, read_history
+
+# --- Server Configuration ---
+HISTORY_DB_FILE = "performance_history.sqlite"
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+# Highest report schema understood here, advertised to agents in every reply.
+# Version 2 sends topWaitEvents and detailedActiveSessions column-wise (agent/columnar.py).
+MAX_SCHEMA_VERSION = 2
+
+# --- Batch Writer Configuration ---
+# Pending rows are committed at least this often, or as soon as this many rows are waiting
+FLUSH_INTERVAL_SECONDS = 0.25
+FLUSH_MAX_ROWS = 5000
+# How long a request waits for its rows to be committed before answering 503
+COMMIT_WAIT_SECONDS = 10
+# Raw history older than this is pruned every PRUNE_INTERVAL_SECONDS (not on every report);
+# downsampled rollups (rollups.py) keep up to 30 days
+RETENTION_HOURS = 24
+PRUNE_INTERVAL_SECONDS = 300
+
+
+class UnsupportedPayloadError(Exception):
+    pass
+
+
+# --- History Database ---
+
+SUMMARY_INSERT = """
+    INSERT OR REPLACE INTO performance_summary
+    (server_id, timestamp, cpu_usage, memory_usage, io_read_total, io_write_total, network_up, network_down, active_sessions)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+IO_DETAILS_INSERT = """
+    INSERT OR REPLACE INTO performance_io_details
+    (server_id, timestamp, device, mount_point, read_mb_s, write_mb_s)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+WAIT_EVENTS_INSERT = """
+    INSERT OR REPLACE INTO wait_events_history
+    (server_id, timestamp, event_name, session_count, latency_seconds, is_snapshot)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def open_history_db(path=HISTORY_DB_FILE):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    # WAL lets the dashboard read while the writer commits; NORMAL sync is durable across app crashes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    init_history_db(conn)
+    return conn
+
+
+def init_history_db(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS performance_summary (
+            server_id TEXT,
+            timestamp TEXT,
+            cpu_usage REAL,
+            memory_usage REAL,
+            io_read_total REAL,
+            io_write_total REAL,
+            network_up REAL,
+            network_down REAL,
+            active_sessions INTEGER,
+            PRIMARY KEY (server_id, timestamp)
+        );
+        CREATE TABLE IF NOT EXISTS performance_io_details (
+            server_id TEXT,
+            timestamp TEXT,
+            device TEXT,
+            mount_point TEXT,
+            read_mb_s REAL,
+            write_mb_s REAL,
+            PRIMARY KEY (server_id, timestamp, device)
+        );
+        CREATE TABLE IF NOT EXISTS wait_events_history (
+            server_id TEXT,
+            timestamp TEXT,
+            event_name TEXT,
+            session_count INTEGER,
+            latency_seconds REAL,
+            is_snapshot INTEGER DEFAULT 0,
+            PRIMARY KEY (server_id, timestamp, event_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_perf_summary_server_ts ON performance_summary(server_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_perf_io_details_server_ts ON performance_io_details(server_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_wait_events_server_ts ON wait_events_history(server_id, timestamp);
+    """)
+
+
+def report_rows(server_id, timestamp, data):
+    """
+    Turns one report into (summary, io_details, wait_events) row lists,
+    with the same semantics as storePerformanceMetrics in db.ts.
+    """
+    summary, io_details, wait_events = [], [], []
+    perf = data.get("current_performance")
+    if perf:
+        summary.append((server_id, timestamp, perf.get("cpu"), perf.get("memory"), perf.get("io_read"),
+                        perf.get("io_write"), perf.get("network_up"), perf.get("network_down"),
+                        perf.get("active_sessions")))
+        for stats in perf.get("io_details") or []:
+            io_details.append((server_id, timestamp, stats.get("device"), stats.get("mount_point"),
+                               stats.get("read_mb_s"), stats.get("write_mb_s")))
+
+    for event in data.get("topWaitEvents") or []:
+        points = event.get("data")
+        if points:
+            # ASH data comes per minute with its own timestamps
+            for point in points:
+                wait_events.append((server_id, point.get("date"), event.get("event"), point.get("value"),
+                                    point.get("latency"), 0))
+        elif (event.get("value") or 0) > 0:
+            # v$session snapshot: one value at the report's timestamp
+            wait_events.append((server_id, timestamp, event.get("event"), event.get("value"), None, 1))
+    # burstSamples are not stored: the Next.js route does not store them either, and at 2s
+    # resolution they would outgrow the rest of the wait event history
+    return summary, io_details, wait_events
+
+
+class CommitTicket:
+    """Handed to a request whose rows are pending; set once the batch holding them is committed."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.error = None
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    def _done(self, error=None):
+        self.error = error
+        self._event.set()
+
+
+class BatchWriter(threading.Thread):
+    """
+    Single writer thread that owns the SQLite connection. Rows from all request
+    threads are accumulated and committed together with one executemany() per
+    table per transaction.
+    """
+
+    def __init__(self, conn, flush_interval=FLUSH_INTERVAL_SECONDS, max_rows=FLUSH_MAX_ROWS):
+        super().__init__(name="batch-writer", daemon=True)
+        self.conn = conn
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._lock = threading.Condition()
+        self._summary, self._io_details, self._wait_events = [], [], []
+        self._ticket = CommitTicket()
+        self._stopping = False
+        self._last_prune = 0.0
+        self.rollups = RollupMaintainer(conn, RETENTION_HOURS)
+        self._last_rollup = time.monotonic()
+        self.reports_written = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self._pending_reports = 0
+
+    def _pending_rows(self):
+        return len(self._summary) + len(self._io_details) + len(self._wait_events)
+
+    def add(self, server_id, timestamp, data):
+        """Queues a report's rows and returns the ticket of the batch that will commit them."""
+        summary, io_details, wait_events = report_rows(server_id, timestamp, data)
+        with self._lock:
+            self._summary.extend(summary)
+            self._io_details.extend(io_details)
+            self._wait_events.extend(wait_events)
+            self._pending_reports += 1
+            if self._pending_rows() >= self.max_rows:
+                self._lock.notify()
+            return self._ticket
+
+    def run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and self._pending_rows() < self.max_rows:
+                    self._lock.wait(self.flush_interval)
+                batch = (self._summary, self._io_details, self._wait_events)
+                ticket, reports = self._ticket, self._pending_reports
+                self._summary, self._io_details, self._wait_events = [], [], []
+                self._ticket, self._pending_reports = CommitTicket(), 0
+                stopping = self._stopping
+
+            if reports:
+                self._commit(batch, ticket, reports)
+            else:
+                ticket._done()
+            # Roll up before pruning so raw rows are summarised before they are deleted
+            self._maybe_rollup(force=stopping)
+            self._maybe_prune()
+            if stopping:
+                return
+
+    def _commit(self, batch, ticket, reports):
+        summary, io_details, wait_events = batch
+        try:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(SUMMARY_INSERT, summary)
+            self.conn.executemany(IO_DETAILS_INSERT, io_details)
+            self.conn.executemany(WAIT_EVENTS_INSERT, wait_events)
+            self.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            try:
+                self.conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            print(f"--- SERVER: Failed to write a batch of {reports} report(s): {e} ---")
+            ticket._done(e)
+            return
+        self.reports_written += reports
+        self.rows_written += len(summary) + len(io_details) + len(wait_events)
+        self.batches_written += 1
+        self.rollups.mark(summary)
+        ticket._done()
+
+    def _maybe_rollup(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_rollup < ROLLUP_INTERVAL_SECONDS:
+            return
+        self._last_rollup = now
+        try:
+            self.rollups.run()
+        except sqlite3.Error as e:
+            print(f"--- SERVER: Updating rollups failed: {e} ---")
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=RETENTION_HOURS)).isoformat()
+        deleted = 0
+        try:
+            for table in ("performance_summary", "performance_io_details", "wait_events_history"):
+                deleted += self.conn.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff,)).rowcount
+            deleted += self.rollups.prune()
+        except sqlite3.Error as e:
+            print(f"--- SERVER: Pruning old performance data failed: {e} ---")
+            return
+        if deleted:
+            print(f"--- SERVER: Pruned {deleted} expired history records. ---")
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+        self.join()
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending_rows()
+        return {"reports_written": self.reports_written, "rows_written": self.rows_written,
+                "batches_written": self.batches_written, "pending_rows": pending,
+                "rollup_buckets_written": self.rollups.buckets_written}
+
+
+# --- Report Processing ---
+
+def read_report_body(headers, body):
+    """Decodes a gzip/deflate/zstd-compressed JSON body, as sent by the agent's transport."""
+    content_type = headers.get("Content-Type") or "application/json"
+    if "json" not in content_type:
+        raise UnsupportedPayloadError(f"Unsupported content type '{content_type}'")
+
+    encoding = (headers.get("Content-Encoding") or "identity").lower()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "deflate":
+        body = zlib.decompress(body)
+    elif encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise UnsupportedPayloadError("zstd bodies need the 'zstandard' package on the server")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif encoding != "identity":
+        raise UnsupportedPayloadError(f"Unsupported content encoding '{encoding}'")
+    return json.loads(body)
+
+
+def decode_wait_events(encoded):
+    """Expands a version 2 topWaitEvents section into the list of event objects."""
+    dates = encoded.get("dates") or []
+    events = []
+    for name, value, sessions, latency in zip(encoded["events"], encoded["value"], encoded["sessions"], encoded["latency"]):
+        event = {"event": name, "value": value}
+        if sessions is not None:
+            event["data"] = [{"date": date, "value": count, "latency": seconds}
+                             for date, count, seconds in zip(dates, sessions, latency) if count is not None]
+        events.append(event)
+    return events
+
+
+def decode_table(encoded):
+    """Expands a version 2 column-wise table into the list of row objects."""
+    columns = []
+    for column, values in zip(encoded["columns"], encoded["values"]):
+        dictionary = (encoded.get("dictionaries") or {}).get(column)
+        if dictionary is not None:
+            values = [None if code is None else dictionary[code] for code in values]
+        columns.append(values)
+    return [dict(zip(encoded["columns"], row)) for row in zip(*columns)]
+
+
+def decode_report(raw_data):
+    """Returns the report in the version 1 layout that storage and alerting work on."""
+    version = raw_data.get("schemaVersion") or 1
+    if version == 1:
+        return raw_data
+    if version > MAX_SCHEMA_VERSION:
+        raise UnsupportedPayloadError(f"Unsupported report schema version {version}")
+    data = dict(raw_data)
+    del data["schemaVersion"]
+    try:
+        if isinstance(data.get("topWaitEvents"), dict):
+            data["topWaitEvents"] = decode_wait_events(data["topWaitEvents"])
+        if isinstance(data.get("detailedActiveSessions"), dict):
+            data["detailedActiveSessions"] = decode_table(data["detailedActiveSessions"])
+    except (KeyError, IndexError, TypeError) as e:
+        raise UnsupportedPayloadError(f"Malformed version {version} report: {e!r}")
+    return data
+
+
+class ReportStore:
+    """Latest full snapshot per agent, used to complete delta reports."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.snapshots = {}
+
+    def merge_delta(self, raw_data):
+        """Fills the sections a delta report left out; returns (merged, resync)."""
+        if raw_data.get("payloadType") != "delta":
+            return raw_data, False
+        with self._lock:
+            previous = self.snapshots.get(raw_data.get("id"))
+        merged = dict(raw_data)
+        for section in raw_data.get("unchangedSections") or []:
+            merged[section] = previous["data"].get(section) if previous else (None if section == "osInfo" else [])
+        merged.pop("unchangedSections", None)
+        return merged, previous is None
+
+    def update_if_latest(self, server_id, timestamp, data):
+        """Stores the snapshot unless a newer one is held (spool replays can be older)."""
+        with self._lock:
+            current = self.snapshots.get(server_id)
+            if current and current["data"].get("timestamp") and current["data"]["timestamp"] > timestamp:
+                return False
+            self.snapshots[server_id] = {"data": data, "last_updated": datetime.now(timezone.utc).isoformat()}
+            return True
+
+
+def coerce_report(raw_data):
+    data = dict(raw_data)
+    data["backups"] = [
+        {**b,
+         "input_bytes": float(b["input_bytes"]) if b.get("input_bytes") else 0,
+         "output_bytes": float(b["output_bytes"]) if b.get("output_bytes") else 0,
+         "elapsed_seconds": float(b["elapsed_seconds"]) if b.get("elapsed_seconds") else 0}
+        for b in raw_data.get("backups") or []
+    ]
+    return data
+
+
+class IngestServer:
+    """Ties the HTTP front end, the snapshot store and the batch writer together."""
+
+    def __init__(self, db_path=HISTORY_DB_FILE, alert_engine=None):
+        self.db_path = db_path
+        self.writer = BatchWriter(open_history_db(db_path))
+        # History reads use one connection per request thread; WAL keeps them off the writer's lock
+        self._readers = threading.local()
+        self.store = ReportStore()
+        # Called with (server_id, data) for the newest report of each agent, e.g. alert processing
+        self.report_listeners = []
+        self.alert_engine = alert_engine
+        if alert_engine is not None:
+            self.report_listeners.append(alert_engine.submit)
+
+    def process_report(self, report, is_replay):
+        """
+        Queues one report; returns (server_id, resync, ticket) or None if it is invalid.
+        Raises UnsupportedPayloadError for a schema version it cannot decode.
+        """
+        if not isinstance(report, dict):
+            return None
+        merged, resync = self.store.merge_delta(decode_report(report))
+        data = coerce_report(merged)
+        server_id, timestamp = data.get("id"), data.get("timestamp")
+        if not server_id or not timestamp:
+            return None
+
+        ticket = self.writer.add(server_id, timestamp, data)
+        if self.store.update_if_latest(server_id, timestamp, data):
+            # Only act on the newest state; stale replayed samples would re-trigger cleared conditions
+            for listener in self.report_listeners:
+                try:
+                    listener(server_id, data)
+                except Exception as e:
+                    print(f"--- SERVER: Report listener failed for {server_id}: {e} ---")
+        return server_id, resync, ticket
+
+    def process_replayed_report(self, report):
+        try:
+            return self.process_report(report, True)
+        except UnsupportedPayloadError as e:
+            # Counted as rejected; the rest of the batch is still stored
+            print(f"--- SERVER: Skipping replayed report: {e} ---")
+            return None
+
+    def handle_post(self, headers, body):
+        """Returns (status, response_dict) for a POST /api/report body."""
+        try:
+            raw_data = read_report_body(headers, body)
+        except UnsupportedPayloadError as e:
+            return 415, {"error": str(e)}
+        except (ValueError, OSError, zlib.error):
+            return 400, {"error": "Request must be JSON"}
+
+        # A JSON array is a batch of spooled reports replayed by the agent after an outage
+        if isinstance(raw_data, list):
+            results = [self.process_replayed_report(report) for report in raw_data]
+            accepted = [result for result in results if result]
+            if not self._committed({result[2] for result in accepted}):
+                return 503, {"error": "Reports could not be stored"}
+            return 201, {"status": "success", "accepted": len(accepted), "rejected": len(raw_data) - len(accepted),
+                         "maxSchemaVersion": MAX_SCHEMA_VERSION}
+
+        try:
+            result = self.process_report(raw_data, False)
+        except UnsupportedPayloadError as e:
+            return 415, {"error": str(e)}
+        if not result:
+            return 400, {"error": "Missing 'id' or 'timestamp' in payload"}
+        server_id, resync, ticket = result
+        if not self._committed({ticket}):
+            return 503, {"error": "Report could not be stored"}
+        return 201, {"status": "success", "id": server_id, "resync": resync, "maxSchemaVersion": MAX_SCHEMA_VERSION}
+
+    def handle_history(self, server_id, query):
+        """
+        Returns (status, response_dict) for GET /api/history/<server_id>. The window
+        is ?hours=N back from now (default 24) or ?start=&end= as ISO timestamps.
+        """
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        now = time.time()
+        try:
+            end = parse_timestamp(params["end"]) if "end" in params else now
+            start = parse_timestamp(params["start"]) if "start" in params else end - float(params.get("hours", 24)) * 3600
+            max_points = int(params["points"]) if "points" in params else None
+        except ValueError:
+            return 400, {"error": "Invalid history window"}
+        if start is None or end is None or start >= end or (max_points is not None and max_points < 1):
+            return 400, {"error": "Invalid history window"}
+
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        options = {"max_points": max_points} if max_points else {}
+        return 200, read_history(conn, server_id, start, end, RETENTION_HOURS, **options)
+
+    def _committed(self, tickets):
+        # A failure makes the agent keep the report in its spool and retry later
+        return all(ticket.wait(COMMIT_WAIT_SECONDS) and ticket.error is None for ticket in tickets)
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive for the agents' persistent sessions
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/api/report":
+                    self._respond(404, {"error": "Not found"})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    status, response = server.handle_post(self.headers, body)
+                except Exception as e:
+                    print(f"Error processing report: {e}")
+                    status, response = 500, {"error": "Internal Server Error"}
+                self._respond(status, response)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/api/health":
+                    self._respond(200, {"status": "ok", "agents": len(server.store.snapshots), **server.writer.stats()})
+                elif url.path.startswith("/api/history/"):
+                    try:
+                        status, response = server.handle_history(unquote(url.path[len("/api/history/"):]), url.query)
+                    except sqlite3.Error as e:
+                        print(f"Error reading history: {e}")
+                        status, response = 500, {"error": "Internal Server Error"}
+                    self._respond(status, response)
+                else:
+                    self._respond(404, {"error": "Not found"})
+
+            def _respond(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # One line per report would dominate the output at fleet scale
+
+        return Handler
+
+    def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        self.writer.start()
+        if self.alert_engine is not None:
+            self.alert_engine.start()
+        httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        httpd.daemon_threads = True
+        print(f"--- SERVER: Listening on http://{host}:{port}/api/report ---")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.writer.stop()
+            if self.alert_engine is not None:
+                self.alert_engine.stop()
+            print(f"--- SERVER: Stopped after writing {self.writer.reports_written} report(s). ---")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest server for agent reports.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--db", default=HISTORY_DB_FILE, help="SQLite history database")
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="dashboard settings with alert thresholds and recipients")
+    parser.add_argument("--alert-state", default=ALERT_STATE_FILE, help="SQLite file for alert debounce state")
+    parser.add_argument("--no-alerts", action="store_true", help="only store reports, e.g. when the dashboard sends alerts")
+    args = parser.parse_args()
+    alert_engine = None if args.no_alerts else AlertEngine(args.settings, args.alert_state)
+    IngestServer(args.db, alert_engine).serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,119 @@
 
 import { NextResponse } from "next/server";
+import zlib from "zlib";
 import { getSettings } from "@/lib/server/settings";
 import { storePerformanceMetrics, db_data_store } from "@/lib/server/db";
 import { AlertManager } from "@/lib/server/alert-manager";
 import { DashboardData } from "@/lib/types";
 
-export async function POST(request: Request) {
-  try {
-    const raw_data = (await request.json());
-    
+class UnsupportedPayloadError extends Error {}
+
+// Highest report schema understood here, advertised to agents in every reply.
+// Version 2 sends topWaitEvents and detailedActiveSessions column-wise (agent/columnar.py).
+const MAX_SCHEMA_VERSION = 2;
+
+// The agent sends compact JSON, usually gzip-compressed (Content-Encoding: gzip).
+async function readReportBody(request: Request): Promise<any> {
+    const contentType = request.headers.get("content-type") || "application/json";
+    if (!contentType.includes("json")) {
+        throw new UnsupportedPayloadError(`Unsupported content type '${contentType}'`);
+    }
+
+    const encoding = (request.headers.get("content-encoding") || "identity").toLowerCase();
+    let body = Buffer.from(await request.arrayBuffer());
+    if (encoding === "gzip") {
+        body = zlib.gunzipSync(body);
+    } else if (encoding === "deflate") {
+        body = zlib.inflateSync(body);
+    } else if (encoding === "zstd" && typeof (zlib as any).zstdDecompressSync === "function") {
+        // Only available on newer Node.js releases
+        body = (zlib as any).zstdDecompressSync(body);
+    } else if (encoding !== "identity") {
+        throw new UnsupportedPayloadError(`Unsupported content encoding '${encoding}'`);
+    }
+    return JSON.parse(body.toString("utf-8"));
+}
+
+// Version 2 topWaitEvents: shared dates, and per event session/latency arrays aligned with them
+// (null where the event has no point, or instead of the arrays for a v$session snapshot).
+function decodeWaitEvents(encoded: any): any[] {
+    const dates: string[] = encoded.dates || [];
+    return encoded.events.map((event: string, i: number) => {
+        const sessions = encoded.sessions[i];
+        if (sessions === null) {
+            return { event, value: encoded.value[i] };
+        }
+        const latency = encoded.latency[i];
+        const data = [];
+        for (let j = 0; j < dates.length; j++) {
+            if (sessions[j] !== null) {
+                data.push({ date: dates[j], value: sessions[j], latency: latency[j] });
+            }
+        }
+        return { event, value: encoded.value[i], data };
+    });
+}
+
+// Version 2 tables: one value array per column; dictionary columns hold indexes into dictionaries[column]
+function decodeTable(encoded: any): any[] {
+    const columns = encoded.columns.map((column: string, i: number) => {
+        const dictionary = encoded.dictionaries?.[column];
+        const values = encoded.values[i];
+        return dictionary ? values.map((code: number | null) => code === null ? null : dictionary[code]) : values;
+    });
+    const rows = [];
+    for (let r = 0; r < encoded.count; r++) {
+        const row: any = {};
+        encoded.columns.forEach((column: string, i: number) => { row[column] = columns[i][r]; });
+        rows.push(row);
+    }
+    return rows;
+}
+
+// Returns the report in the version 1 layout that storage, alerting and the dashboard work on.
+function decodeReport(raw_data: any): any {
+    const version = raw_data.schemaVersion || 1;
+    if (version === 1) {
+        return raw_data;
+    }
+    if (version > MAX_SCHEMA_VERSION) {
+        throw new UnsupportedPayloadError(`Unsupported report schema version ${version}`);
+    }
+    const data: any = { ...raw_data };
+    delete data.schemaVersion;
+    try {
+        if (data.topWaitEvents && !Array.isArray(data.topWaitEvents)) {
+            data.topWaitEvents = decodeWaitEvents(data.topWaitEvents);
+        }
+        if (data.detailedActiveSessions && !Array.isArray(data.detailedActiveSessions)) {
+            data.detailedActiveSessions = decodeTable(data.detailedActiveSessions);
+        }
+    } catch (error) {
+        throw new UnsupportedPayloadError(`Malformed version ${version} report: ${error}`);
+    }
+    return data;
+}
+
+// A "delta" report leaves out sections that did not change since the agent's previous report.
+// Fill them in from the snapshot we hold; if there is none (e.g. after a server restart),
+// default them to empty and ask the agent for a full report.
+function mergeDeltaReport(raw_data: any): { merged: any, resync: boolean } {
+    if (raw_data.payloadType !== "delta") {
+        return { merged: raw_data, resync: false };
+    }
+    const previous = raw_data.id ? db_data_store[raw_data.id] : undefined;
+    const merged: any = { ...raw_data };
+    for (const section of (raw_data.unchangedSections || [])) {
+        merged[section] = previous ? (previous.data as any)[section] : (section === "osInfo" ? null : []);
+    }
+    delete merged.unchangedSections;
+    return { merged, resync: !previous };
+}
+
+// Coerces and stores one report. Returns the server id, or null if the report is invalid.
+async function processReport(report: any, isReplay: boolean): Promise<{ server_id: string, resync: boolean } | null> {
+    const { merged: raw_data, resync } = mergeDeltaReport(decodeReport(report));
+
     // --- Data Type Coercion ---
     // Ensure numeric fields are correctly typed, especially from JSON
     const data: DashboardData = {
@@ -25,10 +130,7 @@ export async function POST(request: Request) {
     const timestamp = data.timestamp;
 
     if (!server_id || !timestamp) {
-      return NextResponse.json(
-        { error: "Missing 'id' or 'timestamp' in payload" },
-        { status: 400 }
-      );
+      return null;
     }
 
     // --- Store historical performance data ---
@@ -36,21 +138,72 @@ export async function POST(request: Request) {
     
 
     // --- Store the latest full snapshot in memory ---
-    db_data_store[server_id] = {
-      data: data,
-      last_updated: new Date().toISOString(),
-    };
+    // Reports replayed from an agent's spool can be older than what we already hold
+    const current = db_data_store[server_id];
+    const isLatest = !current || !current.data.timestamp || current.data.timestamp <= timestamp;
+    if (isLatest) {
+        db_data_store[server_id] = {
+          data: data,
+          last_updated: new Date().toISOString(),
+        };
+    }
 
     // --- Process Alerts ---
-    const settings = await getSettings();
-    const alertManager = new AlertManager(settings);
-    await alertManager.process_alerts(server_id, data);
+    // Only alert on the newest state; stale replayed samples would re-trigger cleared conditions
+    if (isLatest) {
+        const settings = await getSettings();
+        const alertManager = new AlertManager(settings);
+        await alertManager.process_alerts(server_id, data);
+    }
     
-    console.log(`[${new Date().toISOString()}] Received data from agent: ${server_id}`);
-    return NextResponse.json({ status: "success", id: server_id }, { status: 201 });
+    console.log(`[${new Date().toISOString()}] Received ${isReplay ? "replayed " : ""}${raw_data.payloadType === "delta" ? "delta " : ""}data from agent: ${server_id}`);
+    return { server_id, resync };
+}
+
+export async function POST(request: Request) {
+  try {
+    const raw_data = await readReportBody(request);
+
+    // A JSON array is a batch of spooled reports replayed by the agent after an outage
+    if (Array.isArray(raw_data)) {
+        let accepted = 0;
+        for (const report of raw_data) {
+            try {
+                if (await processReport(report, true)) {
+                    accepted++;
+                } else {
+                    console.warn("Skipping replayed report without 'id' or 'timestamp'.");
+                }
+            } catch (error) {
+                if (!(error instanceof UnsupportedPayloadError)) {
+                    throw error;
+                }
+                console.warn(`Skipping replayed report: ${error.message}`);
+            }
+        }
+        return NextResponse.json(
+            { status: "success", accepted, rejected: raw_data.length - accepted, maxSchemaVersion: MAX_SCHEMA_VERSION },
+            { status: 201 }
+        );
+    }
+
+    const result = await processReport(raw_data, false);
+    if (!result) {
+      return NextResponse.json(
+        { error: "Missing 'id' or 'timestamp' in payload" },
+        { status: 400 }
+      );
+    }
+    return NextResponse.json(
+        { status: "success", id: result.server_id, resync: result.resync, maxSchemaVersion: MAX_SCHEMA_VERSION },
+        { status: 201 }
+    );
 
   } catch (error) {
     console.error("Error processing report:", error);
+    if (error instanceof UnsupportedPayloadError) {
+        return NextResponse.json({ error: error.message }, { status: 415 });
+    }
     if (error instanceof SyntaxError) {
         return NextResponse.json({ error: "Request must be JSON" }, { status: 400 });
     }
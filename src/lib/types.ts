@@ -85,6 +85,24 @@ export interface DetailedActiveSession {
   terminal: string;
 }
 
+export type BlockingRoot = {
+  inst: number;
+  sid: number;
+  username: string | null;
+  sql_id: string | null;
+  event: string | null;
+  blocked: number; // all sessions waiting behind this one, directly or through a chain
+  direct: number;
+  max_depth: number;
+};
+
+export type BlockingChains = {
+  blocked_sessions: number;
+  max_depth: number;
+  roots: BlockingRoot[];
+  deadlocks: { sessions: { inst: number; sid: number }[]; cross_instance: boolean; blocked: number }[];
+};
+
 export interface AlertLogEntry {
   id: string;
   timestamp: string;
@@ -198,14 +216,65 @@ export interface DashboardData {
   backups: RmanBackup[];
   activeSessions: ActiveSession[];
   detailedActiveSessions: DetailedActiveSession[];
+  // Blocker graph of detailedActiveSessions, summarised by the agent (agent/blocking.py)
+  blockingChains?: BlockingChains;
   activeSessionsHistory: TimeSeriesData[];
   alertLog: AlertLogEntry[];
   diskUsage: DiskUsage[];
   topWaitEvents: WaitEvent[];
   standbyStatus: StandbyStatus[];
   customers: Customer[];
+  // Set by the agent: "delta" reports omit sections that are unchanged since the previous report
+  payloadType?: "full" | "delta";
+  // Agent self-instrumentation: rolling timings, sizes and counters (see agent/instrumentation.py)
+  agentStats?: AgentStats;
+  // Top statements by elapsed time since the previous report (V$SQLSTATS deltas)
+  topSql?: TopSqlEntry[];
+  // Present while the agent is in burst mode after a detected spike (see agent/anomaly.py)
+  burst?: BurstStatus;
+  burstSamples?: BurstSample[];
 }
 
+export type TopSqlEntry = {
+  sql_id: string;
+  plan_hash_value: number;
+  sql_text: string | null;
+  elapsed_s: number;
+  cpu_s: number;
+  buffer_gets: number;
+  executions: number;
+  elapsed_per_exec_ms: number | null;
+};
+
+export type BurstStatus = {
+  started: string;
+  until: string;
+  reasons: string[];
+};
+
+export type BurstSample = {
+  timestamp: string;
+  burst: string; // `started` of the burst the sample belongs to
+  active_sessions: number;
+  waiting_sessions: number;
+  waits: Record<string, number>;
+};
+
+export type HistogramSummary = {
+  count: number;
+  min: number;
+  avg: number;
+  p50: number;
+  p95: number;
+  max: number;
+};
+
+export type AgentStats = {
+  histograms: Record<string, HistogramSummary | null>;
+  counters: Record<string, number>;
+  process: { threads: number; rss_mb: number | null };
+};
+
 // This is the shape of the data coming from the /data endpoint
 export type ServerDataPayload = {
     [key: string]: {